@@ -1,48 +1,42 @@
-from flask import Flask, render_template, request, redirect, session, jsonify
+from flask import Flask, Response, render_template, request, redirect, session, jsonify
+import click
+from werkzeug.middleware.proxy_fix import ProxyFix
 from database import db
+from jalali_calendar import convert_to_jalali, get_jalali_info
+from user_import import import_users
+from reservation_export import EXPORT_KINDS, EXPORT_FORMATS, parse_filters, stream_export, export_filename
+from kitchen_forecast import DEFAULT_HISTORY_WEEKS, build_forecast
+from archive import Archiver
+from instrumentation import from_environ as instrumentation_from_environ
+from sessions import from_environ as sessions_from_environ
+from credentials import CredentialsBusy
+from rate_limit import from_environ as rate_limit_from_environ
+import io
 import os
-import jdatetime
-from datetime import datetime as dt
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-123'
-app.config['SESSION_TYPE'] = 'filesystem'
-
-# توابع کمکی تاریخ شمسی
-def get_jalali_info():
-    """دریافت اطلاعات تاریخ شمسی"""
-    now_jalali = jdatetime.datetime.now()
-    
-    return {
-        'today': now_jalali.strftime('%Y/%m/%d'),
-        'today_full': now_jalali.strftime('%A %d %B %Y'),
-        'current_year': now_jalali.year,
-        'current_month': now_jalali.month,
-        'current_day': now_jalali.day,
-        'weekday': now_jalali.weekday()  # 0=شنبه, 1=یکشنبه, ...
-    }
-
-def convert_to_jalali(gregorian_date_str):
-    """تبدیل تاریخ میلادی به شمسی"""
-    try:
-        if not gregorian_date_str:
-            return ""
-        
-        # اگر تاریخ شامل زمان است
-        if ' ' in gregorian_date_str:
-            date_part = gregorian_date_str.split(' ')[0]
-        else:
-            date_part = gregorian_date_str
-            
-        # تبدیل رشته به datetime
-        gregorian_date = dt.strptime(date_part, '%Y-%m-%d')
-        
-        # تبدیل به شمسی
-        jalali_date = jdatetime.datetime.fromgregorian(datetime=gregorian_date)
-        
-        return jalali_date.strftime('%Y/%m/%d')
-    except:
-        return gregorian_date_str
+
+# سشن سمت سرور: کوکی فقط شناسه است و کاربر در store کش می‌شود (FOOD_SESSION_STORE=memory|sqlite)
+sessions = sessions_from_environ(app)
+
+# پشت پراکسی معکوس، آدرس کلاینت از X-Forwarded-For خوانده می‌شود؛ FOOD_TRUSTED_PROXIES تعداد پراکسی‌های
+# مورد اعتماد جلوی برنامه است (پیش‌فرض 0: سرآیند نادیده گرفته می‌شود چون کلاینت می‌تواند آن را جعل کند)
+trusted_proxies = int(os.environ.get('FOOD_TRUSTED_PROXIES', 0))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+
+# محدودسازی نرخ /login و APIهای رزرو به ازای کاربر و IP (FOOD_RATE_LIMIT=0 خاموش)
+rate_limiter = rate_limit_from_environ(app)
+
+# زمان‌سنجی کوئری‌ها و مسیرها و /metrics (فقط با FOOD_INSTRUMENTATION=1)
+instrumentation = instrumentation_from_environ(app, db)
+
+# ثبت دسته‌ای رزروها در نخ نویسنده (برای دقایق پایانی مهلت رزرو): FOOD_RESERVATION_WRITER=1
+if os.environ.get('FOOD_RESERVATION_WRITER') == '1' and hasattr(db, 'start_writer'):
+    db.start_writer(max_batch=int(os.environ.get('FOOD_WRITER_MAX_BATCH', 128)),
+                    max_wait_ms=float(os.environ.get('FOOD_WRITER_MAX_WAIT_MS', 0)),
+                    max_queue=int(os.environ.get('FOOD_WRITER_MAX_QUEUE', 10000)))
 
 # صفحه اصلی
 @app.route('/')
@@ -61,9 +55,14 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        user = db.authenticate_user(email, password)
+        try:
+            user = db.authenticate_user(email, password)
+        except CredentialsBusy as e:
+            # هجوم ورود؛ به جای انتظار طولانی پیام تلاش مجدد داده می‌شود
+            return render_template('login.html', error=str(e)), 503
         
         if user:
+            session.regenerate()
             session['user_id'] = user['id']
             session['user_name'] = user['full_name']
             session['is_admin'] = bool(user['is_admin'])
@@ -89,8 +88,7 @@ def admin():
     if not session.get('is_admin'):
         return redirect('/login')
     
-    # دریافت داده‌ها
-    users = db.get_all_users()
+    # دریافت داده‌ها (کاربران صفحه به صفحه از /api/users خوانده می‌شوند)
     weekly_menu = db.get_weekly_menu()
     stats = db.calculate_stats()
     
@@ -104,7 +102,6 @@ def admin():
     
     return render_template('admin_simple.html',
                          user={'name': session.get('user_name', 'مدیر')},
-                         users=users,
                          weekly_menu=weekly_menu,
                          menu_items=menu_items,
                          stats=stats,
@@ -119,6 +116,7 @@ def user():
     
     weekly_menu = db.get_weekly_menu()
     reservations = db.get_user_reservations(session['user_id'])
+    waitlist = db.get_user_waitlist(session['user_id'])
     
     # اطمینان از ساختار داده‌ها
     menu_items = []
@@ -133,6 +131,7 @@ def user():
                          weekly_menu=weekly_menu,
                          menu_items=menu_items,
                          reservations=reservations,
+                         waitlist=waitlist,
                          jalali_info=jalali_info,
                          convert_to_jalali=convert_to_jalali)
 
@@ -147,18 +146,98 @@ def reserve():
         menu_item_id = data.get('menu_item_id')
         quantity = data.get('quantity', 1)
         is_extra = data.get('is_extra', False)
+        # کلید تکرار: تلاش مجدد کلاینت با همان کلید رزرو دوباره ثبت نمی‌کند
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
         
         success, message = db.create_reservation(
             session['user_id'],
             menu_item_id,
             quantity,
-            is_extra
+            is_extra,
+            idempotency_key=idempotency_key
         )
         
         return jsonify({'success': success, 'message': message})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+# API لغو رزرو (ظرفیت آزاد شده به نفر اول لیست انتظار می‌رسد)
+@app.route('/api/cancel_reservation', methods=['POST'])
+def cancel_reservation():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'لطفاً ابتدا وارد شوید'})
+    
+    try:
+        data = request.get_json()
+        success, message = db.cancel_reservation(session['user_id'], int(data.get('reservation_id')))
+        return jsonify({'success': success, 'message': message})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# API ورود به لیست انتظار (اگر ظرفیت باشد مستقیم رزرو می‌شود)
+@app.route('/api/waitlist/join', methods=['POST'])
+def waitlist_join():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'لطفاً ابتدا وارد شوید'})
+    
+    try:
+        data = request.get_json()
+        success, message, position = db.join_waitlist(
+            session['user_id'],
+            int(data.get('menu_item_id')),
+            int(data.get('quantity', 1)),
+            bool(data.get('is_extra', False))
+        )
+        return jsonify({'success': success, 'message': message, 'position': position})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# API خروج از لیست انتظار
+@app.route('/api/waitlist/leave', methods=['POST'])
+def waitlist_leave():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'لطفاً ابتدا وارد شوید'})
+    
+    try:
+        data = request.get_json()
+        success, message = db.leave_waitlist(session['user_id'], int(data.get('waitlist_id')))
+        return jsonify({'success': success, 'message': message})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# جریان زنده ظرفیت غذاها (Server-Sent Events)
+@app.route('/api/capacity/stream')
+def capacity_stream():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'لطفاً ابتدا وارد شوید'}), 401
+    
+    events = db.capacity_events.stream(db.get_capacity_snapshot)
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# API فهرست کاربران (صفحه‌بندی keyset)
+@app.route('/api/users')
+def api_users():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    active = request.args.get('active')
+    is_active = None if active in (None, '') else active in ('1', 'true')
+    
+    try:
+        page = db.get_users_page(
+            limit=request.args.get('limit', 50, type=int),
+            cursor=request.args.get('cursor'),
+            department=request.args.get('department'),
+            is_active=is_active,
+            search=request.args.get('q')
+        )
+        return jsonify({'success': True, 'users': page['users'], 'next_cursor': page['next_cursor']})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 # API ایجاد کاربر
 @app.route('/api/create_user', methods=['POST'])
 def api_create_user():
@@ -180,6 +259,61 @@ def api_create_user():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+# API فعال/غیرفعال کردن کاربر (غیرفعال کردن همه سشن‌های کاربر را باطل می‌کند)
+@app.route('/api/set_user_active', methods=['POST'])
+def api_set_user_active():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    data = request.get_json() or {}
+    user_id = data.get('user_id')
+    is_active = bool(data.get('is_active'))
+    if not isinstance(user_id, int):
+        return jsonify({'success': False, 'message': 'شناسه کاربر نامعتبر است'})
+    if user_id == session['user_id'] and not is_active:
+        return jsonify({'success': False, 'message': 'نمی‌توانید حساب خود را غیرفعال کنید'})
+    
+    success, message = db.set_user_active(user_id, is_active)
+    if success and not is_active:
+        sessions.store.revoke_user(user_id)
+    return jsonify({'success': success, 'message': message})
+
+# API خروج اجباری: همه سشن‌های یک کاربر یا همه کاربران
+@app.route('/api/revoke_sessions', methods=['POST'])
+def api_revoke_sessions():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    data = request.get_json() or {}
+    if data.get('all'):
+        count = sessions.store.revoke_all()
+    elif isinstance(data.get('user_id'), int):
+        count = sessions.store.revoke_user(data['user_id'])
+    else:
+        return jsonify({'success': False, 'message': 'user_id یا all لازم است'})
+    
+    return jsonify({'success': True, 'message': f'{count} سشن باطل شد', 'revoked': count})
+
+# API ورود دسته‌ای کارکنان (فایل CSV یا JSONL)
+@app.route('/api/import_users', methods=['POST'])
+def api_import_users():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'success': False, 'message': 'فایل ارسال نشده است'})
+    
+    fmt = request.form.get('format') or ('jsonl' if upload.filename.endswith(('.jsonl', '.json')) else 'csv')
+    
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        result = import_users(db, stream, fmt=fmt,
+                              default_password=request.form.get('default_password'))
+        return jsonify({'success': True, 'result': result})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 # API ایجاد منوی هفتگی
 @app.route('/api/create_weekly_menu', methods=['POST'])
 def api_create_weekly_menu():
@@ -241,6 +375,54 @@ def api_add_menu_item():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+# API ایجاد منوی کامل هفته (همه روزها و غذاها در یک درخواست)
+@app.route('/api/create_weekly_menu_bulk', methods=['POST'])
+def api_create_weekly_menu_bulk():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    try:
+        data = request.get_json()
+        
+        week_start = data.get('week_start')
+        week_end = data.get('week_end')
+        reservation_deadline = data.get('reservation_deadline')
+        items = data.get('items') or []
+        
+        if not all([week_start, week_end, reservation_deadline]):
+            return jsonify({'success': False, 'message': 'لطفاً تمام فیلدها را پر کنید'})
+        if not isinstance(items, list):
+            return jsonify({'success': False, 'message': 'فهرست غذاها نامعتبر است'})
+        
+        success, menu_id, message = db.create_weekly_menu_bulk(
+            week_start, week_end, reservation_deadline, items
+        )
+        
+        return jsonify({'success': success, 'menu_id': menu_id, 'message': message})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# API کپی منوی هفته قبل با جابه‌جایی تاریخ
+@app.route('/api/clone_weekly_menu', methods=['POST'])
+def api_clone_weekly_menu():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        success, menu_id, message = db.clone_weekly_menu(
+            source_menu_id=data.get('source_menu_id'),
+            shift_days=int(data.get('shift_days', 7)),
+            reservation_deadline=data.get('reservation_deadline')
+        )
+        
+        return jsonify({'success': success, 'menu_id': menu_id, 'message': message})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 # API دریافت غذاهای یک روز
 @app.route('/api/get_foods_for_day')
 def api_get_foods_for_day():
@@ -253,6 +435,183 @@ def api_get_foods_for_day():
     foods = db.get_foods_for_day(weekly_menu_id, day_of_week)
     return jsonify(foods)
 
+# API پیش‌بینی پرس‌های آشپزخانه برای منوی فعال (?history_weeks=104)
+@app.route('/api/kitchen_forecast')
+def api_kitchen_forecast():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    history_weeks = request.args.get('history_weeks', DEFAULT_HISTORY_WEEKS, type=int)
+    forecast = build_forecast(db, history_weeks=max(1, history_weeks))
+    if forecast is None:
+        return jsonify({'success': False, 'message': 'منوی فعالی وجود ندارد'})
+    return jsonify({'success': True, 'forecast': forecast})
+
+# API خروجی رزروها و کسر از حقوق ماهانه (CSV یا XLSX، جریانی)
+# /api/export/payroll?format=csv&from=1403/01/01&to=1403/12/29&department=مالی
+@app.route('/api/export/<kind>')
+def api_export(kind):
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+    
+    fmt = request.args.get('format', 'csv')
+    if kind not in EXPORT_KINDS or fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'نوع یا فرمت گزارش نامعتبر است'}), 400
+    
+    try:
+        filters = parse_filters(request.args.get('from'), request.args.get('to'),
+                                request.args.get('department'), request.args.get('status'))
+        chunks = stream_export(db, kind, fmt, filters)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return Response(chunks, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{export_filename(kind, fmt, filters)}"'
+    })
+
+# API آمار اتصال‌های دیتابیس
+@app.route('/api/db_stats')
+def api_db_stats():
+    if not session.get('is_admin'):
+        return jsonify({'success': False, 'message': 'دسترسی غیرمجاز'})
+
+    return jsonify({
+        'success': True,
+        'pool': db.get_pool_stats(),
+        'reservations': db.get_reservation_stats(),
+        'menu_cache': db.get_menu_cache_stats(),
+        'writer': db.get_writer_stats(),
+        'capacity_events': db.capacity_events.get_stats(),
+        'sessions': sessions.store.get_stats(),
+        'credentials': db.hasher.get_stats(),
+        'rate_limit': rate_limiter.get_stats() if rate_limiter else None
+    })
+
+# دستور ساخت اسکیما و داده‌های اولیه: flask --app app init-db [--no-sample-data]
+@app.cli.command('init-db')
+@click.option('--no-sample-data', is_flag=True, help='بدون ایجاد کاربران و منوی نمونه')
+def init_db_command(no_sample_data):
+    db.init_db(with_sample_data=not no_sample_data)
+
+# دستور ورود دسته‌ای کارکنان: flask --app app import-users roster.csv
+@app.cli.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None)
+@click.option('--default-password', default=None, help='رمز عبور ردیف‌هایی که ستون password ندارند')
+@click.option('--chunk-size', default=500, show_default=True)
+def import_users_command(path, fmt, default_password, chunk_size):
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+    
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        result = import_users(db, stream, fmt=fmt, chunk_size=chunk_size,
+                              default_password=default_password)
+    
+    for error in result['errors']:
+        click.echo(f"❌ ردیف {error['row']}: {error['message']}")
+    if result['errors_truncated']:
+        click.echo("... (بقیه خطاها نمایش داده نشد)")
+    
+    click.echo(f"✅ {result['processed']} ردیف در {result['elapsed']} ثانیه: "
+               f"{result['inserted']} جدید، {result['updated']} به‌روزرسانی، "
+               f"{result['unchanged']} بدون تغییر، {result['failed']} خطا")
+
+# دستور خروجی گزارش: flask --app app export payroll --from 1403/01/01 --to 1403/01/31 --format xlsx
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(EXPORT_KINDS))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv', show_default=True)
+@click.option('--from', 'date_from', default=None, help='از تاریخ (شمسی یا میلادی)')
+@click.option('--to', 'date_to', default=None, help='تا تاریخ (شمسی یا میلادی)')
+@click.option('--department', default=None)
+@click.option('--status', default=None, help='CONFIRMED، CANCELLED، ... (پیش‌فرض payroll: CONFIRMED)')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None)
+def export_command(kind, fmt, date_from, date_to, department, status, output):
+    try:
+        filters = parse_filters(date_from, date_to, department, status)
+        chunks = stream_export(db, kind, fmt, filters)
+    except (ValueError, RuntimeError) as e:
+        raise click.UsageError(str(e))
+    
+    path = output or export_filename(kind, fmt, filters)
+    if fmt == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(chunks)
+    else:
+        with open(path, 'wb') as stream:
+            stream.writelines(chunks)
+    
+    click.echo(f"✅ گزارش در {path} ذخیره شد ({os.path.getsize(path):,} بایت)")
+
+# دستور بازسازی/بررسی خلاصه آمار: flask --app app rebuild-stats [--verify-only]
+@app.cli.command('rebuild-stats')
+@click.option('--verify-only', is_flag=True, help='فقط گزارش اختلاف، بدون تغییر جدول')
+def rebuild_stats_command(verify_only):
+    drift = db.rebuild_menu_stats(verify_only=verify_only)
+    
+    for row in drift:
+        click.echo(f"⚠️ منو {row['weekly_menu_id']} / غذا {row['menu_item_id']}: "
+                   f"ذخیره شده {row['stored']} ← محاسبه شده {row['expected']}")
+    
+    if not drift:
+        click.echo("✅ خلاصه آمار با رزروها یکسان است")
+    elif verify_only:
+        raise SystemExit(1)
+    else:
+        click.echo(f"✅ {len(drift)} ردیف اصلاح شد")
+
+# دستور بایگانی هفته‌های قدیمی: FOOD_ARCHIVE_DB=archive.db flask --app app archive [--vacuum]
+@app.cli.command('archive')
+@click.option('--retention-weeks', type=int, default=lambda: int(os.environ.get('FOOD_ARCHIVE_RETENTION_WEEKS', 26)),
+              show_default='26', help='هفته‌هایی که در دیتابیس اصلی می‌مانند')
+@click.option('--chunk-size', default=5000, show_default=True, help='رزرو در هر تراکنش')
+@click.option('--max-weeks', type=int, default=None, help='حداکثر هفته در این اجرا')
+@click.option('--vacuum', is_flag=True, help='کوچک کردن فایل اصلی پس از انتقال')
+def archive_command(retention_weeks, chunk_size, max_weeks, vacuum):
+    try:
+        archiver = Archiver(db, retention_weeks=retention_weeks, chunk_size=chunk_size)
+    except RuntimeError as e:
+        raise click.UsageError(str(e))
+    
+    def progress(weekly_menu_id, moved):
+        click.echo(f"📦 منو {weekly_menu_id}: {moved} رزرو منتقل شد")
+    
+    summary = archiver.run(max_weeks=max_weeks, progress=progress)
+    if vacuum:
+        archiver.vacuum()
+        summary['hot_size'] = os.path.getsize(db.db_name)
+    
+    click.echo(f"✅ {summary['weeks']} هفته و {summary['reservations']} رزرو بایگانی شد؛ "
+               f"دیتابیس اصلی {summary['hot_size']:,} بایت، بایگانی {summary['archive_size']:,} بایت")
+
+# دستور خروج اجباری کاربران: flask --app app revoke-sessions --user-id 12 | --all
+# (فقط با FOOD_SESSION_STORE=sqlite روی سرور در حال اجرا اثر دارد)
+@app.cli.command('revoke-sessions')
+@click.option('--user-id', type=int, default=None)
+@click.option('--all', 'revoke_all', is_flag=True, help='خروج همه کاربران')
+def revoke_sessions_command(user_id, revoke_all):
+    if sessions.store.get_stats()['backend'] == 'memory':
+        raise click.UsageError('سشن‌های حافظه‌ای فقط داخل پروسه سرور هستند؛ FOOD_SESSION_STORE=sqlite را تنظیم کنید')
+    if revoke_all:
+        count = sessions.store.revoke_all()
+    elif user_id is not None:
+        count = sessions.store.revoke_user(user_id)
+    else:
+        raise click.UsageError('--user-id یا --all لازم است')
+    
+    click.echo(f"✅ {count} سشن باطل شد")
+
+# دستور بررسی استفاده از ایندکس در کوئری‌های داغ: flask --app app check-indexes
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    failures = db.check_query_plans()
+    
+    for name, details in failures.items():
+        click.echo(f"❌ {name}: {'; '.join(details)}")
+    
+    if failures:
+        raise SystemExit(1)
+    click.echo("✅ همه کوئری‌های داغ از ایندکس استفاده می‌کنند")
+
 if __name__ == '__main__':
     # ایجاد پوشه‌ها اگر وجود ندارند
     if not os.path.exists('templates'):
@@ -265,4 +624,8 @@ if __name__ == '__main__':
     print("   مدیر سیستم: admin@company.com / Admin@123!")
     print("   کاربران: reza@company.com / User@123!")
     
+    # در حالت توسعه اسکیما همین‌جا ساخته می‌شود؛ در production از init-db استفاده کنید
+    db.init_db()
+    
+    # سرور توسعه؛ برای اتصال‌های زیاد حالت ASGI: uvicorn asgi:application --port 5000
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
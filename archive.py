@@ -0,0 +1,199 @@
+import os
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import jdatetime
+
+# جدول‌هایی که هفته‌های قدیمی از دیتابیس اصلی به بایگانی منتقل می‌شوند
+ARCHIVED_TABLES = ('weekly_menus', 'menu_items', 'reservations', 'menu_stats', 'waitlist')
+
+# مکان‌نمای قابل ادامه: هفته در حال انتقال و آخرین رزرو منتقل شده
+ARCHIVE_PROGRESS_TABLE = '''
+CREATE TABLE IF NOT EXISTS archive.archive_progress (
+    weekly_menu_id INTEGER PRIMARY KEY,
+    last_reservation_id INTEGER NOT NULL DEFAULT 0,
+    reservations INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+)
+'''
+
+
+def attach_archive(conn, path: str):
+    """ATTACH فایل بایگانی با نام archive روی یک اتصال تازه"""
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    sync_schema(conn)
+
+
+def sync_schema(conn):
+    """ساخت جدول‌ها و ایندکس‌های بایگانی از روی همان تعریف جدول‌های اصلی؛ ستون‌های جدید اضافه می‌شوند"""
+    for table in ARCHIVED_TABLES:
+        row = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                           (table,)).fetchone()
+        if row is None:
+            # دیتابیس اصلی هنوز مهاجرت نشده؛ init_db دوباره هم‌سان می‌کند
+            continue
+
+        archived = {info[1] for info in conn.execute(f'PRAGMA archive.table_info({table})').fetchall()}
+        if not archived:
+            conn.execute(row[0].replace('CREATE TABLE ', 'CREATE TABLE IF NOT EXISTS archive.', 1))
+        else:
+            for _, name, column_type, _, default, _ in conn.execute(f'PRAGMA main.table_info({table})').fetchall():
+                if name not in archived:
+                    suffix = f' DEFAULT {default}' if default is not None else ''
+                    conn.execute(f'ALTER TABLE archive.{table} ADD COLUMN {name} {column_type}{suffix}')
+
+        indexes = conn.execute('''
+        SELECT sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+        ''', (table,)).fetchall()
+        for (sql,) in indexes:
+            conn.execute(sql.replace('CREATE INDEX ', 'CREATE INDEX IF NOT EXISTS archive.', 1)
+                         .replace('CREATE UNIQUE INDEX ', 'CREATE UNIQUE INDEX IF NOT EXISTS archive.', 1))
+
+    conn.execute(ARCHIVE_PROGRESS_TABLE)
+    conn.commit()
+
+
+class Archiver:
+    """انتقال هفته‌های غیرفعال قدیمی‌تر از بازه نگهداری به دیتابیس بایگانی
+
+    هر هفته در چند تراکنش کوتاه منتقل می‌شود (هر بار chunk_size رزرو) تا قفل نوشتن دیتابیس اصلی
+    طولانی نشود؛ پیشرفت در archive_progress ثبت می‌شود و اجرای بعدی از همان‌جا ادامه می‌دهد.
+    همه کپی‌ها INSERT OR REPLACE هستند، پس تکرار یک مرحله پس از قطع شدن بی‌ضرر است.
+    """
+
+    def __init__(self, db, retention_weeks: int = 26, chunk_size: int = 5000):
+        if not getattr(db, 'archive_path', None):
+            raise RuntimeError("دیتابیس بایگانی تنظیم نشده است (FOOD_ARCHIVE_DB)")
+        self.db = db
+        self.retention_weeks = retention_weeks
+        self.chunk_size = chunk_size
+
+    def pending_weeks(self, today: Optional[date] = None) -> List[int]:
+        """هفته‌های نیمه‌کاره و سپس هفته‌های غیرفعالی که week_end آن‌ها از بازه نگهداری گذشته است"""
+        cutoff = (today or date.today()) - timedelta(weeks=self.retention_weeks)
+        conn = self.db.get_connection()
+        try:
+            resumed = [row[0] for row in conn.execute('''
+            SELECT weekly_menu_id FROM archive.archive_progress WHERE finished_at IS NULL ORDER BY weekly_menu_id
+            ''').fetchall()]
+            menus = conn.execute('SELECT id, week_end FROM main.weekly_menus WHERE is_active = 0 ORDER BY id').fetchall()
+        finally:
+            conn.close()
+
+        expired = [row['id'] for row in menus if _week_end(row['week_end']) < cutoff and row['id'] not in resumed]
+        return resumed + expired
+
+    def archive_week(self, weekly_menu_id: int) -> int:
+        """انتقال یک هفته (منو، غذاها، رزروها، آمار و صف انتظار)؛ خروجی: تعداد رزروهای منتقل شده"""
+        items = 'SELECT id FROM main.menu_items WHERE weekly_menu_id = ?'
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            # منو و غذاها از ابتدا در بایگانی هم هستند تا رزروهای منتقل شده آن‌جا JOIN شوند
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('INSERT OR IGNORE INTO archive.archive_progress (weekly_menu_id) VALUES (?)',
+                           (weekly_menu_id,))
+            cursor.execute('INSERT OR REPLACE INTO archive.weekly_menus SELECT * FROM main.weekly_menus WHERE id = ?',
+                           (weekly_menu_id,))
+            cursor.execute('INSERT OR REPLACE INTO archive.menu_items SELECT * FROM main.menu_items '
+                           'WHERE weekly_menu_id = ?', (weekly_menu_id,))
+            cursor.execute('SELECT last_reservation_id FROM archive.archive_progress WHERE weekly_menu_id = ?',
+                           (weekly_menu_id,))
+            last_id = cursor.fetchone()[0]
+            conn.commit()
+
+            while True:
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute(f'''
+                SELECT MAX(id) FROM (
+                    SELECT id FROM main.reservations
+                    WHERE menu_item_id IN ({items}) AND id > ?
+                    ORDER BY id LIMIT ?
+                )
+                ''', (weekly_menu_id, last_id, self.chunk_size))
+                upper = cursor.fetchone()[0]
+                if upper is None:
+                    conn.rollback()
+                    break
+
+                chunk = f'menu_item_id IN ({items}) AND id > ? AND id <= ?'
+                params = (weekly_menu_id, last_id, upper)
+                cursor.execute(f'INSERT OR REPLACE INTO archive.reservations SELECT * FROM main.reservations '
+                               f'WHERE {chunk}', params)
+                cursor.execute(f'DELETE FROM main.reservations WHERE {chunk}', params)
+                cursor.execute('''
+                UPDATE archive.archive_progress SET last_reservation_id = ?, reservations = reservations + ?
+                WHERE weekly_menu_id = ?
+                ''', (upper, cursor.rowcount, weekly_menu_id))
+                conn.commit()
+                last_id = upper
+
+            # پایان هفته: باقی‌مانده‌ها (مثلاً پس از قطع شدن بین commit دو فایل)، آمار، صف انتظار، غذاها و منو
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'INSERT OR REPLACE INTO archive.reservations SELECT * FROM main.reservations '
+                           f'WHERE menu_item_id IN ({items})', (weekly_menu_id,))
+            cursor.execute(f'DELETE FROM main.reservations WHERE menu_item_id IN ({items})', (weekly_menu_id,))
+            cursor.execute(f'INSERT OR REPLACE INTO archive.waitlist SELECT * FROM main.waitlist '
+                           f'WHERE menu_item_id IN ({items})', (weekly_menu_id,))
+            cursor.execute(f'DELETE FROM main.waitlist WHERE menu_item_id IN ({items})', (weekly_menu_id,))
+            cursor.execute('INSERT OR REPLACE INTO archive.menu_stats SELECT * FROM main.menu_stats '
+                           'WHERE weekly_menu_id = ?', (weekly_menu_id,))
+            cursor.execute('DELETE FROM main.menu_stats WHERE weekly_menu_id = ?', (weekly_menu_id,))
+            cursor.execute('INSERT OR REPLACE INTO archive.menu_items SELECT * FROM main.menu_items '
+                           'WHERE weekly_menu_id = ?', (weekly_menu_id,))
+            cursor.execute('DELETE FROM main.menu_items WHERE weekly_menu_id = ?', (weekly_menu_id,))
+            cursor.execute('DELETE FROM main.weekly_menus WHERE id = ?', (weekly_menu_id,))
+            # شمارش نهایی از خود بایگانی (شمارنده تکه‌ها پس از تکرار یک مرحله ممکن است دوباره شمرده باشد)
+            cursor.execute('''
+            UPDATE archive.archive_progress
+            SET finished_at = CURRENT_TIMESTAMP,
+                reservations = (SELECT COUNT(*) FROM archive.reservations WHERE menu_item_id IN
+                                (SELECT id FROM archive.menu_items WHERE weekly_menu_id = ?))
+            WHERE weekly_menu_id = ?
+            ''', (weekly_menu_id, weekly_menu_id))
+            cursor.execute('SELECT reservations FROM archive.archive_progress WHERE weekly_menu_id = ?',
+                           (weekly_menu_id,))
+            moved = cursor.fetchone()[0]
+            conn.commit()
+            return moved
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def run(self, max_weeks: Optional[int] = None, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """بایگانی همه هفته‌های منقضی (یا حداکثر max_weeks هفته)"""
+        summary = {'weeks': 0, 'reservations': 0}
+        for weekly_menu_id in self.pending_weeks()[:max_weeks]:
+            moved = self.archive_week(weekly_menu_id)
+            summary['weeks'] += 1
+            summary['reservations'] += moved
+            if progress is not None:
+                progress(weekly_menu_id, moved)
+
+        summary['hot_size'] = os.path.getsize(self.db.db_name)
+        summary['archive_size'] = os.path.getsize(self.db.archive_path)
+        return summary
+
+    def vacuum(self):
+        """کوچک کردن فایل اصلی؛ بدون آن صفحه‌های آزاد شده برای داده‌های جدید دوباره استفاده می‌شوند"""
+        conn = self.db.get_connection()
+        try:
+            conn.execute('VACUUM main')
+            # در حالت WAL فایل اصلی فقط پس از checkpoint کوچک می‌شود
+            conn.execute('PRAGMA main.wal_checkpoint(TRUNCATE)')
+        finally:
+            conn.close()
+
+
+def _week_end(value: str) -> date:
+    """تاریخ پایان هفته ('YYYY-MM-DD' شمسی یا میلادی)؛ تاریخ نامعتبر هرگز بایگانی نمی‌شود"""
+    try:
+        year, month, day = (int(part) for part in value.split(' ')[0].replace('/', '-').split('-'))
+        if year < 1700:
+            return jdatetime.date(year, month, day).togregorian()
+        return date(year, month, day)
+    except (AttributeError, ValueError):
+        return date.max
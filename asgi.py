@@ -0,0 +1,324 @@
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import session
+
+from app import app as flask_app, db
+from capacity_events import AsyncSubscription
+
+# بدنه بزرگ‌تر از این (مثلاً فایل کارکنان) روی دیسک نگه داشته می‌شود
+SPOOL_MAX_SIZE = 1024 * 1024
+# هر نوبت خواندن از پاسخ WSGI در executor تا این اندازه تکه جمع می‌کند
+RESPONSE_BATCH_SIZE = 64 * 1024
+
+CAPACITY_STREAM_PATH = '/api/capacity/stream'
+
+_BUSY_BODY = '{"success": false, "message": "سرور مشغول است، لطفاً دوباره تلاش کنید"}'.encode('utf-8')
+_BUSY_HEADERS = [(b'content-type', b'application/json'), (b'retry-after', b'1')]
+
+
+class AsgiApp:
+    """سازگارکننده ASGI برای اپلیکیشن Flask با executor محدود، سقف همزمانی و خاموش شدن تدریجی
+
+    هر درخواست WSGI در ThreadPoolExecutor محدود اجرا می‌شود (کار دیتابیس هرگز حلقه رویداد را
+    نمی‌بندد) و تعداد درخواست‌های پذیرفته شده با سمافور محدود است. جریان زنده ظرفیت که کاربران
+    روی صفحه منو باز نگه می‌دارند مستقیم در حلقه asyncio سرو می‌شود، بدون یک نخ برای هر اتصال.
+    """
+
+    def __init__(self, flask_app, database, workers: int = 32, max_concurrency: int = 256,
+                 queue_timeout: float = 10.0, max_streams: int = 10000, shutdown_timeout: float = 30.0):
+        self.flask_app = flask_app
+        self.database = database
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        # بیشترین انتظار یک درخواست برای جا در صف پیش از 503
+        self.queue_timeout = queue_timeout
+        self.max_streams = max_streams
+        self.shutdown_timeout = shutdown_timeout
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='food-asgi')
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # بدون درخواست در حال اجرا (برای خاموش شدن)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._streams = set()
+        self._active = 0
+        self._draining = False
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'rejected_busy': 0,
+            'rejected_draining': 0,
+            'streams_opened': 0,
+            'streams_rejected': 0,
+            'queue_wait': 0.0,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            # WebSocket پشتیبانی نمی‌شود
+            return
+
+        if self._draining:
+            self._count('rejected_draining')
+            await _send_busy(send)
+            return
+
+        if scope['path'] == CAPACITY_STREAM_PATH and scope['method'] == 'GET':
+            if await self._capacity_stream(scope, receive, send):
+                return
+
+        await self._handle_wsgi(scope, receive, send)
+
+    # --- درخواست‌های WSGI ---
+
+    async def _handle_wsgi(self, scope, receive, send):
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._count('rejected_busy')
+            await _send_busy(send)
+            return
+
+        self._active += 1
+        self._idle.clear()
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['queue_wait'] += time.monotonic() - started
+        try:
+            body = await _read_body(receive)
+            environ = _build_environ(scope, body)
+            await self._run_wsgi(environ, send)
+        finally:
+            self._slots.release()
+            self._active -= 1
+            if self._active == 0:
+                self._idle.set()
+
+    async def _run_wsgi(self, environ: Dict, send):
+        loop = asyncio.get_running_loop()
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return lambda data: response.setdefault('early', []).append(data)
+
+        def call():
+            result = self.flask_app(environ, start_response)
+            return result, iter(result)
+
+        result, chunks = await loop.run_in_executor(self.executor, call)
+        try:
+            batch, more = await loop.run_in_executor(self.executor, _next_batch, chunks)
+            await send({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+            body = b''.join(response.get('early', [])) + batch
+            # پاسخ‌های جریانی (خروجی‌ها) تکه‌تکه و بدون بستن حلقه خوانده می‌شوند
+            while more:
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+                body, more = await loop.run_in_executor(self.executor, _next_batch, chunks)
+            await send({'type': 'http.response.body', 'body': body})
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, result.close)
+
+    # --- جریان زنده ظرفیت ---
+
+    async def _capacity_stream(self, scope, receive, send) -> bool:
+        """SSE ظرفیت در حلقه رویداد؛ False یعنی کاربر وارد نشده و مسیر WSGI پاسخ 401 می‌دهد"""
+        loop = asyncio.get_running_loop()
+        environ = _build_environ(scope, b'')
+        user_id = await loop.run_in_executor(self.executor, self._session_user, environ)
+        if user_id is None:
+            return False
+
+        if len(self._streams) >= self.max_streams:
+            self._count('streams_rejected')
+            await _send_busy(send)
+            return True
+
+        broadcaster = self.database.capacity_events
+        subscription = AsyncSubscription(broadcaster.max_queue, loop)
+        self._streams.add(subscription)
+        self._count('streams_opened')
+
+        async def snapshot():
+            return await loop.run_in_executor(self.executor, self.database.get_capacity_snapshot)
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            subscription.close()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            async for chunk in broadcaster.astream(snapshot, subscription):
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            # کلاینت در میانه ارسال قطع شد
+            pass
+        finally:
+            watcher.cancel()
+            self._streams.discard(subscription)
+        return True
+
+    def _session_user(self, environ: Dict) -> Optional[int]:
+        """شناسه کاربر سشن (باز کردن سشن ممکن است به store دیتابیسی برود؛ در executor)"""
+        with self.flask_app.request_context(environ):
+            return session.get('user_id')
+
+    # --- چرخه عمر ---
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def shutdown(self):
+        """توقف پذیرش، بستن جریان‌های SSE، انتظار برای درخواست‌های در حال اجرا و بستن دیتابیس"""
+        self._draining = True
+        for subscription in list(self._streams):
+            subscription.close()
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {self._active} درخواست پس از {self.shutdown_timeout} ثانیه هنوز در حال اجراست",
+                  file=sys.stderr)
+
+        # رزروهای صف نویسنده دسته‌ای پیش از بستن اتصال‌ها ثبت می‌شوند
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.database.close)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict:
+        """آمار درخواست‌ها، صف و اتصال‌های SSE"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_queue_wait_ms'] = round(stats.pop('queue_wait') / stats['requests'] * 1000, 3) \
+            if stats['requests'] else 0.0
+        stats.update(workers=self.workers, max_concurrency=self.max_concurrency, active=self._active,
+                     streams=len(self._streams), draining=self._draining)
+        return stats
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+
+async def _read_body(receive):
+    """بدنه درخواست؛ بدنه‌های بزرگ روی دیسک (SpooledTemporaryFile)"""
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    more = True
+    while more:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body.write(message.get('body', b''))
+        more = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+def _build_environ(scope, body) -> Dict:
+    """environ استاندارد WSGI (PEP 3333) از scope ASGI"""
+    if isinstance(body, bytes):
+        body = io.BytesIO(body)
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+
+    # مسیرهای WSGI رشته‌های latin-1 از بایت‌های UTF-8 هستند
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        # بدنه کامل خوانده شده است (درخواست‌های chunked بدون Content-Length هم)
+        'wsgi.input_terminated': True,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _next_batch(chunks):
+    """تکه‌های بعدی پاسخ تا RESPONSE_BATCH_SIZE؛ خروجی: (بایت‌ها، هنوز ادامه دارد)"""
+    parts = []
+    size = 0
+    for chunk in chunks:
+        if chunk:
+            parts.append(chunk)
+            size += len(chunk)
+        if size >= RESPONSE_BATCH_SIZE:
+            return b''.join(parts), True
+    return b''.join(parts), False
+
+
+async def _send_busy(send):
+    await send({'type': 'http.response.start', 'status': 503, 'headers': _BUSY_HEADERS})
+    await send({'type': 'http.response.body', 'body': _BUSY_BODY})
+
+
+def from_environ(flask_app, database) -> AsgiApp:
+    """تنظیمات از متغیرهای FOOD_ASGI_*"""
+    return AsgiApp(
+        flask_app, database,
+        workers=int(os.environ.get('FOOD_ASGI_WORKERS', 32)),
+        max_concurrency=int(os.environ.get('FOOD_ASGI_MAX_CONCURRENCY', 256)),
+        queue_timeout=float(os.environ.get('FOOD_ASGI_QUEUE_TIMEOUT', 10)),
+        max_streams=int(os.environ.get('FOOD_ASGI_MAX_STREAMS', 10000)),
+        shutdown_timeout=float(os.environ.get('FOOD_ASGI_SHUTDOWN_TIMEOUT', 30)),
+    )
+
+
+# نقطه ورود سرور ASGI: uvicorn asgi:application --workers 1
+application = from_environ(flask_app, db)
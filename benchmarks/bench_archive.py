@@ -0,0 +1,77 @@
+"""بنچمارک بایگانی: اندازه دیتابیس اصلی و زمان کوئری‌های تاریخچه قبل و بعد از انتقال هفته‌های قدیمی
+
+اجرا:
+    python benchmarks/bench_archive.py --users 1000 --weeks 156 --retention-weeks 26
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest import generate_database  # noqa: E402
+
+
+def timed(func, runs: int) -> float:
+    """میانه زمان اجرا (ms)"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def measure(db, user_id: int, runs: int) -> str:
+    from kitchen_forecast import build_forecast
+
+    reservations = timed(lambda: db.get_user_reservations(user_id), runs)
+    forecast = timed(lambda: build_forecast(db), runs)
+    return f'رزروهای کاربر {reservations:.2f} ms، پیش‌بینی آشپزخانه {forecast:.2f} ms'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--weeks', type=int, default=156)
+    parser.add_argument('--retention-weeks', type=int, default=26)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    from archive import Archiver
+    from database import Database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'hot.db')
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_database(path, users=args.users, weeks=args.weeks)
+
+        db = Database(path)
+        conn = db.get_connection()
+        user_id = conn.execute('SELECT user_id FROM reservations ORDER BY id LIMIT 1').fetchone()[0]
+        conn.close()
+        print(f'قبل:  {os.path.getsize(path):>14,} بایت   {measure(db, user_id, args.runs)}')
+        db.close()
+
+        db = Database(path, archive_path=os.path.join(tmp, 'archive.db'))
+        try:
+            archiver = Archiver(db, retention_weeks=args.retention_weeks, chunk_size=args.chunk_size)
+            started = time.perf_counter()
+            summary = archiver.run()
+            elapsed = time.perf_counter() - started
+            archiver.vacuum()
+            print(f'{summary["weeks"]} هفته و {summary["reservations"]:,} رزرو در {elapsed:.1f} ثانیه بایگانی شد '
+                  f'({summary["reservations"] / elapsed:,.0f} رزرو/ثانیه)')
+            print(f'بعد:  {os.path.getsize(path):>14,} بایت   {measure(db, user_id, args.runs)}')
+            print(f'بایگانی: {summary["archive_size"]:,} بایت')
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""مقایسه حالت WSGI (یک نخ برای هر اتصال) و ASGI با همان ترکیب درخواست‌های آزمون بار
+
+هر حالت در پروسه جداگانه اجرا می‌شود: ابتدا --streams اتصال SSE بیکار (کاربرانی که صفحه منو را
+باز گذاشته‌اند) باز می‌شود، سپس ترکیب درخواست‌های loadtest با --concurrency کاربر همزمان بازپخش
+می‌شود. در حالت WSGI هر اتصال SSE یک نخ سرور را نگه می‌دارد (مثل werkzeug یا gunicorn gthread)؛
+در حالت ASGI اتصال‌ها task حلقه رویداد هستند و درخواست‌ها در executor محدود اجرا می‌شوند.
+درخواست‌ها بدون شبکه مستقیم به اپلیکیشن داده می‌شوند تا فقط مدل همزمانی مقایسه شود.
+
+اجرا:
+    python benchmarks/bench_asgi.py --streams 2000 --requests 3000 --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import (DEFAULT_MIX, PASSWORD, FlaskClientDriver, generate_database, print_summary,  # noqa: E402
+                      replay, summarize, synthetic_mix)
+
+
+def rss_mb() -> float:
+    """حافظه مقیم پروسه (لینوکس)"""
+    try:
+        with open('/proc/self/statm') as stream:
+            return int(stream.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        return 0.0
+
+
+class ASGIDriver:
+    """ارسال درخواست به اپلیکیشن ASGI روی حلقه رویداد یک نخ جداگانه (بدون شبکه)"""
+
+    def __init__(self, application, loop):
+        self.application = application
+        self.loop = loop
+
+    def session(self, email: str):
+        client = {'cookie': None}
+        self.send(client, {'method': 'POST', 'path': '/login', 'form': {'email': email, 'password': PASSWORD}})
+        return client
+
+    def send(self, client, request: dict) -> tuple:
+        """خروجی: (کد وضعیت، بدنه JSON مسیرهای نوشتن یا None)"""
+        return asyncio.run_coroutine_threadsafe(self._send(client, request), self.loop).result()
+
+    async def _send(self, client, request: dict) -> tuple:
+        body = b''
+        headers = []
+        if 'json' in request:
+            body = json.dumps(request['json']).encode('utf-8')
+            headers.append((b'content-type', b'application/json'))
+        elif 'form' in request:
+            body = urlencode(request['form']).encode('utf-8')
+            headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+        headers.append((b'content-length', str(len(body)).encode()))
+        if client['cookie']:
+            headers.append((b'cookie', client['cookie'].encode('latin-1')))
+
+        path, _, query = request['path'].partition('?')
+        scope = asgi_scope(request['method'], path, query, headers)
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        status = []
+        chunks = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+                for name, value in message['headers']:
+                    if name == b'set-cookie':
+                        client['cookie'] = value.decode('latin-1').split(';', 1)[0]
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.application(scope, receive, send)
+        payload = None
+        if 'json' in request:
+            try:
+                payload = json.loads(b''.join(chunks))
+            except ValueError:
+                pass
+        return status[0], payload
+
+    def close(self):
+        pass
+
+
+def asgi_scope(method: str, path: str, query: str = '', headers=()) -> dict:
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode('utf-8'), 'root_path': '',
+        'query_string': query.encode('latin-1'), 'headers': list(headers),
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+    }
+
+
+def open_wsgi_streams(flask_app, cookie: str, count: int, received: list):
+    """هر اتصال SSE یک نخ که جریان WSGI را می‌خواند (مثل سرور چندنخی)"""
+    from werkzeug.test import EnvironBuilder
+
+    stop = threading.Event()
+    ready = threading.Semaphore(0)
+
+    def client():
+        environ = EnvironBuilder(path='/api/capacity/stream', headers={'Cookie': cookie}).get_environ()
+        result = flask_app(environ, lambda status, headers, exc_info=None: None)
+        try:
+            for index, chunk in enumerate(result):
+                if index == 1:
+                    ready.release()
+                if b'event: capacity' in chunk:
+                    received.append(time.perf_counter())
+                if stop.is_set():
+                    break
+        finally:
+            result.close()
+
+    for _ in range(count):
+        threading.Thread(target=client, daemon=True).start()
+    for _ in range(count):
+        ready.acquire()
+    return stop
+
+
+def open_asgi_streams(application, loop, cookie: str, count: int, received: list):
+    """هر اتصال SSE یک task روی حلقه رویداد"""
+    disconnect = asyncio.Event()
+    ready = threading.Semaphore(0)
+
+    async def client():
+        scope = asgi_scope('GET', '/api/capacity/stream', headers=[(b'cookie', cookie.encode('latin-1'))])
+        chunks = [0]
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            body = message.get('body', b'')
+            if body:
+                chunks[0] += 1
+                if chunks[0] == 2:
+                    ready.release()
+                if b'event: capacity' in body:
+                    received.append(time.perf_counter())
+
+        await application(scope, receive, send)
+
+    for _ in range(count):
+        asyncio.run_coroutine_threadsafe(client(), loop)
+    for _ in range(count):
+        ready.acquire()
+    return disconnect
+
+
+def run_mode(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        os.environ['FOOD_DB_PATH'] = db_path
+        os.environ.setdefault('FOOD_RATE_LIMIT', '0')
+        os.environ.setdefault('FOOD_PBKDF2_ITERATIONS', '1000')
+        with contextlib.redirect_stdout(sys.stderr):
+            context = generate_database(db_path, users=args.users, weeks=args.weeks)
+
+        import app as app_module
+
+        flask_app, db = app_module.app, app_module.db
+        requests = synthetic_mix(args.requests, context, DEFAULT_MIX, seed=1)
+        base_threads, base_rss = threading.active_count(), rss_mb()
+        received = []
+
+        if args.mode == 'wsgi':
+            driver = FlaskClientDriver(flask_app)
+            client = flask_app.test_client()
+            client.post('/login', data={'email': 'user0@bench.local', 'password': PASSWORD})
+            cookie = f"session={client.get_cookie('session').value}"
+            stop = open_wsgi_streams(flask_app, cookie, args.streams, received)
+        else:
+            from asgi import AsgiApp
+
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            application = AsgiApp(flask_app, db, workers=args.workers, max_concurrency=args.max_concurrency)
+            driver = ASGIDriver(application, loop)
+            cookie = driver.session('user0@bench.local')['cookie']
+            stop = open_asgi_streams(application, loop, cookie, args.streams, received)
+
+        threads, rss = threading.active_count() - base_threads, rss_mb() - base_rss
+
+        # زمان رسیدن یک تغییر ظرفیت به همه اتصال‌های بیکار
+        published = time.perf_counter()
+        db.capacity_events.publish(context['active_items'][0], 0, 0, 1)
+        deadline = time.monotonic() + 30
+        while len(received) < args.streams and time.monotonic() < deadline:
+            time.sleep(0.001)
+        fanout_ms = (max(received) - published) * 1000 if received else float('nan')
+        delivered = len(received)
+
+        run = replay(driver, requests, args.concurrency, context)
+
+        if args.mode == 'wsgi':
+            stop.set()
+        else:
+            loop.call_soon_threadsafe(stop.set)
+            asyncio.run_coroutine_threadsafe(application.shutdown(), loop).result()
+
+    print(json.dumps({'mode': args.mode, 'threads': threads, 'rss_mb': round(rss, 1),
+                      'fanout_ms': round(fanout_ms, 1), 'delivered': delivered,
+                      'summary': summarize(run)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--weeks', type=int, default=12)
+    parser.add_argument('--streams', type=int, default=2000, help='اتصال‌های SSE بیکار')
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=32, help='نخ‌های executor در حالت ASGI')
+    parser.add_argument('--max-concurrency', type=int, default=256)
+    parser.add_argument('--mode', choices=('both', 'wsgi', 'asgi'), default='both')
+    args = parser.parse_args()
+
+    if args.mode != 'both':
+        run_mode(args)
+        return
+
+    for mode in ('wsgi', 'asgi'):
+        command = [sys.executable, os.path.abspath(__file__), '--mode', mode] + [
+            f'--{name.replace("_", "-")}={value}' for name, value in vars(args).items() if name != 'mode']
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"\n== {mode}: {args.streams} اتصال SSE بیکار با {result['threads']} نخ اضافه، "
+              f"{result['rss_mb']} MB حافظه؛ رسیدن یک تغییر به همه {result['fanout_ms']} ms "
+              f"({result['delivered']} دریافت)")
+        print_summary(result['summary'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""بنچمارک پیش‌بینی آشپزخانه روی چند سال سابقه منو و رزرو
+
+دیتابیس با همان سازنده آزمون بار ساخته می‌شود (نام غذاها هر هفته تکرار می‌شوند).
+
+اجرا:
+    python benchmarks/bench_forecast.py --users 1000 --weeks 156 --runs 20
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest import generate_database  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--weeks', type=int, default=156)
+    parser.add_argument('--items-per-day', type=int, default=2)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    from database import Database
+    from kitchen_forecast import build_forecast
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'forecast.db')
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            generate_database(path, users=args.users, weeks=args.weeks, items_per_day=args.items_per_day)
+        print(f'دیتابیس {args.weeks} هفته در {time.perf_counter() - started:.1f} ثانیه ساخته شد')
+
+        db = Database(path)
+        try:
+            timings = []
+            for _ in range(args.runs):
+                db.menu_cache.invalidate()
+                started = time.perf_counter()
+                forecast = build_forecast(db, history_weeks=args.weeks)
+                timings.append(time.perf_counter() - started)
+            conn = db.get_connection()
+            reservations = conn.execute('SELECT COUNT(*) FROM reservations').fetchone()[0]
+            conn.close()
+        finally:
+            db.close()
+
+    timings.sort()
+    print(f'{reservations:,} رزرو، {len(forecast["items"])} غذای این هفته، '
+          f'سابقه {forecast["items"][0]["history_servings"]} وعده برای هر غذا')
+    print(f'پیش‌بینی: میانه {timings[len(timings) // 2] * 1000:.1f} ms، بیشینه {timings[-1] * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
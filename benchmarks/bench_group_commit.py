@@ -0,0 +1,103 @@
+"""بنچمارک هجوم رزرو در دقایق پایانی مهلت: commit جداگانه در برابر نویسنده دسته‌ای (group commit)
+
+اجرا:
+    python benchmarks/bench_group_commit.py --threads 32 --reservations 4000 --synchronous FULL
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+
+def prepare(path: str, users: int, items: int, capacity: int):
+    """دیتابیس خالی با یک منو و غذاهای پرظرفیت"""
+    db = Database(path)
+    db.init_db(with_sample_data=False)
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        'INSERT INTO users (employee_id, full_name, email, password) VALUES (?, ?, ?, ?)',
+        [(f'B{i:05d}', f'کاربر {i}', f'user{i}@bench.local', 'x') for i in range(1, users + 1)]
+    )
+    cursor.execute("INSERT INTO weekly_menus (week_start, week_end, reservation_deadline) "
+                   "VALUES ('2024-01-01', '2024-01-05', '2100-01-01 00:00:00')")
+    menu_id = cursor.lastrowid
+    cursor.executemany(
+        'INSERT INTO menu_items (weekly_menu_id, day_of_week, food_name, full_price, user_price, '
+        'company_share, capacity) VALUES (?, ?, ?, 100000, 60000, 40000, ?)',
+        [(menu_id, 'شنبه', f'غذا {i}', capacity) for i in range(items)]
+    )
+    item_ids = [row[0] for row in cursor.execute('SELECT id FROM menu_items ORDER BY id')]
+    conn.commit()
+    conn.close()
+    db.close()
+    return item_ids
+
+
+def run(path: str, item_ids, threads: int, reservations: int, synchronous: str, writer_options=None):
+    """ارسال رزروها از چند نخ همزمان؛ خروجی: (زمان، تعداد موفق، آمار نویسنده)"""
+    db = Database(path, pool_size=max(8, threads))
+    db.pool.synchronous = synchronous
+    if writer_options is not None:
+        db.start_writer(**writer_options)
+
+    per_thread = reservations // threads
+    confirmed = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        barrier.wait()
+        for i in range(per_thread):
+            item_id = item_ids[(index + i) % len(item_ids)]
+            success, _ = db.create_reservation(index + 1, item_id, 1)
+            confirmed[index] += success
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    writer_stats = db.get_writer_stats()
+    db.close()
+    return elapsed, sum(confirmed), writer_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--reservations', type=int, default=4000)
+    parser.add_argument('--items', type=int, default=20)
+    parser.add_argument('--synchronous', default='FULL', choices=['OFF', 'NORMAL', 'FULL'])
+    parser.add_argument('--max-batch', type=int, default=128)
+    parser.add_argument('--max-wait-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for mode in ('direct', 'writer'):
+            path = os.path.join(tmp, f'{mode}.db')
+            item_ids = prepare(path, args.threads, args.items, args.reservations)
+            options = None if mode == 'direct' else {'max_batch': args.max_batch, 'max_wait_ms': args.max_wait_ms}
+            elapsed, confirmed, writer_stats = run(path, item_ids, args.threads, args.reservations,
+                                                   args.synchronous, options)
+            results[mode] = confirmed / elapsed
+            print(f'{mode:7s} {confirmed} رزرو در {elapsed:.3f} ثانیه → {confirmed / elapsed:,.0f} رزرو/ثانیه')
+            if writer_stats:
+                print(f'        میانگین دسته {writer_stats["avg_batch_size"]}، بیشترین صف '
+                      f'{writer_stats["max_queue_depth"]}، انتظار صف {writer_stats["avg_queue_wait_ms"]} ms')
+
+        print(f'بهبود: {results["writer"] / results["direct"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""میکروبنچمارک تبدیل تاریخ شمسی: توابع قبلی app.py در برابر JalaliDateService
+
+اجرا:
+    python benchmarks/bench_jalali.py --rows 500 --renders 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime as dt, timedelta
+
+import jdatetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jalali_calendar import JalaliDateService  # noqa: E402
+
+
+# نسخه قبلی (برای مقایسه)
+def legacy_get_jalali_info():
+    now_jalali = jdatetime.datetime.now()
+
+    return {
+        'today': now_jalali.strftime('%Y/%m/%d'),
+        'today_full': now_jalali.strftime('%A %d %B %Y'),
+        'current_year': now_jalali.year,
+        'current_month': now_jalali.month,
+        'current_day': now_jalali.day,
+        'weekday': now_jalali.weekday()
+    }
+
+
+def legacy_convert_to_jalali(gregorian_date_str):
+    try:
+        if not gregorian_date_str:
+            return ""
+        if ' ' in gregorian_date_str:
+            date_part = gregorian_date_str.split(' ')[0]
+        else:
+            date_part = gregorian_date_str
+        gregorian_date = dt.strptime(date_part, '%Y-%m-%d')
+        jalali_date = jdatetime.datetime.fromgregorian(datetime=gregorian_date)
+        return jalali_date.strftime('%Y/%m/%d')
+    except:  # noqa: E722
+        return gregorian_date_str
+
+
+def make_rows(count: int):
+    """ستون‌های تاریخ یک جدول رزرو (تاریخ‌های یک سال اخیر با ساعت)"""
+    today = date.today()
+    rows = []
+    for _ in range(count):
+        day = today - timedelta(days=random.randint(0, 365))
+        rows.append(f'{day.isoformat()} {random.randint(8, 18):02d}:{random.randint(0, 59):02d}:00')
+    return rows
+
+
+def render(rows, convert, info):
+    info()
+    return [convert(value) for value in rows]
+
+
+def bench(name, rows, renders, convert, info):
+    started = time.perf_counter()
+    for _ in range(renders):
+        result = render(rows, convert, info)
+    elapsed = time.perf_counter() - started
+    per_render = elapsed / renders * 1000
+    print(f"{name:8s} {per_render:8.3f} ms/render  {elapsed / (renders * len(rows)) * 1e6:7.3f} µs/row")
+    return result, per_render
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--renders', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(1)
+    rows = make_rows(args.rows)
+    service = JalaliDateService()
+
+    legacy, legacy_ms = bench('legacy', rows, args.renders, legacy_convert_to_jalali, legacy_get_jalali_info)
+    cached, cached_ms = bench('service', rows, args.renders, service.to_jalali, service.get_info)
+
+    assert legacy == cached, 'خروجی دو پیاده‌سازی یکسان نیست'
+    print(f"speedup: {legacy_ms / cached_ms:.1f}x  {service.get_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""بنچمارک ورود: throughput احراز هویت در هر تنظیم هزینه هش رمز
+
+برای هر تنظیم:
+  سرد: هر کاربر یک بار وارد می‌شود (KDF کامل در استخر محدود)
+  گرم: همان کاربران دوباره وارد می‌شوند (کش ورودهای موفق)
+در طول هجوم سرد یک نخ جدا منوی هفته را می‌خواند تا تأخیر درخواست‌های دیگر دیده شود.
+
+اجرا:
+    python benchmarks/bench_login.py --users 64 --threads 32 --workers 4
+    python benchmarks/bench_login.py --costs pbkdf2_sha256:600000 scrypt:16384
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from credentials import PasswordHasher  # noqa: E402
+from database import Database  # noqa: E402
+
+PASSWORD = 'User@123!'
+DEFAULT_COSTS = ('pbkdf2_sha256:100000', 'pbkdf2_sha256:300000', 'pbkdf2_sha256:600000',
+                 'scrypt:16384', 'scrypt:32768')
+
+
+def make_hasher(cost: str, workers: int) -> PasswordHasher:
+    """'pbkdf2_sha256:600000' یا 'scrypt:16384' → PasswordHasher"""
+    scheme, value = cost.split(':')
+    if scheme == 'scrypt':
+        return PasswordHasher(scheme, scrypt_n=int(value), workers=workers, max_pending=1024)
+    return PasswordHasher(scheme, iterations=int(value), workers=workers, max_pending=1024)
+
+
+def prepare(path: str, hasher: PasswordHasher, users: int):
+    db = Database(path, pool_size=16, hasher=hasher)
+    db.init_db()
+    rows = [(i, f'L{i:05d}', f'کاربر {i}', f'login{i}@bench.local', PASSWORD, 'بنچمارک') for i in range(users)]
+    result = db.bulk_upsert_users(rows)
+    assert not result['errors'], result['errors']
+    return db
+
+
+def login_wave(db, users: int, threads: int):
+    """ورود همه کاربران از چند نخ همزمان؛ خروجی: (زمان، تعداد موفق)"""
+    succeeded = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        barrier.wait()
+        for i in range(index, users, threads):
+            succeeded[index] += db.authenticate_user(f'login{i}@bench.local', PASSWORD) is not None
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, sum(succeeded)
+
+
+def probe_latency(db, stop: threading.Event, samples: list):
+    """تأخیر یک درخواست سبک (منوی هفته) در طول هجوم ورود"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        db.menu_cache.invalidate()
+        db.get_weekly_menu()
+        samples.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.005)
+
+
+def bench(cost: str, args):
+    hasher = make_hasher(cost, args.workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = prepare(os.path.join(tmp, 'login.db'), hasher, args.users)
+        try:
+            stop = threading.Event()
+            samples = []
+            probe = threading.Thread(target=probe_latency, args=(db, stop, samples))
+            probe.start()
+            cold, cold_ok = login_wave(db, args.users, args.threads)
+            stop.set()
+            probe.join()
+            warm, warm_ok = login_wave(db, args.users, args.threads)
+        finally:
+            db.close()
+            hasher.close()
+
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95)] if samples else 0.0
+    print(f'{cost:24s} سرد {cold_ok / cold:8,.1f} ورود/ثانیه   گرم {warm_ok / warm:10,.0f} ورود/ثانیه   '
+          f'p95 منو در هجوم {p95:6.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='نخ‌های استخر KDF')
+    parser.add_argument('--costs', nargs='+', default=DEFAULT_COSTS)
+    args = parser.parse_args()
+
+    for cost in args.costs:
+        bench(cost, args)
+
+
+if __name__ == '__main__':
+    main()
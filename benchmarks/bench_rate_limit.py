@@ -0,0 +1,52 @@
+"""میکروبنچمارک محدودسازی نرخ: هزینه هر بررسی سطل توکن در store حافظه و SQLite
+
+اجرا:
+    python benchmarks/bench_rate_limit.py --checks 200000 --keys 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import DEFAULT_LIMITS, Limit, MemoryBucketStore, RateLimiter, SqliteBucketStore  # noqa: E402
+
+
+def bench(name: str, store, checks: int, keys: int):
+    """یک بررسی کامل مسیر /api/reserve (سطل کاربر و IP) به ازای هر درخواست"""
+    limiter = RateLimiter(store)
+    rules = [Limit(*rule) for rule in DEFAULT_LIMITS['reserve']]
+    rng = random.Random(1)
+    users = [rng.randrange(keys) for _ in range(checks)]
+
+    limited = 0
+    started = time.perf_counter()
+    for user_id in users:
+        allowed, _, _, _ = limiter.check('reserve', rules, user_id, f'10.0.{user_id % 250}.{user_id % 200}')
+        limited += not allowed
+    elapsed = time.perf_counter() - started
+
+    stats = store.get_stats()
+    print(f'{name:8s} {elapsed / checks * 1e6:8.2f} µs/درخواست   {checks / elapsed:12,.0f} درخواست/ثانیه   '
+          f'سطل‌ها {stats["buckets"]}   رد شده {limited}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=200000)
+    parser.add_argument('--keys', type=int, default=5000, help='تعداد کاربران متفاوت')
+    args = parser.parse_args()
+
+    bench('memory', MemoryBucketStore(), args.checks, args.keys)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteBucketStore(os.path.join(tmp, 'rate_limits.db'))
+        # SQLite چند مرتبه کندتر است؛ تعداد کمتری بررسی کافی است
+        bench('sqlite', store, max(1, args.checks // 20), args.keys)
+        store.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""بنچمارک حافظه و زمان خواندن ردیف‌ها: dict(sqlite3.Row) در برابر رکوردهای فشرده و خواندن جریانی
+
+اجرا:
+    python benchmarks/bench_records.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(name: str, func, runs: int = 3):
+    """بهترین زمان بدون tracemalloc، سپس حافظه نگه داشته شده نتیجه و بیشینه تخصیص در یک اجرای جدا"""
+    best = float('inf')
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:28s} {best * 1000:8.1f} ms   نگه داشته {retained / 1024 / 1024:7.1f} MB   '
+          f'بیشینه {peak / 1024 / 1024:7.1f} MB')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    from database import Database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'records.db'))
+        db.init_db(with_sample_data=False)
+        conn = db.get_connection()
+        conn.executemany('''
+        INSERT INTO users (employee_id, full_name, email, password, department)
+        VALUES (?, ?, ?, 'x', ?)
+        ''', ((f'EMP{i:06d}', f'کارمند شماره {i}', f'user{i}@company.com', f'واحد {i % 40}')
+              for i in range(args.rows)))
+        conn.commit()
+        conn.close()
+
+        def dict_rows():
+            # روش قبلی get_all_users
+            conn = db.get_connection()
+            try:
+                return [dict(row) for row in conn.execute('SELECT * FROM users ORDER BY created_at DESC')]
+            finally:
+                conn.close()
+
+        def streamed():
+            return sum(1 for _ in db.iter_users())
+
+        try:
+            measure('dict(sqlite3.Row) + SELECT *', dict_rows)
+            users = measure('رکورد User', db.get_all_users)
+            measure('iter_users (جریانی)', streamed)
+            print(f'{len(users):,} ردیف')
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
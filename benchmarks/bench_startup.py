@@ -0,0 +1,75 @@
+"""بنچمارک زمان راه‌اندازی: مقداردهی کامل در هر پروسه (حالت قدیم) در برابر اتصال به دیتابیس آماده
+
+اجرا:
+    python benchmarks/bench_startup.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# حالت قدیم: هر پروسه مهاجرت‌ها و بررسی داده‌های اولیه را اجرا می‌کند
+EAGER = '''
+import time
+import app
+started = time.perf_counter()
+app.db.init_db()
+app.db.get_weekly_menu()
+print(time.perf_counter() - started)
+'''
+
+# حالت جدید: فقط import و اولین کوئری (باز کردن اتصال)
+LAZY = '''
+import time
+import app
+started = time.perf_counter()
+app.db.get_weekly_menu()
+print(time.perf_counter() - started)
+'''
+
+
+def run_child(code: str, env: dict):
+    """اجرای کد در پروسه جدید؛ خروجی: (زمان کل پروسه، زمان آماده‌سازی دیتابیس تا اولین کوئری)"""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - started
+    lines = result.stdout.strip().splitlines()
+    return wall, float(lines[-1]) if lines else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, FOOD_DB_PATH=os.path.join(tmp, 'bench.db'))
+
+        # ساخت یک‌باره دیتابیس (مثل دستور init-db)
+        run_child('import app; app.db.init_db(); print(0)', env)
+
+        results = {}
+        for name, code in (('eager', EAGER), ('lazy', LAZY)):
+            run_child(code, env)  # گرم کردن کش فایل‌ها
+            timings = [run_child(code, env) for _ in range(args.runs)]
+            results[name] = timings
+
+    medians = {}
+    for name, timings in results.items():
+        wall = [t[0] for t in timings]
+        startup = [t[1] for t in timings]
+        medians[name] = statistics.median(startup)
+        print(f"{name:6s} init+first query median={medians[name] * 1000:8.2f} ms  "
+              f"process wall median={statistics.median(wall) * 1000:8.1f} ms")
+
+    print(f"speedup (init+first query): {medians['eager'] / medians['lazy']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
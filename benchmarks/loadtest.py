@@ -0,0 +1,456 @@
+"""آزمون بار: بازپخش ترافیک ساعت ناهار روی اپلیکیشن Flask
+
+مراحل:
+  1. ساخت دیتابیس مصنوعی با اندازه دلخواه (کاربران، هفته‌های منو، رزروها)
+  2. بازپخش ترکیب درخواست‌ها (/login، /user، /api/reserve، /api/get_foods_for_day، /admin)
+     با Flask test client یا یک سرور WSGI واقعی روی localhost
+  3. گزارش p50/p95/p99 و throughput برای هر مسیر؛ خطای HTTP جدا از شکست تجاری مسیرهای نوشتن
+     (پاسخ JSON با success: false، مثلاً ظرفیت پر) شمرده می‌شود
+  4. ذخیره baseline و شکست اجرا در صورت پسرفت
+
+نمونه:
+    python benchmarks/loadtest.py --users 2000 --weeks 52 --requests 5000 --save-baseline local
+    python benchmarks/loadtest.py --driver wsgi --compare local --tolerance 0.3
+    python benchmarks/loadtest.py --mix recorded.jsonl
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'User@123!'
+ADMIN_EMAIL = 'admin@bench.local'
+DAYS = ('شنبه', 'یکشنبه', 'دوشنبه', 'سه‌شنبه', 'چهارشنبه')
+
+# ترکیب پیش‌فرض درخواست‌ها در ساعت ناهار (وزن نسبی)
+DEFAULT_MIX = {
+    'login': 5,
+    'user': 30,
+    'reserve': 20,
+    'foods_for_day': 35,
+    'admin': 10,
+}
+
+
+# ---------------------------------------------------------------------------
+# دیتابیس مصنوعی
+# ---------------------------------------------------------------------------
+
+def generate_database(path: str, users: int = 1000, weeks: int = 12, items_per_day: int = 2,
+                      reservations_per_user_week: int = 3, seed: int = 1) -> dict:
+    """ساخت دیتابیس مصنوعی؛ خروجی: اطلاعات لازم برای تولید درخواست‌ها"""
+    from database import Database
+
+    rng = random.Random(seed)
+    database = Database(path)
+    database.init_db(with_sample_data=False)
+    # یک هش برای همه کاربران مصنوعی (هزینه از FOOD_PASSWORD_*)؛ هر ورود همچنان یک KDF کامل دارد
+    password_hash = database.hasher.hash(PASSWORD)
+    database.close()
+
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+
+    cursor.execute('BEGIN')
+    cursor.execute('''
+    INSERT INTO users (employee_id, full_name, email, password, department, is_admin)
+    VALUES ('BENCHADMIN', 'مدیر بنچمارک', ?, ?, 'IT', 1)
+    ''', (ADMIN_EMAIL, password_hash))
+    cursor.executemany('''
+    INSERT INTO users (employee_id, full_name, email, password, department, is_admin)
+    VALUES (?, ?, ?, ?, ?, 0)
+    ''', ((f'B{i:06d}', f'کارمند {i}', f'user{i}@bench.local', password_hash, f'dep{i % 12}')
+          for i in range(users)))
+
+    cursor.execute('SELECT id FROM users WHERE is_admin = 0')
+    user_ids = [row[0] for row in cursor.fetchall()]
+
+    first_week = date.today() - timedelta(weeks=weeks - 1)
+    active_menu_id = None
+    for week in range(weeks):
+        week_start = first_week + timedelta(weeks=week)
+        is_active = 1 if week == weeks - 1 else 0
+        cursor.execute('''
+        INSERT INTO weekly_menus (week_start, week_end, reservation_deadline, is_active)
+        VALUES (?, ?, ?, ?)
+        ''', (week_start.isoformat(), (week_start + timedelta(days=4)).isoformat(),
+              f'{(week_start + timedelta(days=3)).isoformat()} 18:00:00', is_active))
+        menu_id = cursor.lastrowid
+        if is_active:
+            active_menu_id = menu_id
+
+        capacity = max(10, users // items_per_day)
+        items = []
+        for day in DAYS:
+            for n in range(items_per_day):
+                price = rng.choice((40000, 45000, 50000, 60000))
+                items.append((menu_id, day, f'غذای {n + 1}', '', price, price * 0.6, price * 0.4, capacity))
+        cursor.executemany('''
+        INSERT INTO menu_items (weekly_menu_id, day_of_week, food_name, description, full_price,
+                                user_price, company_share, capacity)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', items)
+
+        # رزرو هفته‌های گذشته (هفته فعال در حین آزمون پر می‌شود)
+        if is_active:
+            continue
+        cursor.execute('SELECT id, user_price FROM menu_items WHERE weekly_menu_id = ?', (menu_id,))
+        menu_items = cursor.fetchall()
+        reservations = []
+        for user_id in user_ids:
+            for item_id, user_price in rng.sample(menu_items, min(reservations_per_user_week, len(menu_items))):
+                reservations.append((user_id, item_id, week_start.isoformat(), user_price))
+        cursor.executemany('''
+        INSERT INTO reservations (user_id, menu_item_id, reservation_date, quantity, paid_amount, status)
+        VALUES (?, ?, ?, 1, ?, 'CONFIRMED')
+        ''', reservations)
+        cursor.execute('''
+        UPDATE menu_items SET reserved_count = (
+            SELECT COALESCE(SUM(quantity), 0) FROM reservations WHERE menu_item_id = menu_items.id
+        ) WHERE weekly_menu_id = ?
+        ''', (menu_id,))
+
+    conn.commit()
+
+    cursor.execute('SELECT id FROM menu_items WHERE weekly_menu_id = ?', (active_menu_id,))
+    active_items = [row[0] for row in cursor.fetchall()]
+    conn.close()
+
+    # خلاصه آمار از روی رزروهای تولید شده
+    database = Database(path)
+    database.rebuild_menu_stats()
+    database.close()
+
+    return {
+        'users': users,
+        'active_menu_id': active_menu_id,
+        'active_items': active_items,
+    }
+
+
+# ---------------------------------------------------------------------------
+# تولید و بازپخش درخواست‌ها
+# ---------------------------------------------------------------------------
+
+def build_request(route: str, context: dict, rng: random.Random, user_index: int) -> dict:
+    """ساخت یک درخواست مصنوعی برای مسیر داده شده"""
+    if route == 'login':
+        return {'route': route, 'method': 'POST', 'path': '/login',
+                'form': {'email': f'user{user_index}@bench.local', 'password': PASSWORD}}
+    if route == 'user':
+        return {'route': route, 'method': 'GET', 'path': '/user'}
+    if route == 'reserve':
+        return {'route': route, 'method': 'POST', 'path': '/api/reserve',
+                'json': {'menu_item_id': rng.choice(context['active_items']), 'quantity': 1, 'is_extra': False}}
+    if route == 'foods_for_day':
+        query = urlencode({'weekly_menu_id': context['active_menu_id'], 'day_of_week': rng.choice(DAYS)})
+        return {'route': route, 'method': 'GET', 'path': f'/api/get_foods_for_day?{query}'}
+    if route == 'admin':
+        return {'route': route, 'method': 'GET', 'path': '/admin', 'as_admin': True}
+    raise ValueError(f'unknown route: {route}')
+
+
+def synthetic_mix(total: int, context: dict, mix: dict, seed: int = 1) -> list:
+    """ترکیب مصنوعی درخواست‌ها بر اساس وزن مسیرها"""
+    rng = random.Random(seed)
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    requests = []
+    for _ in range(total):
+        route = rng.choices(routes, weights)[0]
+        requests.append(build_request(route, context, rng, rng.randrange(context['users'])))
+    return requests
+
+
+def load_recorded_mix(path: str) -> list:
+    """خواندن ترکیب ضبط شده (هر خط JSONL یک درخواست: route، method، path، json/form، as_admin)"""
+    with open(path, encoding='utf-8') as stream:
+        return [json.loads(line) for line in stream if line.strip()]
+
+
+class FlaskClientDriver:
+    """ارسال درخواست با Flask test client (بدون شبکه)"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+
+    def session(self, email: str):
+        client = self.flask_app.test_client()
+        client.post('/login', data={'email': email, 'password': PASSWORD})
+        return client
+
+    def send(self, client, request: dict) -> tuple:
+        """خروجی: (کد وضعیت، بدنه JSON مسیرهای نوشتن یا None)"""
+        kwargs = {}
+        if 'json' in request:
+            kwargs['json'] = request['json']
+        if 'form' in request:
+            kwargs['data'] = request['form']
+        response = client.open(request['path'], method=request['method'], **kwargs)
+        payload = response.get_json(silent=True) if 'json' in request else None
+        response.close()
+        return response.status_code, payload
+
+    def close(self):
+        pass
+
+
+class WSGIServerDriver:
+    """ارسال درخواست HTTP به سرور WSGI واقعی (werkzeug، چندنخی) روی localhost"""
+
+    def __init__(self, flask_app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, flask_app, threaded=True, request_handler=QuietHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def session(self, email: str):
+        client = {'conn': http.client.HTTPConnection('127.0.0.1', self.port, timeout=30), 'cookie': None}
+        self.send(client, {'method': 'POST', 'path': '/login', 'form': {'email': email, 'password': PASSWORD}})
+        return client
+
+    def send(self, client, request: dict) -> tuple:
+        """خروجی: (کد وضعیت، بدنه JSON مسیرهای نوشتن یا None)"""
+        headers = {}
+        body = None
+        if 'json' in request:
+            body = json.dumps(request['json'])
+            headers['Content-Type'] = 'application/json'
+        elif 'form' in request:
+            body = urlencode(request['form'])
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if client['cookie']:
+            headers['Cookie'] = client['cookie']
+
+        conn = client['conn']
+        try:
+            conn.request(request['method'], request['path'], body=body, headers=headers)
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            conn.request(request['method'], request['path'], body=body, headers=headers)
+            response = conn.getresponse()
+        data = response.read()
+
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            client['cookie'] = cookie.split(';', 1)[0]
+
+        payload = None
+        if 'json' in request and (response.getheader('Content-Type') or '').startswith('application/json'):
+            try:
+                payload = json.loads(data)
+            except ValueError:
+                pass
+        return response.status, payload
+
+    def close(self):
+        self.server.shutdown()
+
+
+def replay(driver, requests: list, concurrency: int, context: dict) -> dict:
+    """اجرای درخواست‌ها با چند کاربر همزمان؛ خروجی: زمان‌های هر مسیر"""
+    results = {}
+    lock = threading.Lock()
+    position = [0]
+
+    def worker(index: int):
+        user_session = driver.session(f'user{index % context["users"]}@bench.local')
+        admin_session = None
+        local = {}
+        while True:
+            with lock:
+                if position[0] >= len(requests):
+                    break
+                request = requests[position[0]]
+                position[0] += 1
+
+            client = user_session
+            if request.get('as_admin'):
+                if admin_session is None:
+                    admin_session = driver.session(ADMIN_EMAIL)
+                client = admin_session
+
+            started = time.perf_counter()
+            try:
+                status, payload = driver.send(client, request)
+            except Exception:
+                status, payload = 599, None
+            elapsed = time.perf_counter() - started
+
+            entry = local.setdefault(request['route'], {'timings': [], 'errors': 0, 'failures': 0})
+            entry['timings'].append(elapsed)
+            if status >= 400:
+                entry['errors'] += 1
+            elif isinstance(payload, dict) and payload.get('success') is False:
+                # پاسخ 200 با success: false (ظرفیت پر، مهلت گذشته ...) خطا نیست ولی موفق هم نیست
+                entry['failures'] += 1
+
+        with lock:
+            for route, counts in local.items():
+                entry = results.setdefault(route, {'timings': [], 'errors': 0, 'failures': 0})
+                entry['timings'].extend(counts['timings'])
+                entry['errors'] += counts['errors']
+                entry['failures'] += counts['failures']
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {'elapsed': time.perf_counter() - started, 'routes': results}
+
+
+# ---------------------------------------------------------------------------
+# گزارش و baseline
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """صدک به روش nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(run: dict) -> dict:
+    summary = {}
+    total = 0
+    for route, entry in sorted(run['routes'].items()):
+        timings = sorted(entry['timings'])
+        total += len(timings)
+        summary[route] = {
+            'count': len(timings),
+            'errors': entry['errors'],
+            'failures': entry['failures'],
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'throughput': round(len(timings) / run['elapsed'], 1),
+        }
+    summary['_total'] = {'count': total, 'throughput': round(total / run['elapsed'], 1)}
+    return summary
+
+
+def print_summary(summary: dict):
+    print(f"{'route':15s} {'count':>7s} {'errors':>7s} {'failed':>7s} {'p50 ms':>9s} {'p95 ms':>9s} "
+          f"{'p99 ms':>9s} {'req/s':>9s}")
+    for route, row in summary.items():
+        if route == '_total':
+            continue
+        print(f"{route:15s} {row['count']:7d} {row['errors']:7d} {row['failures']:7d} {row['p50_ms']:9.2f} "
+              f"{row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['throughput']:9.1f}")
+    print(f"{'total':15s} {summary['_total']['count']:7d} {'':7s} {'':7s} {'':9s} {'':9s} {'':9s} "
+          f"{summary['_total']['throughput']:9.1f}")
+
+
+def compare_to_baseline(summary: dict, baseline: dict, tolerance: float) -> list:
+    """مقایسه با baseline؛ خروجی: فهرست پسرفت‌ها"""
+    regressions = []
+    for route, base in baseline.items():
+        current = summary.get(route)
+        if current is None:
+            continue
+        if route != '_total' and current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if current['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{route}: throughput {current['throughput']} < baseline {base['throughput']}")
+        if route != '_total' and current['errors'] > base.get('errors', 0):
+            regressions.append(f"{route}: errors {current['errors']} > baseline {base.get('errors', 0)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='مسیر دیتابیس (پیش‌فرض: فایل موقت مصنوعی)')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--weeks', type=int, default=12)
+    parser.add_argument('--items-per-day', type=int, default=2)
+    parser.add_argument('--reservations-per-week', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--driver', choices=('client', 'wsgi'), default='client')
+    parser.add_argument('--mix', help='فایل JSONL ترکیب ضبط شده درخواست‌ها')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--json', action='store_true', help='چاپ خلاصه به صورت JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'loadtest.db')
+        # مسیر دیتابیس باید پیش از اولین import ماژول database تنظیم شود
+        os.environ['FOOD_DB_PATH'] = db_path
+        # همه کاربران مجازی از یک IP می‌آیند؛ محدودسازی نرخ نتیجه آزمون بار را خراب می‌کند
+        os.environ.setdefault('FOOD_RATE_LIMIT', '0')
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stderr):
+            context = generate_database(db_path, users=args.users, weeks=args.weeks,
+                                        items_per_day=args.items_per_day,
+                                        reservations_per_user_week=args.reservations_per_week,
+                                        seed=args.seed)
+        print(f"generated database in {time.perf_counter() - started:.1f}s: {db_path}", file=sys.stderr)
+
+        import app as app_module
+
+        if args.mix:
+            requests = load_recorded_mix(args.mix)
+        else:
+            requests = synthetic_mix(args.requests, context, DEFAULT_MIX, seed=args.seed)
+
+        driver = FlaskClientDriver(app_module.app) if args.driver == 'client' else WSGIServerDriver(app_module.app)
+        try:
+            run = replay(driver, requests, args.concurrency, context)
+        finally:
+            driver.close()
+            app_module.db.close()
+
+    summary = summarize(run)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(summary, stream, indent=2)
+        print(f"baseline saved: {path}", file=sys.stderr)
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json'), encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        regressions = compare_to_baseline(summary, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against baseline", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
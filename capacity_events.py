@@ -0,0 +1,226 @@
+import asyncio
+import collections
+import json
+import queue
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+
+class Subscription:
+    """صف رویدادهای یک کلاینت متصل"""
+
+    __slots__ = ('queue', 'overflowed')
+
+    def __init__(self, max_queue: int):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, event: Dict) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+
+class AsyncSubscription:
+    """مشترک داخل حلقه asyncio (حالت ASGI)؛ بدون نخ جداگانه برای هر کلاینت
+
+    publish از نخ‌های درخواست صدا زده می‌شود؛ رویداد در deque (امن بین نخ‌ها) قرار می‌گیرد و
+    حلقه با call_soon_threadsafe بیدار می‌شود.
+    """
+
+    __slots__ = ('events', 'overflowed', 'closed', 'max_queue', '_loop', '_ready')
+
+    def __init__(self, max_queue: int, loop: asyncio.AbstractEventLoop):
+        self.events = collections.deque()
+        self.overflowed = False
+        self.closed = False
+        self.max_queue = max_queue
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def offer(self, event: Dict) -> bool:
+        if len(self.events) >= self.max_queue:
+            self.overflowed = True
+            return False
+        self.events.append(event)
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # حلقه بسته شده (خاموش شدن سرور)
+            return False
+        return True
+
+    def close(self):
+        """پایان جریان (قطع اتصال کلاینت یا خاموش شدن)؛ فقط از داخل حلقه"""
+        self.closed = True
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        """رویداد بعدی یا None پس از timeout یا بسته شدن"""
+        if not self.events and not self.closed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.closed or not self.events:
+            return None
+        return self.events.popleft()
+
+
+class CapacityBroadcaster:
+    """پخش تغییرات ظرفیت غذاها به همه کلاینت‌های SSE داخل همین پروسه"""
+
+    def __init__(self, max_queue: int = 256, keepalive: float = 15.0, snapshot_interval: float = 60.0):
+        self.max_queue = max_queue
+        self.keepalive = keepalive
+        # ارسال دوره‌ای وضعیت کامل (از کش منو) برای جبران تغییرات پروسه‌های دیگر
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._sequence = 0
+        self._stats = {
+            'published': 0,
+            'delivered': 0,
+            'overflows': 0,
+            'connections': 0,
+        }
+
+    def subscribe(self, subscription=None) -> Subscription:
+        subscription = subscription or Subscription(self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+            self._stats['connections'] += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, menu_item_id: int, delta: int, reserved_count: Optional[int] = None,
+                capacity: Optional[int] = None):
+        """ارسال تغییر reserved_count یک غذا به همه مشترک‌ها (بدون انتظار)"""
+        with self._lock:
+            if not self._subscribers:
+                return
+            self._sequence += 1
+            event = {'id': self._sequence, 'menu_item_id': menu_item_id, 'delta': delta}
+            if reserved_count is not None:
+                event['reserved_count'] = reserved_count
+            if capacity is not None:
+                event['capacity'] = capacity
+                if reserved_count is not None:
+                    event['remaining'] = capacity - reserved_count
+            subscribers = list(self._subscribers)
+            self._stats['published'] += 1
+
+        # کلاینت کند: رویدادها رها می‌شوند و وضعیت کامل دوباره فرستاده می‌شود (overflowed)
+        delivered = 0
+        for subscription in subscribers:
+            delivered += subscription.offer(event)
+
+        with self._lock:
+            self._stats['delivered'] += delivered
+            self._stats['overflows'] += len(subscribers) - delivered
+
+    def stream(self, snapshot_loader: Callable[[], Dict]) -> Iterator[str]:
+        """جریان متنی SSE: ابتدا وضعیت کامل، سپس تغییرات و keepalive"""
+        subscription = self.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            yield _format('snapshot', snapshot_loader())
+            next_snapshot = time.monotonic() + self.snapshot_interval
+
+            while True:
+                if subscription.overflowed or time.monotonic() >= next_snapshot:
+                    subscription.overflowed = False
+                    _drain(subscription.queue)
+                    yield _format('snapshot', snapshot_loader())
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+                    continue
+
+                timeout = min(self.keepalive, max(next_snapshot - time.monotonic(), 0))
+                try:
+                    event = subscription.queue.get(timeout=timeout)
+                except queue.Empty:
+                    # خط توضیح SSE؛ اتصال را از بسته شدن توسط proxy حفظ می‌کند
+                    yield ': keepalive\n\n'
+                    continue
+                yield _format('capacity', event, event['id'])
+        finally:
+            self.unsubscribe(subscription)
+
+    async def astream(self, snapshot_loader: Callable[[], Awaitable[Dict]],
+                      subscription: AsyncSubscription) -> AsyncIterator[str]:
+        """نسخه asyncio همان جریان SSE؛ snapshot_loader خواندن منو را به executor می‌سپارد"""
+        self.subscribe(subscription)
+        try:
+            yield 'retry: 3000\n\n'
+            yield _format('snapshot', await snapshot_loader())
+            next_snapshot = time.monotonic() + self.snapshot_interval
+
+            while not subscription.closed:
+                if subscription.overflowed or time.monotonic() >= next_snapshot:
+                    subscription.overflowed = False
+                    subscription.events.clear()
+                    yield _format('snapshot', await snapshot_loader())
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+                    continue
+
+                timeout = min(self.keepalive, max(next_snapshot - time.monotonic(), 0))
+                event = await subscription.get(timeout)
+                if event is None:
+                    if not subscription.closed:
+                        yield ': keepalive\n\n'
+                    continue
+                yield _format('capacity', event, event['id'])
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_stats(self) -> Dict:
+        """آمار مشترک‌ها و رویدادها"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = len(self._subscribers)
+        return stats
+
+
+def _format(event: str, data, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _drain(q: queue.Queue):
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+
+def menu_snapshot(weekly_menu: Optional[Dict]) -> Dict:
+    """وضعیت ظرفیت غذاهای منوی فعال (از کش منو؛ بدون کوئری برای هر کلاینت)"""
+    if not weekly_menu:
+        return {'weekly_menu_id': None, 'items': []}
+
+    return {
+        'weekly_menu_id': weekly_menu['id'],
+        'items': [
+            {
+                'menu_item_id': item['id'],
+                'reserved_count': item['reserved_count'],
+                'capacity': item['capacity'],
+                'remaining': item['capacity'] - item['reserved_count']
+            }
+            for item in weekly_menu['items']
+        ]
+    }
@@ -0,0 +1,276 @@
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """هیچ اتصال آزادی در زمان مقرر پیدا نشد"""
+
+
+class TimedCursor:
+    """cursor که زمان اجرای کوئری و تعداد ردیف‌های خوانده شده را به hook گزارش می‌دهد"""
+
+    def __init__(self, cursor: sqlite3.Cursor, hook):
+        self._cursor = cursor
+        self._hook = hook
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # row_factory و arraysize باید روی cursor واقعی بنشینند، نه روی این پوشش
+        if name in ('_cursor', '_hook'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        self._cursor.execute(sql, parameters)
+        self._hook.on_query(sql, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_parameters)
+        self._hook.on_query(sql, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._hook.on_rows(0 if row is None else 1, time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+        self._hook.on_rows(len(rows), time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._hook.on_rows(len(rows), time.perf_counter() - started)
+        return rows
+
+
+class PooledConnection:
+    """اتصال قرض گرفته شده از استخر؛ close آن را به استخر برمی‌گرداند"""
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+        return getattr(conn, name)
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        hook = self._pool.query_hook
+        return cursor if hook is None else TimedCursor(cursor, hook)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def close(self):
+        """برگرداندن اتصال به استخر (اتصال واقعی باز می‌ماند)"""
+        conn = self.__dict__.get('_conn')
+        if conn is not None:
+            self._conn = None
+            self._pool.release(conn)
+
+    def __del__(self):
+        # اتصال‌هایی که close نشده‌اند (مثلاً بعد از خطا) گم نشوند
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """استخر اتصال‌های ماندگار SQLite با حالت WAL"""
+
+    def __init__(self, db_name: str, max_size: int = 8, timeout: float = 30.0,
+                 busy_timeout_ms: int = 5000, cache_size_kb: int = 8192,
+                 synchronous: str = 'NORMAL', on_connect: Optional[Callable] = None):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.synchronous = synchronous
+        # hook اختیاری زمان‌سنجی کوئری‌ها (on_query و on_rows)
+        self.query_hook = None
+        # تنظیم اضافه هر اتصال تازه (مثلاً ATTACH دیتابیس بایگانی)
+        self.on_connect = on_connect
+
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            'connections_created': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'lock_retries': 0,
+            'lock_failures': 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        """ایجاد اتصال جدید و تنظیم pragmaها"""
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # برای بازگشت دیکشنری
+
+        # WAL: خواننده‌ها پشت نویسنده‌ها منتظر نمی‌مانند
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size={-int(self.cache_size_kb)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """گرفتن یک اتصال از استخر"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        waited = False
+        conn = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError('Connection pool is closed.')
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # جا رزرو می‌شود و اتصال بیرون از قفل ساخته می‌شود
+                    self._size += 1
+                    break
+
+                waited = True
+                remaining = timeout - (time.perf_counter() - started)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        raise PoolTimeout('connection pool exhausted')
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            created = True
+        else:
+            created = False
+
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._stats['checkouts'] += 1
+            if created:
+                self._stats['connections_created'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += elapsed
+                self._stats['max_wait_time'] = max(self._stats['max_wait_time'], elapsed)
+
+        return PooledConnection(self, conn)
+
+    def release(self, conn: sqlite3.Connection):
+        """برگرداندن اتصال به استخر"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # اتصال خراب است؛ دور انداخته می‌شود
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def run_with_retry(self, func: Callable, retries: int = 5, base_delay: float = 0.01):
+        """اجرای func با تلاش مجدد در صورت قفل بودن دیتابیس"""
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except sqlite3.OperationalError as e:
+                message = str(e)
+                if isinstance(e, PoolTimeout) or ('locked' not in message and 'busy' not in message):
+                    raise
+                if attempt >= retries:
+                    with self._cond:
+                        self._stats['lock_failures'] += 1
+                    raise
+
+                with self._cond:
+                    self._stats['lock_retries'] += 1
+                # backoff نمایی
+                time.sleep(base_delay * (2 ** attempt))
+                attempt += 1
+
+    def get_stats(self) -> Dict:
+        """آمار استخر اتصال"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+
+        waits = stats['waits']
+        stats['avg_wait_ms'] = round(stats['wait_time'] / waits * 1000, 3) if waits else 0.0
+        stats['wait_time'] = round(stats['wait_time'], 6)
+        stats['max_wait_time'] = round(stats['max_wait_time'], 6)
+        return stats
+
+    def close_all(self):
+        """بستن همه اتصال‌های آزاد؛ اتصال‌های در حال استفاده هنگام برگشت بسته می‌شوند"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,229 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# الگوریتم‌های پشتیبانی‌شده؛ رمزهای قدیمی بدون پیشوند متن ساده‌اند و در اولین ورود هش می‌شوند
+SCHEMES = ('pbkdf2_sha256', 'scrypt')
+
+# هزینه پیش‌فرض (توصیه OWASP برای PBKDF2-SHA256 و scrypt)
+DEFAULT_PBKDF2_ITERATIONS = 600000
+DEFAULT_SCRYPT_N = 2 ** 15
+DEFAULT_SCRYPT_R = 8
+DEFAULT_SCRYPT_P = 1
+
+
+class CredentialsBusy(RuntimeError):
+    """صف بررسی رمز پر است (هجوم ورود)؛ درخواست باید کمی بعد تکرار شود"""
+
+
+class PasswordHasher:
+    """هش و بررسی رمز عبور با هزینه قابل تنظیم
+
+    KDF در یک استخر نخ محدود اجرا می‌شود (hashlib هنگام محاسبه GIL را آزاد می‌کند)؛ پس هجوم ورود
+    حداکثر workers هسته را مشغول می‌کند و نخ‌های دیگر درخواست‌ها گرسنه نمی‌مانند. ورودهای موفق
+    اخیر با یک HMAC سریع در حافظه کش می‌شوند تا ورود دوباره همان کاربر KDF را تکرار نکند.
+    """
+
+    def __init__(self, scheme: str = 'pbkdf2_sha256', iterations: int = DEFAULT_PBKDF2_ITERATIONS,
+                 scrypt_n: int = DEFAULT_SCRYPT_N, scrypt_r: int = DEFAULT_SCRYPT_R, scrypt_p: int = DEFAULT_SCRYPT_P,
+                 workers: int = 4, max_pending: int = 64, wait_timeout: float = 10.0,
+                 cache_ttl: float = 300.0, cache_size: int = 10000):
+        if scheme not in SCHEMES:
+            raise ValueError(f"الگوریتم رمز پشتیبانی نمی‌شود: {scheme}")
+        self.scheme = scheme
+        self.iterations = iterations
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.wait_timeout = wait_timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kdf')
+        # درخواست‌های در حال اجرا یا منتظر استخر؛ بیش از این فوراً CredentialsBusy می‌گیرند
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self.workers = workers
+
+        # کلید تصادفی همین پروسه؛ کش فقط HMAC را نگه می‌دارد، نه رمز را
+        self._cache_key = secrets.token_bytes(32)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hashes': 0,
+            'verifications': 0,
+            'cache_hits': 0,
+            'failures': 0,
+            'legacy_upgrades': 0,
+            'rejected_busy': 0,
+            'kdf_time': 0.0,
+        }
+
+    # --- هش ---
+
+    def hash(self, password: str) -> str:
+        """هش رمز با الگوریتم و هزینه فعلی (در استخر KDF)"""
+        return self._run(self._hash, password)
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """هش دسته‌ای (درون‌ریزی کاربران)؛ همه workers موازی کار می‌کنند"""
+        return list(self._executor.map(self._hash, passwords))
+
+    def _hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        if self.scheme == 'scrypt':
+            params = (self.scrypt_n, self.scrypt_r, self.scrypt_p)
+            digest = self._derive('scrypt', password, salt, params)
+        else:
+            params = (self.iterations,)
+            digest = self._derive('pbkdf2_sha256', password, salt, params)
+        with self._lock:
+            self._stats['hashes'] += 1
+        return '$'.join([self.scheme, *(str(value) for value in params), _b64(salt), _b64(digest)])
+
+    def _derive(self, scheme: str, password: str, salt: bytes, params: tuple) -> bytes:
+        started = time.perf_counter()
+        if scheme == 'scrypt':
+            n, r, p = params
+            digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                    maxmem=256 * n * r + 1024 * 1024, dklen=32)
+        else:
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params[0])
+        with self._lock:
+            self._stats['kdf_time'] += time.perf_counter() - started
+        return digest
+
+    # --- بررسی ---
+
+    def verify(self, password: str, stored: str, cache_key: Optional[str] = None) -> Tuple[bool, bool]:
+        """بررسی رمز؛ خروجی: (درست است، باید دوباره هش شود)
+
+        cache_key (مثلاً شناسه کاربر) ورود موفق را برای cache_ttl ثانیه به خاطر می‌سپارد.
+        """
+        if not password or not stored:
+            return False, False
+
+        parts = stored.split('$')
+        if parts[0] not in SCHEMES:
+            # رمز قدیمی متن ساده؛ درست بودن یعنی همین الان باید هش شود
+            ok = hmac.compare_digest(password.encode(), stored.encode())
+            self._record(ok, legacy=ok)
+            return ok, ok
+
+        token = None
+        if cache_key is not None and self.cache_ttl > 0:
+            token = hmac.new(self._cache_key, f'{cache_key}\0{stored}\0{password}'.encode(),
+                             hashlib.sha256).digest()
+            if self._cache_hit(token):
+                return True, self.needs_rehash(stored)
+
+        ok = self._run(self._check, password, parts)
+        self._record(ok)
+        if ok and token is not None:
+            self._cache_put(token)
+        return ok, ok and self.needs_rehash(stored)
+
+    def _check(self, password: str, parts: List[str]) -> bool:
+        try:
+            scheme, params, salt, digest = parts[0], tuple(int(value) for value in parts[1:-2]), parts[-2], parts[-1]
+            expected = _unb64(digest)
+            actual = self._derive(scheme, password, _unb64(salt), params)
+        except (ValueError, TypeError):
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """رمز با الگوریتم یا هزینه‌ای غیر از تنظیم فعلی هش شده است"""
+        parts = stored.split('$')
+        if parts[0] != self.scheme:
+            return True
+        if self.scheme == 'scrypt':
+            return parts[1:4] != [str(self.scrypt_n), str(self.scrypt_r), str(self.scrypt_p)]
+        return parts[1] != str(self.iterations)
+
+    def _run(self, func, *args):
+        """اجرای KDF در استخر محدود؛ اگر صف تا wait_timeout جا باز نکند CredentialsBusy"""
+        if not self._pending.acquire(timeout=self.wait_timeout):
+            with self._lock:
+                self._stats['rejected_busy'] += 1
+            raise CredentialsBusy("سرور در حال حاضر شلوغ است؛ لحظاتی بعد دوباره تلاش کنید")
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            self._pending.release()
+
+    # --- کش ورودهای موفق ---
+
+    def _cache_hit(self, token: bytes) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires = self._cache.get(token)
+            if expires is None:
+                return False
+            if expires < now:
+                del self._cache[token]
+                return False
+            self._cache.move_to_end(token)
+            self._stats['verifications'] += 1
+            self._stats['cache_hits'] += 1
+            return True
+
+    def _cache_put(self, token: bytes):
+        with self._lock:
+            self._cache[token] = time.monotonic() + self.cache_ttl
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        """فراموش کردن همه ورودهای کش‌شده"""
+        with self._lock:
+            self._cache.clear()
+
+    def _record(self, ok: bool, legacy: bool = False):
+        with self._lock:
+            self._stats['verifications'] += 1
+            if not ok:
+                self._stats['failures'] += 1
+            if legacy:
+                self._stats['legacy_upgrades'] += 1
+
+    def get_stats(self) -> Dict:
+        """آمار هش و بررسی رمز"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = len(self._cache)
+        stats['scheme'] = self.scheme
+        stats['workers'] = self.workers
+        stats['kdf_time'] = round(stats['kdf_time'], 3)
+        return stats
+
+    def close(self):
+        """توقف استخر KDF"""
+        self._executor.shutdown(wait=True)
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def from_environ() -> PasswordHasher:
+    """تنظیم هزینه و ظرفیت از متغیرهای محیطی FOOD_PASSWORD_*"""
+    return PasswordHasher(
+        scheme=os.environ.get('FOOD_PASSWORD_SCHEME', 'pbkdf2_sha256'),
+        iterations=int(os.environ.get('FOOD_PBKDF2_ITERATIONS', DEFAULT_PBKDF2_ITERATIONS)),
+        scrypt_n=int(os.environ.get('FOOD_SCRYPT_N', DEFAULT_SCRYPT_N)),
+        workers=int(os.environ.get('FOOD_KDF_WORKERS', min(4, os.cpu_count() or 1))),
+        max_pending=int(os.environ.get('FOOD_KDF_MAX_PENDING', 64)),
+        cache_ttl=float(os.environ.get('FOOD_CREDENTIAL_CACHE_TTL', 300)),
+    )
@@ -1,95 +1,113 @@
 import sqlite3
 import os
-from datetime import datetime, timedelta
+import time
 from typing import Optional, Dict, List
-import jdatetime
+from connection_pool import ConnectionPool
+import archive
+import migrations
+from records import MenuItem, UserReservation, WaitlistEntry, row_factory
+from reservation_writer import ReservationWriter
+from storage import (Storage, USER_PUBLIC_COLUMNS, RESERVATION_OK, CAPACITY_FULL, ITEM_NOT_FOUND,
+                     IDEMPOTENCY_CONFLICT, CANCEL_OK, RESERVATION_NOT_FOUND, ALREADY_CANCELLED, DEADLINE_PASSED,
+                     WAITLIST_JOINED, ALREADY_WAITING, WAITLIST_NOT_FOUND, sample_users, sample_menu,
+                     _encode_cursor, _decode_cursor, _split_price, _menu_item_values, _shift_date, _shift_datetime,
+                     _deadline_passed, WEEKLY_MENU_ITEMS_SQL, FOODS_FOR_DAY_SQL, USERS_PAGE_SQL,
+                     USERS_CURSOR_CONDITION, USERS_SEARCH_CONDITION, user_reservations_sql)
 
-class Database:
-    def __init__(self, db_name='food_reservation.db'):
+class Database(Storage):
+    """پیاده‌سازی SQLite (فایل محلی، یک نویسنده)"""
+    
+    placeholder = '?'
+    
+    def __init__(self, db_name='food_reservation.db', pool_size=8, idempotency_ttl=24 * 3600, hasher=None,
+                 archive_path=None):
+        # سازنده هیچ I/O انجام نمی‌دهد؛ اسکیما با init_db (دستور init-db) ساخته می‌شود
+        super().__init__(idempotency_ttl, hasher)
         self.db_name = db_name
-        self.init_db()
+        self._next_idempotency_purge = 0.0
+        self._attached = False
+        # هفته‌های قدیمی در فایل بایگانی جداگانه (ATTACH روی هر اتصال)؛ تاریخچه از هر دو خوانده می‌شود
+        self.archive_path = archive_path
+        on_connect = None
+        if archive_path:
+            self.history_schemas = ('main.', 'archive.')
+            on_connect = lambda conn: archive.attach_archive(conn, archive_path)  # noqa: E731
+        self.pool = ConnectionPool(db_name, max_size=pool_size, on_connect=on_connect)
+        # نویسنده دسته‌ای رزروها (اختیاری؛ با start_writer فعال می‌شود)
+        self.writer = None
     
     def get_connection(self):
-        """ایجاد اتصال به دیتابیس"""
-        conn = sqlite3.connect(self.db_name)
-        conn.row_factory = sqlite3.Row  # برای بازگشت دیکشنری
+        """گرفتن اتصال از استخر (close اتصال را به استخر برمی‌گرداند)"""
+        conn = self.pool.acquire()
+        if not self._attached:
+            self._attach(conn)
         return conn
     
-    def init_db(self):
-        """ایجاد جداول دیتابیس"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # 1. جدول کاربران
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id TEXT UNIQUE NOT NULL,
-            full_name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            department TEXT,
-            is_active BOOLEAN DEFAULT 1,
-            is_admin BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # 2. جدول منوهای هفتگی
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weekly_menus (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            week_start DATE NOT NULL,
-            week_end DATE NOT NULL,
-            reservation_deadline DATETIME NOT NULL,
-            is_active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # 3. جدول آیتم‌های منو
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS menu_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            weekly_menu_id INTEGER NOT NULL,
-            day_of_week TEXT NOT NULL,
-            food_name TEXT NOT NULL,
-            description TEXT,
-            full_price REAL NOT NULL,
-            user_price REAL NOT NULL,
-            company_share REAL NOT NULL,
-            capacity INTEGER NOT NULL,
-            reserved_count INTEGER DEFAULT 0,
-            extra_food BOOLEAN DEFAULT 0,
-            extra_food_price REAL,
-            FOREIGN KEY (weekly_menu_id) REFERENCES weekly_menus(id) ON DELETE CASCADE
-        )
-        ''')
-        
-        # 4. جدول رزروها
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS reservations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            menu_item_id INTEGER NOT NULL,
-            reservation_date DATE NOT NULL,
-            quantity INTEGER DEFAULT 1,
-            is_extra BOOLEAN DEFAULT 0,
-            paid_amount REAL NOT NULL,
-            status TEXT DEFAULT 'PENDING',
-            reserved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (menu_item_id) REFERENCES menu_items(id) ON DELETE CASCADE
-        )
-        ''')
+    def _attach(self, conn):
+        """بررسی یک‌باره آماده بودن اسکیما در اولین اتصال"""
+        version = migrations.get_version(conn)
+        if version < migrations.SCHEMA_VERSION:
+            conn.close()
+            raise RuntimeError(
+                f"نسخه اسکیمای دیتابیس {version} است (مورد نیاز: {migrations.SCHEMA_VERSION}). "
+                f"ابتدا دستور 'flask --app app init-db' را اجرا کنید"
+            )
+        self._attached = True
+    
+    def get_pool_stats(self) -> Dict:
+        """آمار استخر اتصال‌ها"""
+        return self.pool.get_stats()
+    
+    def close(self):
+        """بستن همه اتصال‌ها"""
+        self.stop_writer()
+        self.pool.close_all()
+    
+    def start_writer(self, **options) -> ReservationWriter:
+        """فعال کردن ثبت دسته‌ای رزروها (group commit) در نخ جداگانه"""
+        if self.writer is None:
+            self.writer = ReservationWriter(self, **options).start()
+        return self.writer
+    
+    def stop_writer(self):
+        """ثبت رزروهای باقی‌مانده صف و برگشت به commit جداگانه"""
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.stop()
+    
+    def get_writer_stats(self) -> Optional[Dict]:
+        """آمار صف نویسنده رزروها"""
+        writer = self.writer
+        return writer.get_stats() if writer is not None else None
+    
+    def init_db(self, with_sample_data: bool = True):
+        """ایجاد/به‌روزرسانی جداول دیتابیس با مهاجرت‌های شماره‌دار"""
+        conn = self.pool.acquire()
         
-        # ایجاد داده‌های اولیه
-        self.create_initial_data(cursor)
+        try:
+            migrations.migrate(conn)
+            if self.archive_path:
+                archive.sync_schema(conn)
+            
+            # ایجاد داده‌های اولیه
+            if with_sample_data:
+                cursor = conn.cursor()
+                self.create_initial_data(cursor)
+                conn.commit()
+        finally:
+            conn.close()
         
-        conn.commit()
-        conn.close()
+        self._attached = True
         print("✅ پایگاه داده ایجاد شد")
     
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """کوئری‌های داغی که به اسکن کامل جدول می‌رسند"""
+        conn = self.get_connection()
+        try:
+            return migrations.check_query_plans(conn, self.history_schemas)
+        finally:
+            conn.close()
+    
     def create_initial_data(self, cursor):
         """ایجاد داده‌های اولیه"""
         # بررسی وجود کاربران
@@ -104,50 +122,19 @@ class Database:
     
     def _create_users(self, cursor):
         """ایجاد کاربران اولیه"""
-        users = [
-            ('ADMIN001', 'مدیر سیستم', 'admin@company.com', 'Admin@123!', 'IT', 1),
-            ('EMP001', 'رضا محمدی', 'reza@company.com', 'User@123!', 'فروش', 0),
-            ('EMP002', 'سارا احمدی', 'sara@company.com', 'User@123!', 'مالی', 0),
-            ('EMP003', 'علی کریمی', 'ali@company.com', 'User@123!', 'پشتیبانی', 0)
-        ]
-        
-        for user in users:
+        users = sample_users()
+        hashes = self.hasher.hash_many([user[3] for user in users])
+        for user, password_hash in zip(users, hashes):
             cursor.execute('''
             INSERT INTO users (employee_id, full_name, email, password, department, is_admin)
             VALUES (?, ?, ?, ?, ?, ?)
-            ''', user)
+            ''', user[:3] + (password_hash,) + user[4:])
         
         print("✅ کاربران اولیه ایجاد شدند")
     
     def _create_sample_menu(self, cursor):
         """ایجاد منوی نمونه با تاریخ شمسی"""
-        # تاریخ امروز به شمسی
-        today_jalali = jdatetime.datetime.now()
-        
-        # پیدا کردن شنبه این هفته
-        current_weekday = today_jalali.weekday()  # 0=شنبه, 1=یکشنبه, ...
-        
-        if current_weekday == 0:  # اگر امروز شنبه است
-            week_start = today_jalali
-        else:
-            # رفتن به شنبه گذشته
-            week_start = today_jalali - timedelta(days=current_weekday)
-        
-        # هفته کاری از شنبه تا چهارشنبه (5 روز)
-        week_end = week_start + timedelta(days=4)
-        
-        # مهلت رزرو: چهارشنبه ساعت ۱۸:۰۰
-        deadline = week_start + timedelta(days=3, hours=18)  # سه روز بعد از شنبه = چهارشنبه
-        
-        # تبدیل به رشته برای ذخیره در دیتابیس
-        week_start_str = week_start.strftime('%Y-%m-%d')
-        week_end_str = week_end.strftime('%Y-%m-%d')
-        deadline_str = deadline.togregorian().strftime('%Y-%m-%d %H:%M:%S')
-        
-        print(f"📅 ایجاد منوی هفته شمسی:")
-        print(f"   شروع: {week_start_str} ({week_start.strftime('%Y/%m/%d')} شمسی)")
-        print(f"   پایان: {week_end_str} ({week_end.strftime('%Y/%m/%d')} شمسی)")
-        print(f"   مهلت: {deadline_str}")
+        (week_start_str, week_end_str, deadline_str), foods = sample_menu()
         
         # ایجاد منوی هفتگی
         cursor.execute('''
@@ -157,39 +144,24 @@ class Database:
         
         weekly_menu_id = cursor.lastrowid
         
-        # روزهای هفته به فارسی
-        days_fa = ['شنبه', 'یکشنبه', 'دوشنبه', 'سه‌شنبه', 'چهارشنبه']
-        
-        # غذاهای نمونه برای هر روز (2 غذا برای هر روز)
-        foods = []
-        for i, day in enumerate(days_fa):
-            # غذا اول برای هر روز
-            foods.append((
-                weekly_menu_id, day, 'قیمه بادمجان', 'با گوشت گوساله و لپه', 50000, 30000, 20000, 50
-            ))
-            # غذا دوم برای هر روز (گزینه دوم)
-            foods.append((
-                weekly_menu_id, day, 'مرغ گریل شده', 'با سس مخصوص', 45000, 27000, 18000, 40
-            ))
-        
         for food in foods:
             cursor.execute('''
             INSERT INTO menu_items 
             (weekly_menu_id, day_of_week, food_name, description, full_price, user_price, company_share, capacity)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', food)
+            ''', (weekly_menu_id,) + food)
         
         print("✅ منوی نمونه (شمسی) ایجاد شد")
     
-    def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
-        """احراز هویت کاربر"""
+    def _get_login_user(self, email: str) -> Optional[Dict]:
+        """کاربر فعال با این ایمیل (ستون‌های عمومی به همراه password)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-        SELECT * FROM users 
-        WHERE email = ? AND password = ? AND is_active = 1
-        ''', (email, password))
+        cursor.execute(f'''
+        SELECT {USER_PUBLIC_COLUMNS}, password FROM users 
+        WHERE email = ? AND is_active = 1
+        ''', (email,))
         
         row = cursor.fetchone()
         conn.close()
@@ -198,8 +170,17 @@ class Database:
             return dict(row)
         return None
     
-    def get_weekly_menu(self) -> Optional[Dict]:
-        """دریافت منوی هفته جاری"""
+    def _set_password_hash(self, user_id: int, old_hash: str, new_hash: str):
+        """جایگزینی هش رمز، فقط اگر در این فاصله عوض نشده باشد"""
+        conn = self.get_connection()
+        try:
+            conn.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?', (new_hash, user_id, old_hash))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _load_weekly_menu(self) -> Optional[Dict]:
+        """خواندن منوی هفته جاری از دیتابیس"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -220,117 +201,387 @@ class Database:
         # تبدیل به دیکشنری
         menu = dict(menu_row)
         
-        # دریافت آیتم‌های منو
-        cursor.execute('''
-        SELECT * FROM menu_items 
-        WHERE weekly_menu_id = ? 
-        ORDER BY 
-            CASE day_of_week
-                WHEN 'شنبه' THEN 1
-                WHEN 'یکشنبه' THEN 2
-                WHEN 'دوشنبه' THEN 3
-                WHEN 'سه‌شنبه' THEN 4
-                WHEN 'چهارشنبه' THEN 5
-                ELSE 6
-            END
-        ''', (menu['id'],))
-        
-        items = []
-        for row in cursor.fetchall():
-            items.append(dict(row))
-        
-        menu['items'] = items
+        # دریافت آیتم‌های منو (رکورد فشرده به‌جای دیکشنری)
+        cursor.row_factory = row_factory(MenuItem)
+        cursor.execute(WEEKLY_MENU_ITEMS_SQL.format(p='?'), (menu['id'],))
+        
+        menu['items'] = cursor.fetchall()
         conn.close()
         
         return menu
     
-    def get_all_users(self) -> List[Dict]:
-        """دریافت همه کاربران"""
+    def _load_reserved_counts(self, weekly_menu_id: int) -> Dict[int, int]:
+        """خواندن تعداد رزرو شده آیتم‌های یک منو"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM users ORDER BY created_at DESC')
+        cursor.execute('SELECT id, reserved_count FROM menu_items WHERE weekly_menu_id = ?', (weekly_menu_id,))
+        counts = {row['id']: row['reserved_count'] for row in cursor.fetchall()}
         
-        users = []
-        for row in cursor.fetchall():
-            users.append(dict(row))
+        conn.close()
+        return counts
+    
+    def get_users_page(self, limit: int = 50, cursor: Optional[str] = None, department: Optional[str] = None,
+                       is_active: Optional[bool] = None, search: Optional[str] = None) -> Dict:
+        """یک صفحه از کاربران (صفحه‌بندی keyset روی created_at و id، بدون ستون password)"""
+        limit = max(1, min(int(limit), 200))
+        conditions = []
+        params = []
+        
+        if cursor:
+            created_at, user_id = _decode_cursor(cursor)
+            conditions.append(USERS_CURSOR_CONDITION.format(p='?'))
+            params.extend([created_at, user_id])
+        if department:
+            conditions.append('department = ?')
+            params.append(department)
+        if is_active is not None:
+            conditions.append('is_active = ?')
+            params.append(1 if is_active else 0)
+        if search:
+            upper = search + '\U0010ffff'
+            conditions.append(USERS_SEARCH_CONDITION.format(p='?'))
+            params.extend([search, upper, search, upper])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
         
+        conn = self.get_connection()
+        db_cursor = conn.cursor()
+        
+        db_cursor.execute(USERS_PAGE_SQL.format(where=where, p='?'), params + [limit + 1])
+        
+        users = [dict(row) for row in db_cursor.fetchall()]
         conn.close()
-        return users
+        
+        # یک ردیف اضافه خوانده می‌شود تا وجود صفحه بعد مشخص شود
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = _encode_cursor(users[-1]['created_at'], users[-1]['id'])
+        
+        return {'users': users, 'next_cursor': next_cursor}
+    
+    def iter_user_reservations(self, user_id: int, batch_size: int = 1000):
+        """رزروهای قطعی یک کاربر (دیتابیس اصلی و بایگانی) به صورت جریانی"""
+        # هر شاخه روی ایندکس (user_id, status, reserved_at) همان دیتابیس
+        sql = user_reservations_sql(self.history_schemas, '?')
+        return self._iter_query(sql, [user_id] * len(self.history_schemas), batch_size, record=UserReservation)
     
-    def get_user_reservations(self, user_id: int) -> List[Dict]:
-        """دریافت رزروهای یک کاربر"""
+    def _reserve(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                 idempotency_key: Optional[str]):
+        """ثبت رزرو مستقیم یا از طریق صف نویسنده دسته‌ای"""
+        writer = self.writer
+        if writer is not None:
+            result = writer.execute(user_id, menu_item_id, quantity, is_extra, idempotency_key)
+            # None: نویسنده همزمان متوقف شد؛ همین درخواست مستقیم ثبت می‌شود
+            if result is not None:
+                return result
+        
+        return self.pool.run_with_retry(
+            lambda: self._reserve_once(user_id, menu_item_id, quantity, is_extra, idempotency_key)
+        )
+    
+    def _reserve_once(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                      idempotency_key: Optional[str] = None):
+        """یک تلاش رزرو در تراکنش BEGIN IMMEDIATE؛ خروجی: (موفقیت، پیام، تکراری بودن)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        try:
+            # قفل نوشتن از همان ابتدا گرفته می‌شود تا ارتقای قفل در میانه تراکنش رخ ندهد
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            if idempotency_key is None:
+                success, message = self._reserve_in_transaction(cursor, user_id, menu_item_id, quantity, is_extra)
+                replayed = False
+            else:
+                success, message, replayed = self._reserve_idempotent(
+                    cursor, user_id, menu_item_id, quantity, is_extra, idempotency_key
+                )
+            
+            # رزرو ناموفق چیزی در menu_items ننوشته است؛ فقط کلید تکرار ذخیره می‌شود
+            if success or idempotency_key is not None:
+                conn.commit()
+            else:
+                conn.rollback()
+            return success, message, replayed
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _reserve_in_transaction(self, cursor, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        """ثبت رزرو داخل تراکنش باز؛ commit با فراخواننده است"""
+        # گرفتن ظرفیت با یک UPDATE شرطی (بدون امکان رزرو بیش از ظرفیت)
         cursor.execute('''
-        SELECT r.*, m.food_name, m.day_of_week
-        FROM reservations r
-        JOIN menu_items m ON r.menu_item_id = m.id
-        WHERE r.user_id = ? AND r.status = 'CONFIRMED'
-        ORDER BY r.reserved_at DESC
-        ''', (user_id,))
+        UPDATE menu_items 
+        SET reserved_count = reserved_count + ? 
+        WHERE id = ? AND reserved_count + ? <= capacity
+        RETURNING weekly_menu_id, user_price, company_share, extra_food, extra_food_price
+        ''', (quantity, menu_item_id, quantity))
+        menu_item = cursor.fetchone()
+        
+        if not menu_item:
+            cursor.execute('SELECT 1 FROM menu_items WHERE id = ?', (menu_item_id,))
+            if not cursor.fetchone():
+                return False, ITEM_NOT_FOUND
+            return False, CAPACITY_FULL
+        
+        # محاسبه مبلغ
+        if is_extra and menu_item['extra_food'] and menu_item['extra_food_price'] is not None:
+            paid_amount = menu_item['extra_food_price'] * quantity
+        else:
+            paid_amount = menu_item['user_price'] * quantity
         
-        reservations = []
-        for row in cursor.fetchall():
-            reservations.append(dict(row))
+        # ایجاد رزرو
+        cursor.execute('''
+        INSERT INTO reservations (user_id, menu_item_id, reservation_date, quantity, is_extra, paid_amount, status)
+        VALUES (?, ?, DATE('now'), ?, ?, ?, 'CONFIRMED')
+        ''', (user_id, menu_item_id, quantity, 1 if is_extra else 0, paid_amount))
         
-        conn.close()
-        return reservations
+        # به‌روزرسانی خلاصه آمار در همان تراکنش
+        self._update_menu_stats(cursor, menu_item['weekly_menu_id'], menu_item_id, quantity,
+                                menu_item['user_price'] * quantity, menu_item['company_share'] * quantity)
+        
+        return True, RESERVATION_OK
     
-    def create_reservation(self, user_id: int, menu_item_id: int, quantity: int = 1, is_extra: bool = False):
-        """ایجاد رزرو جدید"""
+    def _reserve_idempotent(self, cursor, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                            idempotency_key: str):
+        """رزرو با کلید تکرار داخل تراکنش باز؛ کلید دیده شده نتیجه ذخیره شده را برمی‌گرداند"""
+        now = time.time()
+        fingerprint = f"{menu_item_id}:{quantity}:{1 if is_extra else 0}"
+        
+        # حذف گاه‌به‌گاه کلیدهای منقضی (حداکثر هر دقیقه یک بار)
+        if now >= self._next_idempotency_purge:
+            self._next_idempotency_purge = now + 60
+            cursor.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (now - self.idempotency_ttl,))
+        
+        cursor.execute('''
+        SELECT request_fingerprint, success, message FROM idempotency_keys
+        WHERE user_id = ? AND idempotency_key = ? AND created_at >= ?
+        ''', (user_id, idempotency_key, now - self.idempotency_ttl))
+        stored = cursor.fetchone()
+        
+        if stored:
+            if stored['request_fingerprint'] != fingerprint:
+                return False, IDEMPOTENCY_CONFLICT, True
+            return bool(stored['success']), stored['message'], True
+        
+        success, message = self._reserve_in_transaction(cursor, user_id, menu_item_id, quantity, is_extra)
+        cursor.execute('''
+        INSERT OR REPLACE INTO idempotency_keys
+            (user_id, idempotency_key, request_fingerprint, success, message, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, idempotency_key, fingerprint, 1 if success else 0, message, now))
+        
+        return success, message, False
+    
+    def _update_menu_stats(self, cursor, weekly_menu_id: int, menu_item_id: int, quantity: int,
+                           user_share: float, company_share: float):
+        """افزودن به خلاصه آمار آیتم و جمع کل هفته"""
+        cursor.executemany('''
+        INSERT INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (weekly_menu_id, menu_item_id) DO UPDATE SET
+            confirmed_quantity = confirmed_quantity + excluded.confirmed_quantity,
+            user_share = user_share + excluded.user_share,
+            company_share = company_share + excluded.company_share
+        ''', [
+            (weekly_menu_id, menu_item_id, quantity, user_share, company_share),
+            (weekly_menu_id, 0, quantity, user_share, company_share)
+        ])
+    
+    def _cancel(self, user_id: int, reservation_id: int):
+        """لغو رزرو با تلاش مجدد روی قفل"""
+        return self.pool.run_with_retry(lambda: self._cancel_once(user_id, reservation_id))
+    
+    def _cancel_once(self, user_id: int, reservation_id: int):
+        """لغو رزرو، آزاد کردن ظرفیت و ارتقای صف انتظار در یک تراکنش BEGIN IMMEDIATE"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # دریافت اطلاعات غذا
-            cursor.execute('SELECT * FROM menu_items WHERE id = ?', (menu_item_id,))
-            menu_item = cursor.fetchone()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+            SELECT r.menu_item_id, r.quantity, r.status, m.weekly_menu_id, m.user_price, m.company_share,
+                   w.reservation_deadline
+            FROM reservations r
+            JOIN menu_items m ON m.id = r.menu_item_id
+            JOIN weekly_menus w ON w.id = m.weekly_menu_id
+            WHERE r.id = ? AND r.user_id = ?
+            ''', (reservation_id, user_id))
+            reservation = cursor.fetchone()
             
-            if not menu_item:
-                conn.close()
-                return False, "غذا پیدا نشد"
+            if not reservation:
+                conn.rollback()
+                return False, RESERVATION_NOT_FOUND, None, 0, 0
+            if reservation['status'] != 'CONFIRMED':
+                conn.rollback()
+                return False, ALREADY_CANCELLED, None, 0, 0
+            if _deadline_passed(reservation['reservation_deadline']):
+                conn.rollback()
+                return False, DEADLINE_PASSED, None, 0, 0
             
-            menu_item = dict(menu_item)
+            menu_item_id = reservation['menu_item_id']
+            quantity = reservation['quantity']
+            cursor.execute("UPDATE reservations SET status = 'CANCELLED' WHERE id = ?", (reservation_id,))
+            cursor.execute('UPDATE menu_items SET reserved_count = reserved_count - ? WHERE id = ?',
+                           (quantity, menu_item_id))
+            self._update_menu_stats(cursor, reservation['weekly_menu_id'], menu_item_id, -quantity,
+                                    -reservation['user_price'] * quantity, -reservation['company_share'] * quantity)
             
-            # بررسی ظرفیت
-            if menu_item['reserved_count'] + quantity > menu_item['capacity']:
-                conn.close()
-                return False, "ظرفیت کامل است"
+            promoted_quantity, promoted = self._promote_waitlist(cursor, menu_item_id)
+            conn.commit()
+            return True, CANCEL_OK, menu_item_id, promoted_quantity - quantity, promoted
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _promote_waitlist(self, cursor, menu_item_id: int):
+        """رزرو برای سر صف انتظار تا جایی که ظرفیت اجازه دهد؛ خروجی: (تعداد غذا، تعداد نفرات)"""
+        promoted_quantity = 0
+        promoted = 0
+        while True:
+            cursor.execute('''
+            SELECT id, user_id, quantity, is_extra FROM waitlist
+            WHERE menu_item_id = ? AND status = 'WAITING'
+            ORDER BY id LIMIT 1
+            ''', (menu_item_id,))
+            entry = cursor.fetchone()
+            if not entry:
+                break
             
-            # محاسبه مبلغ
-            if is_extra and menu_item['extra_food']:
-                paid_amount = menu_item['extra_food_price'] * quantity
-            else:
-                paid_amount = menu_item['user_price'] * quantity
+            success, _ = self._reserve_in_transaction(cursor, entry['user_id'], menu_item_id, entry['quantity'],
+                                                      bool(entry['is_extra']))
+            if not success:
+                # سر صف جا نمی‌شود؛ نفرات بعدی از او جلو نمی‌زنند (FIFO)
+                break
             
-            # ایجاد رزرو
+            cursor.execute("UPDATE waitlist SET status = 'PROMOTED', promoted_at = CURRENT_TIMESTAMP WHERE id = ?",
+                           (entry['id'],))
+            promoted_quantity += entry['quantity']
+            promoted += 1
+        
+        return promoted_quantity, promoted
+    
+    def _join_waitlist(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        """رزرو یا ورود به صف انتظار با تلاش مجدد روی قفل"""
+        return self.pool.run_with_retry(
+            lambda: self._join_waitlist_once(user_id, menu_item_id, quantity, is_extra)
+        )
+    
+    def _join_waitlist_once(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        """رزرو یا ورود به صف انتظار در یک تراکنش BEGIN IMMEDIATE"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
             cursor.execute('''
-            INSERT INTO reservations (user_id, menu_item_id, reservation_date, quantity, is_extra, paid_amount, status)
-            VALUES (?, ?, DATE('now'), ?, ?, ?, 'CONFIRMED')
-            ''', (user_id, menu_item_id, quantity, 1 if is_extra else 0, paid_amount))
+            SELECT w.reservation_deadline
+            FROM menu_items m
+            JOIN weekly_menus w ON w.id = m.weekly_menu_id
+            WHERE m.id = ?
+            ''', (menu_item_id,))
+            menu_item = cursor.fetchone()
             
-            # به‌روزرسانی تعداد رزرو شده
-            cursor.execute('''
-            UPDATE menu_items 
-            SET reserved_count = reserved_count + ? 
-            WHERE id = ?
-            ''', (quantity, menu_item_id))
+            if not menu_item:
+                conn.rollback()
+                return False, ITEM_NOT_FOUND, None
+            if _deadline_passed(menu_item['reservation_deadline']):
+                conn.rollback()
+                return False, DEADLINE_PASSED, None
             
-            conn.commit()
-            conn.close()
+            success, message = self._reserve_in_transaction(cursor, user_id, menu_item_id, quantity, is_extra)
+            if success:
+                conn.commit()
+                return True, message, None
             
-            return True, "رزرو با موفقیت ثبت شد"
+            cursor.execute('''
+            SELECT id FROM waitlist
+            WHERE user_id = ? AND menu_item_id = ? AND status = 'WAITING'
+            ''', (user_id, menu_item_id))
+            existing = cursor.fetchone()
+            if existing:
+                position = self._waitlist_position(cursor, menu_item_id, existing['id'])
+                conn.rollback()
+                return False, ALREADY_WAITING, position
             
-        except Exception as e:
+            cursor.execute('''
+            INSERT INTO waitlist (user_id, menu_item_id, quantity, is_extra)
+            VALUES (?, ?, ?, ?)
+            ''', (user_id, menu_item_id, quantity, 1 if is_extra else 0))
+            position = self._waitlist_position(cursor, menu_item_id, cursor.lastrowid)
+            conn.commit()
+            return True, WAITLIST_JOINED, position
+        except Exception:
             conn.rollback()
+            raise
+        finally:
             conn.close()
-            return False, f"خطا در ثبت رزرو: {str(e)}"
+    
+    @staticmethod
+    def _waitlist_position(cursor, menu_item_id: int, waitlist_id: int) -> int:
+        """جایگاه در صف: شمارش منتظران جلوتر روی ایندکس (menu_item_id, status, id)"""
+        cursor.execute('''
+        SELECT COUNT(*) FROM waitlist
+        WHERE menu_item_id = ? AND status = 'WAITING' AND id <= ?
+        ''', (menu_item_id, waitlist_id))
+        return cursor.fetchone()[0]
+    
+    def leave_waitlist(self, user_id: int, waitlist_id: int):
+        """خروج از صف انتظار"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute('''
+            UPDATE waitlist SET status = 'CANCELLED'
+            WHERE id = ? AND user_id = ? AND status = 'WAITING'
+            ''', (waitlist_id, user_id))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        if cursor.rowcount == 0:
+            return False, WAITLIST_NOT_FOUND
+        return True, "از لیست انتظار خارج شدید"
+    
+    def get_user_waitlist(self, user_id: int) -> List[WaitlistEntry]:
+        """درخواست‌های انتظار فعال کاربر با جایگاه در صف"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = row_factory(WaitlistEntry)
+            return cursor.execute('''
+            SELECT w.id, w.menu_item_id, w.quantity, w.created_at, m.food_name, m.day_of_week,
+                   (SELECT COUNT(*) FROM waitlist a
+                    WHERE a.menu_item_id = w.menu_item_id AND a.status = 'WAITING' AND a.id <= w.id) AS position
+            FROM waitlist w
+            JOIN menu_items m ON m.id = w.menu_item_id
+            WHERE w.user_id = ? AND w.status = 'WAITING'
+            ORDER BY w.id
+            ''', (user_id,)).fetchall()
+        finally:
+            conn.close()
+    
+    def _count_overbooked(self) -> int:
+        """تعداد غذاهایی که بیش از ظرفیت رزرو شده‌اند"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM menu_items WHERE reserved_count > capacity')
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
     
     def create_user(self, employee_id: str, full_name: str, email: str, password: str, 
                    department: str, is_admin: bool = False):
-        """ایجاد کاربر جدید"""
+        """ایجاد کاربر جدید (رمز هش‌شده ذخیره می‌شود)"""
+        if not password:
+            return False, "رمز عبور الزامی است"
+        password_hash = self.hasher.hash(password)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -338,7 +589,7 @@ class Database:
             cursor.execute('''
             INSERT INTO users (employee_id, full_name, email, password, department, is_admin)
             VALUES (?, ?, ?, ?, ?, ?)
-            ''', (employee_id, full_name, email, password, department, 1 if is_admin else 0))
+            ''', (employee_id, full_name, email, password_hash, department, 1 if is_admin else 0))
             
             conn.commit()
             conn.close()
@@ -356,6 +607,114 @@ class Database:
             conn.close()
             return False, f"خطای ناشناخته: {str(e)}"
     
+    def set_user_active(self, user_id: int, is_active: bool):
+        """فعال/غیرفعال کردن کاربر"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute('UPDATE users SET is_active = ? WHERE id = ?', (1 if is_active else 0, user_id))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        if cursor.rowcount == 0:
+            return False, "کاربر پیدا نشد"
+        return True, "کاربر فعال شد" if is_active else "کاربر غیرفعال شد"
+    
+    def bulk_upsert_users(self, rows: List[tuple]) -> Dict:
+        """درج دسته‌ای کاربران جدید و به‌روزرسانی دپارتمان کاربران موجود در یک تراکنش
+        
+        rows: (شماره ردیف، employee_id، full_name، email، password، department)
+        """
+        result = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': []}
+        if not rows:
+            return result
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        marks = ','.join('?' * len(rows))
+        
+        try:
+            # هش رمز کاربران جدید (کند) پیش از قفل نوشتن انجام می‌شود
+            cursor.execute(f'SELECT employee_id FROM users WHERE employee_id IN ({marks})', [row[1] for row in rows])
+            hashes = self._hash_new_user_passwords(rows, {row['employee_id'] for row in cursor.fetchall()})
+            
+            # قفل نوشتن از ابتدا گرفته می‌شود تا بین بررسی و درج کاربری اضافه نشود
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            cursor.execute(f'''
+            SELECT employee_id, email, department FROM users WHERE employee_id IN ({marks})
+            ''', [row[1] for row in rows])
+            by_employee_id = {row['employee_id']: row for row in cursor.fetchall()}
+            
+            cursor.execute(f'''
+            SELECT email FROM users WHERE email IN ({marks})
+            ''', [row[3] for row in rows])
+            taken_emails = {row['email'] for row in cursor.fetchall()}
+            
+            inserts = []
+            updates = []
+            seen_employee_ids = set()
+            seen_emails = set()
+            for row_number, employee_id, full_name, email, password, department in rows:
+                if employee_id in seen_employee_ids:
+                    result['errors'].append((row_number, "شماره پرسنلی در فایل تکراری است"))
+                    continue
+                if email in seen_emails:
+                    result['errors'].append((row_number, "ایمیل در فایل تکراری است"))
+                    continue
+                seen_employee_ids.add(employee_id)
+                seen_emails.add(email)
+                
+                existing = by_employee_id.get(employee_id)
+                if existing is None:
+                    if email in taken_emails:
+                        result['errors'].append((row_number, "این ایمیل قبلاً ثبت شده است"))
+                    else:
+                        password_hash = hashes.get(employee_id) or self.hasher.hash(password)
+                        inserts.append((employee_id, full_name, email, password_hash, department))
+                elif existing['email'] != email:
+                    result['errors'].append((row_number, "این شماره پرسنلی قبلاً با ایمیل دیگری ثبت شده است"))
+                elif existing['department'] != department:
+                    updates.append((department, employee_id))
+                else:
+                    result['unchanged'] += 1
+            
+            cursor.executemany('''
+            INSERT INTO users (employee_id, full_name, email, password, department, is_admin)
+            VALUES (?, ?, ?, ?, ?, 0)
+            ''', inserts)
+            cursor.executemany('UPDATE users SET department = ? WHERE employee_id = ?', updates)
+            
+            conn.commit()
+            result['inserted'] = len(inserts)
+            result['updated'] = len(updates)
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _iter_query(self, sql: str, params: list, batch_size: int = 1000, record=None):
+        """اجرای جریانی کوئری با fetchmany؛ اتصال تا پایان (یا بسته شدن) generator نگه داشته می‌شود"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            if record is not None:
+                cursor.row_factory = row_factory(record)
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if record is not None:
+                    yield from rows
+                else:
+                    for row in rows:
+                        yield dict(row)
+        finally:
+            conn.close()
+    
     def calculate_stats(self) -> Dict:
         """محاسبه آمار سیستم"""
         conn = self.get_connection()
@@ -373,33 +732,87 @@ class Database:
         result = cursor.fetchone()
         stats['total_users'] = result[0] if result else 0
         
-        # تعداد رزروهای این هفته
+        # تعداد رزروها و سهم شرکت و کاربران این هفته (از خلاصه آمار)
         cursor.execute('''
-        SELECT SUM(r.quantity) as total
-        FROM reservations r
-        JOIN menu_items m ON r.menu_item_id = m.id
-        JOIN weekly_menus w ON m.weekly_menu_id = w.id
-        WHERE w.is_active = 1 AND r.status = 'CONFIRMED'
+        SELECT 
+            SUM(s.confirmed_quantity) as total,
+            SUM(s.company_share) as company_total,
+            SUM(s.user_share) as user_total
+        FROM weekly_menus w
+        JOIN menu_stats s ON s.weekly_menu_id = w.id AND s.menu_item_id = 0
+        WHERE w.is_active = 1
         ''')
         result = cursor.fetchone()
         stats['total_reservations'] = result[0] if result and result[0] else 0
+        stats['total_company_share'] = result[1] if result and result[1] else 0
+        stats['total_user_share'] = result[2] if result and result[2] else 0
         
-        # سهم شرکت و کاربران
+        conn.close()
+        return stats
+    
+    def _rebuild_menu_stats(self, cursor):
+        """محاسبه دوباره خلاصه آمار از روی رزروها"""
+        cursor.execute('DELETE FROM menu_stats')
         cursor.execute('''
-        SELECT 
-            SUM(m.company_share * r.quantity) as company_total,
-            SUM(m.user_price * r.quantity) as user_total
+        INSERT INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+        SELECT m.weekly_menu_id, m.id, SUM(r.quantity), SUM(m.user_price * r.quantity), SUM(m.company_share * r.quantity)
         FROM reservations r
         JOIN menu_items m ON r.menu_item_id = m.id
-        JOIN weekly_menus w ON m.weekly_menu_id = w.id
-        WHERE w.is_active = 1 AND r.status = 'CONFIRMED'
+        WHERE r.status = 'CONFIRMED'
+        GROUP BY m.id
         ''')
-        result = cursor.fetchone()
-        stats['total_company_share'] = result[0] if result and result[0] else 0
-        stats['total_user_share'] = result[1] if result and result[1] else 0
+        cursor.execute('''
+        INSERT INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+        SELECT weekly_menu_id, 0, SUM(confirmed_quantity), SUM(user_share), SUM(company_share)
+        FROM menu_stats
+        WHERE menu_item_id != 0
+        GROUP BY weekly_menu_id
+        ''')
+    
+    def rebuild_menu_stats(self, verify_only: bool = False) -> List[Dict]:
+        """بررسی (و در صورت نیاز بازسازی) خلاصه آمار؛ خروجی: ردیف‌های دارای اختلاف"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        conn.close()
-        return stats
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            cursor.execute('''
+            SELECT weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share
+            FROM menu_stats
+            ''')
+            stored = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+            
+            self._rebuild_menu_stats(cursor)
+            
+            cursor.execute('''
+            SELECT weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share
+            FROM menu_stats
+            ''')
+            expected = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+            
+            drift = []
+            for key in sorted(stored.keys() | expected.keys()):
+                old = stored.get(key, (0, 0.0, 0.0))
+                new = expected.get(key, (0, 0.0, 0.0))
+                if old[0] != new[0] or abs(old[1] - new[1]) > 0.01 or abs(old[2] - new[2]) > 0.01:
+                    drift.append({
+                        'weekly_menu_id': key[0],
+                        'menu_item_id': key[1],
+                        'stored': dict(zip(('confirmed_quantity', 'user_share', 'company_share'), old)),
+                        'expected': dict(zip(('confirmed_quantity', 'user_share', 'company_share'), new))
+                    })
+            
+            if verify_only:
+                conn.rollback()
+            else:
+                conn.commit()
+            return drift
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
     
     # توابع جدید برای ایجاد منو و غذا
     def create_weekly_menu(self, week_start: str, week_end: str, reservation_deadline: str):
@@ -421,6 +834,7 @@ class Database:
             
             conn.commit()
             conn.close()
+            self.menu_cache.invalidate()
             return True, weekly_menu_id, "منوی هفته جدید ایجاد شد"
             
         except Exception as e:
@@ -436,43 +850,139 @@ class Database:
         
         try:
             # محاسبه ۶۰/۴۰
-            user_price = full_price * 0.6
-            company_share = full_price * 0.4
+            user_price, company_share = _split_price(full_price)
+            
+            cursor.execute(INSERT_MENU_ITEM_SQL, (weekly_menu_id, day_of_week, food_name, description, full_price,
+                                                  user_price, company_share, capacity, 1 if extra_food else 0, extra_food_price))
+            
+            conn.commit()
+            conn.close()
+            self.menu_cache.invalidate()
+            return True, "غذا با موفقیت اضافه شد"
+            
+        except Exception as e:
+            conn.rollback()
+            conn.close()
+            return False, f"خطا در اضافه کردن غذا: {str(e)}"
+    
+    def create_weekly_menu_bulk(self, week_start: str, week_end: str, reservation_deadline: str,
+                                items: List[Dict]):
+        """ایجاد منوی هفتگی همراه با همه غذاها در یک تراکنش"""
+        try:
+            rows = [_menu_item_values(item) for item in items]
+        except (KeyError, TypeError, ValueError) as e:
+            return False, None, f"اطلاعات غذا نامعتبر است: {str(e)}"
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            # غیرفعال کردن منوهای قبلی
+            cursor.execute("UPDATE weekly_menus SET is_active = 0 WHERE is_active = 1")
             
+            cursor.execute('''
+            INSERT INTO weekly_menus (week_start, week_end, reservation_deadline, is_active)
+            VALUES (?, ?, ?, ?)
+            ''', (week_start, week_end, reservation_deadline, 1))
+            weekly_menu_id = cursor.lastrowid
+            
+            cursor.executemany(INSERT_MENU_ITEM_SQL, [(weekly_menu_id,) + row for row in rows])
+            
+            conn.commit()
+            self.menu_cache.invalidate()
+            return True, weekly_menu_id, f"منوی هفته با {len(rows)} غذا ایجاد شد"
+            
+        except Exception as e:
+            conn.rollback()
+            return False, None, f"خطا در ایجاد منو: {str(e)}"
+        finally:
+            conn.close()
+    
+    def clone_weekly_menu(self, source_menu_id: Optional[int] = None, shift_days: int = 7,
+                          reservation_deadline: Optional[str] = None):
+        """کپی منوی یک هفته (پیش‌فرض: آخرین منو) با جابه‌جایی تاریخ‌ها"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            if source_menu_id is None:
+                cursor.execute('SELECT * FROM weekly_menus ORDER BY week_start DESC, id DESC LIMIT 1')
+            else:
+                cursor.execute('SELECT * FROM weekly_menus WHERE id = ?', (source_menu_id,))
+            source = cursor.fetchone()
+            
+            if not source:
+                conn.rollback()
+                return False, None, "منوی مبدأ پیدا نشد"
+            
+            week_start = _shift_date(source['week_start'], shift_days)
+            week_end = _shift_date(source['week_end'], shift_days)
+            if not reservation_deadline:
+                reservation_deadline = _shift_datetime(source['reservation_deadline'], shift_days)
+            
+            cursor.execute("UPDATE weekly_menus SET is_active = 0 WHERE is_active = 1")
+            cursor.execute('''
+            INSERT INTO weekly_menus (week_start, week_end, reservation_deadline, is_active)
+            VALUES (?, ?, ?, ?)
+            ''', (week_start, week_end, reservation_deadline, 1))
+            weekly_menu_id = cursor.lastrowid
+            
+            # کپی غذاها سمت دیتابیس با یک INSERT…SELECT (ظرفیت خالی)
             cursor.execute('''
             INSERT INTO menu_items 
             (weekly_menu_id, day_of_week, food_name, description, full_price, 
              user_price, company_share, capacity, extra_food, extra_food_price)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (weekly_menu_id, day_of_week, food_name, description, full_price,
-                  user_price, company_share, capacity, 1 if extra_food else 0, extra_food_price))
+            SELECT ?, day_of_week, food_name, description, full_price,
+                   user_price, company_share, capacity, extra_food, extra_food_price
+            FROM menu_items
+            WHERE weekly_menu_id = ?
+            ORDER BY id
+            ''', (weekly_menu_id, source['id']))
+            copied = cursor.rowcount
             
             conn.commit()
-            conn.close()
-            return True, "غذا با موفقیت اضافه شد"
+            self.menu_cache.invalidate()
+            return True, weekly_menu_id, f"منوی هفته با {copied} غذا کپی شد"
             
         except Exception as e:
             conn.rollback()
+            return False, None, f"خطا در کپی منو: {str(e)}"
+        finally:
             conn.close()
-            return False, f"خطا در اضافه کردن غذا: {str(e)}"
     
-    def get_foods_for_day(self, weekly_menu_id: int, day_of_week: str):
+    def get_foods_for_day(self, weekly_menu_id: int, day_of_week: str) -> List[MenuItem]:
         """دریافت غذاهای یک روز خاص"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = row_factory(MenuItem)
         
-        cursor.execute('''
-        SELECT * FROM menu_items 
-        WHERE weekly_menu_id = ? AND day_of_week = ?
-        ORDER BY id
-        ''', (weekly_menu_id, day_of_week))
-        
-        foods = []
-        for row in cursor.fetchall():
-            foods.append(dict(row))
+        cursor.execute(FOODS_FOR_DAY_SQL.format(p='?'), (weekly_menu_id, day_of_week))
         
+        foods = cursor.fetchall()
         conn.close()
         return foods
 
-# ایجاد نمونه دیتابیس
-db = Database()
\ No newline at end of file
+INSERT_MENU_ITEM_SQL = '''
+INSERT INTO menu_items 
+(weekly_menu_id, day_of_week, food_name, description, full_price, 
+ user_price, company_share, capacity, extra_food, extra_food_price)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def open_database(url: Optional[str] = None, **options) -> Storage:
+    """انتخاب backend از DATABASE_URL: postgresql://... یا sqlite:///path (پیش‌فرض FOOD_DB_PATH)"""
+    url = os.environ.get('DATABASE_URL', '') if url is None else url
+    if url.startswith(('postgres://', 'postgresql://')):
+        from pg_database import PostgresDatabase
+        return PostgresDatabase(url, **options)
+    options.setdefault('archive_path', os.environ.get('FOOD_ARCHIVE_DB'))
+    if url.startswith('sqlite:///'):
+        return Database(url[len('sqlite:///'):], **options)
+    return Database(os.environ.get('FOOD_DB_PATH', 'food_reservation.db'), **options)
+
+# ایجاد نمونه دیتابیس (بدون اتصال؛ اولین کوئری اتصال را باز می‌کند)
+db = open_database()
\ No newline at end of file
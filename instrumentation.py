@@ -0,0 +1,309 @@
+import bisect
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import Response, g, request, session, template_rendered, before_render_template
+
+# مرزهای هیستوگرام زمان پاسخ (ثانیه)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """هیستوگرام تجمعی با مرزهای ثابت (قالب Prometheus)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestStats:
+    """خلاصه یک درخواست: تعداد کوئری، ردیف‌ها، زمان دیتابیس و رندر"""
+
+    __slots__ = ('queries', 'rows', 'db_time', 'render_time', 'render_started')
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+
+
+class Instrumentation:
+    """ابزار اندازه‌گیری اختیاری: زمان کوئری‌ها، هیستوگرام مسیرها و پروفایل درخواست‌های کند"""
+
+    def __init__(self, slow_threshold_ms: float = 500.0, profile_dir: Optional[str] = None,
+                 profile_sample_rate: float = 0.0, metrics_token: Optional[str] = None):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.profile_dir = profile_dir
+        self.profile_sample_rate = profile_sample_rate if profile_dir else 0.0
+        self.metrics_token = metrics_token
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._routes = {}
+        self._db = {'queries': 0, 'rows': 0, 'query_time': 0.0, 'fetch_time': 0.0}
+        self._slow_requests = 0
+        self._profiles_written = 0
+        self.database = None
+
+    def init_app(self, app, database):
+        """اتصال به برنامه Flask و استخر اتصال دیتابیس"""
+        self.database = database
+        database.pool.query_hook = self
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.extensions['instrumentation'] = self
+
+    # hook استخر اتصال؛ از هر نخی صدا زده می‌شود
+    def on_query(self, sql: str, seconds: float):
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            current.queries += 1
+            current.db_time += seconds
+        with self._lock:
+            self._db['queries'] += 1
+            self._db['query_time'] += seconds
+
+    def on_rows(self, count: int, seconds: float):
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            current.rows += count
+            current.db_time += seconds
+        with self._lock:
+            self._db['rows'] += count
+            self._db['fetch_time'] += seconds
+
+    def _before_render(self, sender, template, context, **extra):
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            current.render_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        current = getattr(self._local, 'current', None)
+        if current is not None and current.render_started is not None:
+            current.render_time += time.perf_counter() - current.render_started
+            current.render_started = None
+
+    def _before_request(self):
+        self._local.current = RequestStats()
+        g.instrumentation_started = time.perf_counter()
+        g.instrumentation_profiler = None
+
+        if self.profile_sample_rate and random.random() < self.profile_sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # پروفایلر دیگری روی همین نخ فعال است
+                return
+            g.instrumentation_profiler = profiler
+
+    def _after_request(self, response):
+        current = getattr(self._local, 'current', None)
+        started = g.get('instrumentation_started')
+        if current is None or started is None:
+            return response
+
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        key = (route, request.method)
+
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = {
+                    'latency': Histogram(), 'queries': 0, 'rows': 0,
+                    'db_time': 0.0, 'render_time': 0.0, 'errors': 0
+                }
+            stats['latency'].observe(elapsed)
+            stats['queries'] += current.queries
+            stats['rows'] += current.rows
+            stats['db_time'] += current.db_time
+            stats['render_time'] += current.render_time
+            if response.status_code >= 500:
+                stats['errors'] += 1
+            if elapsed >= self.slow_threshold:
+                self._slow_requests += 1
+
+        # خلاصه درخواست برای ابزار توسعه‌دهنده مرورگر
+        response.headers['Server-Timing'] = (
+            f'db;dur={current.db_time * 1000:.2f}, '
+            f'render;dur={current.render_time * 1000:.2f}, '
+            f'total;dur={elapsed * 1000:.2f}'
+        )
+        response.headers['X-DB-Queries'] = str(current.queries)
+        response.headers['X-DB-Rows'] = str(current.rows)
+
+        profiler = g.get('instrumentation_profiler')
+        if profiler is not None:
+            profiler.disable()
+            g.instrumentation_profiler = None
+            if elapsed >= self.slow_threshold:
+                self._dump_profile(profiler, route, request.method, elapsed)
+
+        return response
+
+    def _teardown_request(self, exc=None):
+        profiler = g.get('instrumentation_profiler')
+        if profiler is not None:
+            profiler.disable()
+        self._local.current = None
+
+    def _dump_profile(self, profiler: cProfile.Profile, route: str, method: str, elapsed: float):
+        """ذخیره خروجی cProfile (قابل نمایش با snakeviz یا flameprof)"""
+        with self._lock:
+            self._profiles_written += 1
+            sequence = self._profiles_written
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        filename = (f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{sequence}'
+                    f'_{method}_{slug}_{int(elapsed * 1000)}ms.prof')
+        profiler.dump_stats(os.path.join(self.profile_dir, filename))
+
+    def get_stats(self) -> Dict:
+        """خلاصه آمار مسیرها و دیتابیس"""
+        with self._lock:
+            routes = {}
+            for (route, method), stats in self._routes.items():
+                count = stats['latency'].count
+                routes[f'{method} {route}'] = {
+                    'requests': count,
+                    'avg_ms': round(stats['latency'].sum / count * 1000, 3) if count else 0.0,
+                    'avg_queries': round(stats['queries'] / count, 2) if count else 0.0,
+                    'avg_db_ms': round(stats['db_time'] / count * 1000, 3) if count else 0.0,
+                    'avg_render_ms': round(stats['render_time'] / count * 1000, 3) if count else 0.0,
+                    'errors': stats['errors']
+                }
+            return {
+                'routes': routes,
+                'db': dict(self._db),
+                'slow_requests': self._slow_requests,
+                'profiles_written': self._profiles_written
+            }
+
+    def render_metrics(self) -> str:
+        """خروجی متنی Prometheus"""
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            routes = sorted(self._routes.items())
+            db_stats = dict(self._db)
+            slow_requests = self._slow_requests
+
+            metric('food_request_duration_seconds', 'histogram', 'Request latency per route')
+            for (route, method), stats in routes:
+                labels = f'route="{_escape(route)}",method="{method}"'
+                for bound, total in stats['latency'].cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'food_request_duration_seconds_bucket{{{labels},le="{le}"}} {total}')
+                lines.append(f'food_request_duration_seconds_sum{{{labels}}} {stats["latency"].sum:.6f}')
+                lines.append(f'food_request_duration_seconds_count{{{labels}}} {stats["latency"].count}')
+
+            for name, field, help_text in (
+                ('food_request_db_queries_total', 'queries', 'Queries executed while serving the route'),
+                ('food_request_db_rows_total', 'rows', 'Rows fetched while serving the route'),
+                ('food_request_db_seconds_total', 'db_time', 'Database time spent by the route'),
+                ('food_request_render_seconds_total', 'render_time', 'Template render time spent by the route'),
+                ('food_request_errors_total', 'errors', 'Responses with 5xx status'),
+            ):
+                metric(name, 'counter', help_text)
+                for (route, method), stats in routes:
+                    value = stats[field]
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{{route="{_escape(route)}",method="{method}"}} {value}')
+
+        metric('food_db_queries_total', 'counter', 'Queries executed on pooled connections')
+        lines.append(f'food_db_queries_total {db_stats["queries"]}')
+        metric('food_db_rows_fetched_total', 'counter', 'Rows fetched from pooled connections')
+        lines.append(f'food_db_rows_fetched_total {db_stats["rows"]}')
+        metric('food_db_seconds_total', 'counter', 'Time spent executing queries and fetching rows')
+        lines.append(f'food_db_seconds_total{{phase="execute"}} {db_stats["query_time"]:.6f}')
+        lines.append(f'food_db_seconds_total{{phase="fetch"}} {db_stats["fetch_time"]:.6f}')
+        metric('food_slow_requests_total', 'counter', 'Requests slower than the profiling threshold')
+        lines.append(f'food_slow_requests_total {slow_requests}')
+
+        if self.database is not None:
+            pool = self.database.get_pool_stats()
+            metric('food_db_pool_connections', 'gauge', 'Pooled SQLite connections by state')
+            lines.append(f'food_db_pool_connections{{state="idle"}} {pool["idle"]}')
+            lines.append(f'food_db_pool_connections{{state="in_use"}} {pool["in_use"]}')
+            metric('food_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection')
+            lines.append(f'food_db_pool_wait_seconds_total {pool["wait_time"]}')
+            metric('food_db_lock_retries_total', 'counter', 'Retries after database is locked errors')
+            lines.append(f'food_db_lock_retries_total {pool["lock_retries"]}')
+
+            writer = self.database.get_writer_stats()
+            if writer is not None:
+                metric('food_writer_queue_depth', 'gauge', 'Reservations waiting for the group-commit writer')
+                lines.append(f'food_writer_queue_depth {writer["queue_depth"]}')
+                metric('food_writer_batches_total', 'counter', 'Group-commit transactions')
+                lines.append(f'food_writer_batches_total {writer["batches"]}')
+                metric('food_writer_commands_total', 'counter', 'Reservations committed by the writer')
+                lines.append(f'food_writer_commands_total {writer["commands"]}')
+                metric('food_writer_rejected_total', 'counter', 'Reservations rejected because the queue was full')
+                lines.append(f'food_writer_rejected_total {writer["rejected"]}')
+
+            cache = self.database.get_menu_cache_stats()
+            metric('food_menu_cache_requests_total', 'counter', 'Weekly menu cache lookups')
+            lines.append(f'food_menu_cache_requests_total{{result="hit"}} {cache["hits"]}')
+            lines.append(f'food_menu_cache_requests_total{{result="miss"}} {cache["misses"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        """endpoint متریک‌ها؛ فقط مدیر یا توکن Bearer"""
+        authorized = session.get('is_admin')
+        if not authorized and self.metrics_token:
+            authorized = request.headers.get('Authorization') == f'Bearer {self.metrics_token}'
+        if not authorized:
+            return Response('forbidden\n', status=403, mimetype='text/plain')
+
+        return Response(self.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def from_environ(app, database) -> Optional[Instrumentation]:
+    """فعال‌سازی با FOOD_INSTRUMENTATION=1 (پیش‌فرض خاموش)"""
+    if os.environ.get('FOOD_INSTRUMENTATION') != '1':
+        return None
+
+    instrumentation = Instrumentation(
+        slow_threshold_ms=float(os.environ.get('FOOD_SLOW_REQUEST_MS', 500)),
+        profile_dir=os.environ.get('FOOD_PROFILE_DIR'),
+        profile_sample_rate=float(os.environ.get('FOOD_PROFILE_SAMPLE_RATE', 0.1)),
+        metrics_token=os.environ.get('FOOD_METRICS_TOKEN')
+    )
+    instrumentation.init_app(app, database)
+    return instrumentation
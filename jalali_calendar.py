@@ -0,0 +1,259 @@
+# jalali_calendar.py
+import threading
+import jdatetime
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# شماره روزهای هفته در jdatetime: 0=شنبه، 1=یکشنبه، ... 6=جمعه
+DAY_NAMES = ('شنبه', 'یکشنبه', 'دوشنبه', 'سه‌شنبه', 'چهارشنبه', 'پنجشنبه', 'جمعه')
+
+MONTH_NAMES = ('فروردین', 'اردیبهشت', 'خرداد', 'تیر', 'مرداد', 'شهریور',
+               'مهر', 'آبان', 'آذر', 'دی', 'بهمن', 'اسفند')
+
+
+class JalaliDateService:
+    """تبدیل تاریخ میلادی/شمسی با جدول از پیش محاسبه شده و کش LRU"""
+
+    def __init__(self, years_back: int = 1, years_ahead: int = 1, cache_size: int = 4096):
+        self.years_back = years_back
+        self.years_ahead = years_ahead
+
+        self._lock = threading.Lock()
+        self._to_jalali = None
+        self._to_gregorian = None
+        self._info_day = None
+        self._info = None
+
+        # تاریخ‌های خارج از جدول (سال‌های قدیمی) در کش LRU محدود نگه داشته می‌شوند
+        self._convert = lru_cache(maxsize=cache_size)(self._convert_uncached)
+        self._convert_back = lru_cache(maxsize=cache_size)(self._convert_back_uncached)
+
+    def _build_tables(self):
+        """ساخت جدول دوطرفه برای سال‌های فعال (یک‌بار، در اولین استفاده)"""
+        today = date.today()
+        day = date(today.year - self.years_back, 1, 1)
+        end = date(today.year + self.years_ahead, 12, 31)
+        jalali_day = jdatetime.date.fromgregorian(date=day)
+        one_day = timedelta(days=1)
+
+        to_jalali = {}
+        to_gregorian = {}
+        while day <= end:
+            gregorian_str = day.isoformat()
+            jalali_str = f'{jalali_day.year:04d}/{jalali_day.month:02d}/{jalali_day.day:02d}'
+            to_jalali[gregorian_str] = jalali_str
+            to_gregorian[jalali_str] = gregorian_str
+            day += one_day
+            jalali_day += one_day
+
+        self._to_jalali = to_jalali
+        self._to_gregorian = to_gregorian
+
+    def _tables(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        if self._to_jalali is None:
+            with self._lock:
+                if self._to_jalali is None:
+                    self._build_tables()
+        return self._to_jalali, self._to_gregorian
+
+    @staticmethod
+    def _convert_uncached(date_part: str) -> Optional[str]:
+        try:
+            gregorian_date = datetime.strptime(date_part, '%Y-%m-%d')
+        except ValueError:
+            return None
+        return jdatetime.date.fromgregorian(date=gregorian_date.date()).strftime('%Y/%m/%d')
+
+    @staticmethod
+    def _convert_back_uncached(jalali_str: str) -> Optional[str]:
+        try:
+            year, month, day = (int(part) for part in jalali_str.replace('-', '/').split('/'))
+            return jdatetime.date(year, month, day).togregorian().isoformat()
+        except ValueError:
+            return None
+
+    def to_jalali(self, value) -> str:
+        """تبدیل تاریخ میلادی ('YYYY-MM-DD' با یا بدون ساعت) به رشته شمسی 'YYYY/MM/DD'"""
+        if not value:
+            return ""
+
+        if isinstance(value, (date, datetime)):
+            date_part = (value.date() if isinstance(value, datetime) else value).isoformat()
+        elif isinstance(value, str):
+            # اگر تاریخ شامل زمان است
+            date_part = value.split(' ', 1)[0]
+        else:
+            return value
+
+        to_jalali, _ = self._tables()
+        result = to_jalali.get(date_part)
+        if result is None:
+            result = self._convert(date_part)
+        return value if result is None else result
+
+    def to_gregorian(self, value: str) -> Optional[str]:
+        """تبدیل رشته شمسی ('YYYY/MM/DD' یا 'YYYY-MM-DD') به میلادی 'YYYY-MM-DD'"""
+        if not value:
+            return None
+
+        _, to_gregorian = self._tables()
+        jalali_str = value.split(' ', 1)[0].replace('-', '/')
+        result = to_gregorian.get(jalali_str)
+        if result is None:
+            result = self._convert_back(jalali_str)
+        return result
+
+    def get_info(self) -> Dict:
+        """اطلاعات تاریخ امروز به شمسی (برای هر روز یک‌بار محاسبه می‌شود)"""
+        today = date.today()
+        if self._info_day != today:
+            now_jalali = jdatetime.date.fromgregorian(date=today)
+            info = {
+                'today': now_jalali.strftime('%Y/%m/%d'),
+                'today_full': now_jalali.strftime('%A %d %B %Y'),
+                'current_year': now_jalali.year,
+                'current_month': now_jalali.month,
+                'current_day': now_jalali.day,
+                'weekday': now_jalali.weekday()  # 0=شنبه, 1=یکشنبه, ...
+            }
+            with self._lock:
+                self._info, self._info_day = info, today
+
+        return dict(self._info)
+
+    def get_stats(self) -> Dict:
+        """آمار جدول و کش‌ها"""
+        lru = self._convert.cache_info()
+        return {
+            'table_size': len(self._to_jalali) if self._to_jalali is not None else 0,
+            'lru_hits': lru.hits,
+            'lru_misses': lru.misses,
+            'lru_size': lru.currsize
+        }
+
+
+jalali_service = JalaliDateService()
+
+
+def convert_to_jalali(gregorian_date_str):
+    """تبدیل تاریخ میلادی به شمسی"""
+    return jalali_service.to_jalali(gregorian_date_str)
+
+
+def get_jalali_info():
+    """دریافت اطلاعات تاریخ شمسی"""
+    return jalali_service.get_info()
+
+
+@lru_cache(maxsize=8)
+def _week_of(today: date) -> Dict:
+    """روزهای هفته شمسی شامل یک تاریخ (کش شده برای هر روز)"""
+    today_jalali = jdatetime.date.fromgregorian(date=today)
+
+    # شنبه این هفته (weekday در jdatetime از شنبه=0 شروع می‌شود)
+    saturday = today_jalali - timedelta(days=today_jalali.weekday())
+
+    week_days = []
+    for i in range(7):
+        day = saturday + timedelta(days=i)
+        week_days.append({
+            'date': day,
+            'day_name': DAY_NAMES[day.weekday()],
+            'day_number': day.day,
+            'month_name': MONTH_NAMES[day.month - 1],
+            'full_date': day.strftime('%Y/%m/%d')
+        })
+
+    return {
+        'saturday': saturday,
+        'week_days': week_days,
+        # روزهای کاری (شنبه تا چهارشنبه)
+        'work_days': week_days[:5]
+    }
+
+
+class JalaliCalendar:
+    @staticmethod
+    def now() -> jdatetime.datetime:
+        """زمان حال به شمسی"""
+        return jdatetime.datetime.now()
+
+    @staticmethod
+    def gregorian_to_jalali(gregorian_date: datetime) -> jdatetime.datetime:
+        """تبدیل میلادی به شمسی"""
+        return jdatetime.datetime.fromgregorian(datetime=gregorian_date)
+
+    @staticmethod
+    def jalali_to_gregorian(jalali_date: jdatetime.datetime) -> datetime:
+        """تبدیل شمسی به میلادی"""
+        return jalali_date.togregorian()
+
+    @staticmethod
+    def get_current_week() -> Dict:
+        """دریافت اطلاعات هفته جاری شمسی"""
+        week = _week_of(date.today())
+
+        return {
+            'saturday': week['saturday'],
+            'week_days': list(week['week_days']),
+            'work_days': list(week['work_days']),
+            'current_day': JalaliCalendar.now()
+        }
+
+    @staticmethod
+    def get_day_name(weekday: int) -> str:
+        """نام روز هفته (0=شنبه)"""
+        if 0 <= weekday < len(DAY_NAMES):
+            return DAY_NAMES[weekday]
+        return ''
+
+    @staticmethod
+    def get_month_name(month: int) -> str:
+        """نام ماه"""
+        if 1 <= month <= len(MONTH_NAMES):
+            return MONTH_NAMES[month - 1]
+        return ''
+
+    @staticmethod
+    def format_date(jalali_date: jdatetime.datetime, format_str: str = '%Y/%m/%d') -> str:
+        """فرمت‌دهی تاریخ شمسی"""
+        return jalali_date.strftime(format_str)
+
+    @staticmethod
+    def get_next_week_dates() -> Tuple[str, str]:
+        """تاریخ‌های شروع و پایان هفته آینده"""
+        saturday = _week_of(date.today())['saturday']
+
+        # هفته آینده
+        next_saturday = saturday + timedelta(days=7)
+        next_wednesday = next_saturday + timedelta(days=4)  # چهارشنبه
+
+        return (
+            next_saturday.strftime('%Y-%m-%d'),
+            next_wednesday.strftime('%Y-%m-%d')
+        )
+
+    @staticmethod
+    def get_week_deadline() -> str:
+        """مهلت رزرو (نزدیک‌ترین چهارشنبه ساعت ۱۸:۰۰)"""
+        today_jalali = JalaliCalendar.now()
+        current_weekday = today_jalali.weekday()
+
+        # چهارشنبه = 4
+        if current_weekday <= 4:  # اگر قبل از چهارشنبه هستیم
+            days_to_wednesday = 4 - current_weekday
+        else:  # اگر بعد از چهارشنبه هستیم، چهارشنبه هفته آینده
+            days_to_wednesday = 4 - current_weekday + 7
+        deadline_wednesday = today_jalali + timedelta(days=days_to_wednesday)
+
+        # تنظیم ساعت ۱۸:۰۰
+        deadline_wednesday = deadline_wednesday.replace(hour=18, minute=0, second=0)
+
+        # تبدیل به میلادی برای ذخیره در دیتابیس
+        gregorian_deadline = deadline_wednesday.togregorian()
+
+        return gregorian_deadline.strftime('%Y-%m-%d %H:%M:%S')
+
+# نمونه
+jalali = JalaliCalendar()
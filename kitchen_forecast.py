@@ -0,0 +1,92 @@
+from typing import Dict, Optional
+
+from storage import _deadline_passed, _shift_date
+
+# ستون‌های گزارش آشپزخانه: (کلید، عنوان)
+FORECAST_COLUMNS = (
+    ('day_of_week', 'روز'),
+    ('food_name', 'غذا'),
+    ('capacity', 'ظرفیت'),
+    ('confirmed', 'رزرو قطعی'),
+    ('extra', 'غذای اضافه'),
+    ('waiting', 'لیست انتظار'),
+    ('history_servings', 'وعده‌های قبلی'),
+    ('history_avg_demand', 'میانگین تقاضای قبلی'),
+    ('history_sold_out', 'دفعات تکمیل ظرفیت'),
+    ('cancellation_rate', 'نرخ لغو قبلی'),
+    ('portions', 'پرس برای پخت'),
+)
+
+DEFAULT_HISTORY_WEEKS = 104
+
+
+def build_forecast(db, history_weeks: int = DEFAULT_HISTORY_WEEKS) -> Optional[Dict]:
+    """پیش‌بینی تعداد پرس هر غذا و هر روز منوی فعال
+
+    جمع‌ها در خود دیتابیس (GROUP BY) حساب می‌شوند: یک کوئری برای غذاهای این هفته و یک کوئری
+    برای سابقه همه آن‌ها؛ پایتون فقط روی چند ده ردیف خروجی کار می‌کند.
+    تقاضای غذای پر نشده از میانگین وعده‌های قبلی همان غذا (رزرو + صف انتظار بی‌پاسخ) تخمین زده
+    می‌شود. رزرو لغو شده در تقاضا شمرده نمی‌شود و عدم حضور تخمین زده نمی‌شود (حضور ثبت نمی‌شود)،
+    پس تعداد پرس همان تقاضای پیش‌بینی است. نرخ لغو و دفعات تکمیل ظرفیت (تقاضایی که شاید
+    هیچ‌وقت ثبت نشده) فقط برای تصمیم آشپزخانه گزارش می‌شوند.
+    """
+    menu = db.get_weekly_menu()
+    if not menu:
+        return None
+
+    since = _shift_date(menu['week_start'], -7 * history_weeks)
+    history = db.get_dish_history(menu['id'], since, menu['week_start'])
+    booking_closed = _deadline_passed(menu['reservation_deadline'])
+
+    items = [_forecast_item(row, history.get(row['food_name']), booking_closed)
+             for row in db.get_forecast_items(menu['id'])]
+
+    days = {}
+    for item in items:
+        day = days.setdefault(item['day_of_week'], {
+            'day_of_week': item['day_of_week'], 'confirmed': 0, 'extra': 0,
+            'portions': 0
+        })
+        for key in ('confirmed', 'extra', 'portions'):
+            day[key] += item[key]
+
+    return {
+        'weekly_menu_id': menu['id'],
+        'week_start': menu['week_start'],
+        'booking_closed': booking_closed,
+        'history_since': since,
+        'items': items,
+        'days': list(days.values()),
+    }
+
+
+def _forecast_item(row: Dict, history: Optional[Dict], booking_closed: bool) -> Dict:
+    confirmed = row['confirmed']
+    capacity = row['capacity']
+
+    servings = history['servings'] if history else 0
+    sold_out = history['sold_out'] if history else 0
+    avg_demand = (history['confirmed'] + history['unmet']) / servings if servings else None
+    booked = history['confirmed'] + history['cancelled'] if history else 0
+    cancellation_rate = history['cancelled'] / booked if booked else 0.0
+
+    if booking_closed or confirmed >= capacity or avg_demand is None:
+        # رزرو بسته شده، ظرفیت پر است یا سابقه‌ای نیست: همان رزروهای فعلی
+        predicted = confirmed
+    else:
+        predicted = min(capacity, max(confirmed, round(avg_demand)))
+
+    return {
+        'menu_item_id': row['id'],
+        'day_of_week': row['day_of_week'],
+        'food_name': row['food_name'],
+        'capacity': capacity,
+        'confirmed': confirmed,
+        'extra': row['extra'],
+        'waiting': row['waiting'],
+        'history_servings': servings,
+        'history_avg_demand': round(avg_demand, 1) if avg_demand is not None else None,
+        'history_sold_out': sold_out,
+        'cancellation_rate': round(cancellation_rate, 3),
+        'portions': predicted,
+    }
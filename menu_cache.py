@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+
+class MenuCache:
+    """کش منوی هفته جاری با نسخه‌بندی و شمارنده زنده رزروها"""
+
+    def __init__(self, menu_ttl: float = 60.0, counter_ttl: float = 2.0):
+        # menu_ttl برای حالتی است که پروسه دیگری منو را تغییر داده باشد
+        self.menu_ttl = menu_ttl
+        self.counter_ttl = counter_ttl
+
+        self._lock = threading.Lock()
+        self._version = 0
+        self._menu = None
+        self._menu_loaded_at = None
+        self._counts = {}
+        self._counts_loaded_at = None
+        self._capacities = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'counter_refreshes': 0,
+        }
+
+    def get(self, menu_loader: Callable[[], Optional[Dict]],
+            counts_loader: Callable[[int], Dict[int, int]]) -> Optional[Dict]:
+        """منوی هفته با reserved_count به‌روز"""
+        now = time.monotonic()
+
+        with self._lock:
+            fresh = self._menu_loaded_at is not None and now - self._menu_loaded_at < self.menu_ttl
+            if fresh:
+                self._stats['hits'] += 1
+            else:
+                self._stats['misses'] += 1
+            version = self._version
+            menu = self._menu
+
+        if not fresh:
+            menu = menu_loader()
+            counts = {item['id']: item['reserved_count'] for item in menu['items']} if menu else {}
+            with self._lock:
+                # اگر در این فاصله منو باطل شده، نتیجه قدیمی ذخیره نمی‌شود
+                if self._version == version:
+                    self._menu = menu
+                    self._menu_loaded_at = now
+                    self._counts = counts
+                    self._counts_loaded_at = now
+                    self._capacities = {item['id']: item['capacity'] for item in menu['items']} if menu else {}
+            return self._build(menu, counts)
+
+        if menu is None:
+            return None
+
+        with self._lock:
+            counts_fresh = self._counts_loaded_at is not None and now - self._counts_loaded_at < self.counter_ttl
+            counts = self._counts
+
+        if not counts_fresh:
+            counts = counts_loader(menu['id'])
+            with self._lock:
+                self._stats['counter_refreshes'] += 1
+                if self._version == version:
+                    self._counts = counts
+                    self._counts_loaded_at = now
+
+        return self._build(menu, counts)
+
+    @staticmethod
+    def _build(menu: Optional[Dict], counts: Dict[int, int]) -> Optional[Dict]:
+        """کپی منو با شمارنده‌های زنده (کش از تغییر فراخواننده در امان است)"""
+        if menu is None:
+            return None
+
+        result = dict(menu)
+        items = []
+        for item in menu['items']:
+            items.append(item.replace(reserved_count=counts.get(item.id, item.reserved_count)))
+        result['items'] = items
+        return result
+
+    def record_reservation(self, menu_item_id: int, quantity: int) -> Optional[Tuple[int, int]]:
+        """به‌روزرسانی شمارنده پس از رزرو موفق (write-through)؛ خروجی: (reserved_count، capacity) اگر در کش باشد"""
+        with self._lock:
+            if menu_item_id in self._counts:
+                counts = dict(self._counts)
+                counts[menu_item_id] += quantity
+                self._counts = counts
+                return counts[menu_item_id], self._capacities.get(menu_item_id)
+        return None
+
+    def invalidate(self):
+        """باطل کردن منوی کش شده (پس از تغییر منو)"""
+        with self._lock:
+            self._version += 1
+            self._menu = None
+            self._menu_loaded_at = None
+            self._counts = {}
+            self._counts_loaded_at = None
+            self._capacities = {}
+            self._stats['invalidations'] += 1
+
+    def get_stats(self) -> Dict:
+        """آمار hit/miss کش"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['version'] = self._version
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,340 @@
+import sqlite3
+from typing import Dict, List
+
+from storage import (FORECAST_HISTORY_SQL, FORECAST_ITEMS_SQL, FOODS_FOR_DAY_SQL, USERS_CURSOR_CONDITION,
+                     USERS_PAGE_SQL, USERS_SEARCH_CONDITION, WEEKLY_MENU_ITEMS_SQL, user_reservations_sql)
+
+# هر مهاجرت: (شماره، توضیح، دستورات SQL)
+# شماره‌ها فقط اضافه می‌شوند؛ مهاجرت‌های اجرا شده هرگز ویرایش نمی‌شوند
+MIGRATIONS = [
+    (1, 'جداول اولیه', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id TEXT UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            department TEXT,
+            is_active BOOLEAN DEFAULT 1,
+            is_admin BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS weekly_menus (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            week_start DATE NOT NULL,
+            week_end DATE NOT NULL,
+            reservation_deadline DATETIME NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS menu_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            weekly_menu_id INTEGER NOT NULL,
+            day_of_week TEXT NOT NULL,
+            food_name TEXT NOT NULL,
+            description TEXT,
+            full_price REAL NOT NULL,
+            user_price REAL NOT NULL,
+            company_share REAL NOT NULL,
+            capacity INTEGER NOT NULL,
+            reserved_count INTEGER DEFAULT 0,
+            extra_food BOOLEAN DEFAULT 0,
+            extra_food_price REAL,
+            FOREIGN KEY (weekly_menu_id) REFERENCES weekly_menus(id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            reservation_date DATE NOT NULL,
+            quantity INTEGER DEFAULT 1,
+            is_extra BOOLEAN DEFAULT 0,
+            paid_amount REAL NOT NULL,
+            status TEXT DEFAULT 'PENDING',
+            reserved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (menu_item_id) REFERENCES menu_items(id) ON DELETE CASCADE
+        )
+        ''',
+    ]),
+    (2, 'خلاصه آمار رزرو', [
+        # menu_item_id = 0 یعنی جمع کل منوی هفته
+        '''
+        CREATE TABLE IF NOT EXISTS menu_stats (
+            weekly_menu_id INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL DEFAULT 0,
+            confirmed_quantity INTEGER NOT NULL DEFAULT 0,
+            user_share REAL NOT NULL DEFAULT 0,
+            company_share REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (weekly_menu_id, menu_item_id)
+        )
+        ''',
+        # پر کردن خلاصه برای دیتابیس‌هایی که از قبل رزرو دارند
+        '''
+        INSERT INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+        SELECT m.weekly_menu_id, m.id, SUM(r.quantity), SUM(m.user_price * r.quantity), SUM(m.company_share * r.quantity)
+        FROM reservations r
+        JOIN menu_items m ON r.menu_item_id = m.id
+        WHERE r.status = 'CONFIRMED' AND NOT EXISTS (SELECT 1 FROM menu_stats)
+        GROUP BY m.id
+        ''',
+        '''
+        INSERT OR IGNORE INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+        SELECT weekly_menu_id, 0, SUM(confirmed_quantity), SUM(user_share), SUM(company_share)
+        FROM menu_stats
+        WHERE menu_item_id != 0
+        GROUP BY weekly_menu_id
+        ''',
+    ]),
+    (3, 'ایندکس‌های مسیرهای پرتکرار', [
+        # get_user_reservations: فیلتر user_id و status و مرتب‌سازی reserved_at
+        '''
+        CREATE INDEX IF NOT EXISTS idx_reservations_user_status_time
+        ON reservations (user_id, status, reserved_at)
+        ''',
+        # JOIN رزروها با آیتم منو (بازسازی آمار و حذف آبشاری)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_reservations_menu_item_status
+        ON reservations (menu_item_id, status)
+        ''',
+        # get_foods_for_day و آیتم‌های یک منو
+        '''
+        CREATE INDEX IF NOT EXISTS idx_menu_items_menu_day
+        ON menu_items (weekly_menu_id, day_of_week)
+        ''',
+        # آخرین منوی فعال
+        '''
+        CREATE INDEX IF NOT EXISTS idx_weekly_menus_active_start
+        ON weekly_menus (is_active, week_start)
+        ''',
+    ]),
+    (4, 'ایندکس‌های صفحه‌بندی و جستجوی کاربران', [
+        # صفحه‌بندی keyset روی (created_at, id) با فیلترهای اختیاری
+        '''
+        CREATE INDEX IF NOT EXISTS idx_users_created
+        ON users (created_at, id)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_users_department_created
+        ON users (department, created_at, id)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_users_active_created
+        ON users (is_active, created_at, id)
+        ''',
+        # جستجوی پیشوندی نام (ایمیل ایندکس UNIQUE دارد)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_users_full_name
+        ON users (full_name)
+        ''',
+    ]),
+    (5, 'کلیدهای تکرار رزرو', [
+        # نتیجه اولین اجرای هر کلید؛ تکرار همان درخواست همین نتیجه را می‌گیرد
+        '''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id INTEGER NOT NULL,
+            idempotency_key TEXT NOT NULL,
+            request_fingerprint TEXT NOT NULL,
+            success BOOLEAN NOT NULL,
+            message TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (user_id, idempotency_key)
+        ) WITHOUT ROWID
+        ''',
+        # پاک کردن کلیدهای منقضی
+        '''
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created
+        ON idempotency_keys (created_at)
+        ''',
+    ]),
+    (6, 'ایندکس‌های گزارش مالی', [
+        # خروجی رزروها بر اساس بازه تاریخ
+        '''
+        CREATE INDEX IF NOT EXISTS idx_reservations_date
+        ON reservations (reservation_date)
+        ''',
+        # جمع ماهانه هر کارمند بدون مرتب‌سازی جداگانه
+        '''
+        CREATE INDEX IF NOT EXISTS idx_reservations_user_date
+        ON reservations (user_id, reservation_date)
+        ''',
+    ]),
+    (7, 'لیست انتظار غذاها', [
+        # ترتیب صف همان id است (AUTOINCREMENT شماره تکراری نمی‌دهد)
+        '''
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 1,
+            is_extra BOOLEAN DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'WAITING',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            promoted_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (menu_item_id) REFERENCES menu_items(id) ON DELETE CASCADE
+        )
+        ''',
+        # سر صف و جایگاه در صف: جستجو و شمارش روی همین ایندکس (بدون مراجعه به جدول)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_waitlist_item_status
+        ON waitlist (menu_item_id, status, id)
+        ''',
+        # هر کاربر فقط یک بار در صف انتظار هر غذا
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_waitlist_user_waiting
+        ON waitlist (user_id, menu_item_id) WHERE status = 'WAITING'
+        ''',
+    ]),
+    (8, 'ایندکس سابقه غذاها', [
+        # پیش‌بینی آشپزخانه: وعده‌های قبلی همان غذا
+        '''
+        CREATE INDEX IF NOT EXISTS idx_menu_items_food_name
+        ON menu_items (food_name, weekly_menu_id)
+        ''',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# کوئری‌هایی که مرتب‌سازی موقت (TEMP B-TREE) برایشان مجاز است، با دلیل؛ بقیه نباید کل نتیجه را مرتب کنند
+BOUNDED_SORTS = {
+    'weekly_menu_items': 'منوی یک هفته چند ده ردیف است',
+    'forecast_items': 'منوی یک هفته چند ده ردیف است',
+    'get_foods_for_day': 'غذاهای یک روز منو چند ردیف است',
+    'users_search': 'فقط کاربران منطبق بر پیشوند مرتب می‌شوند و با LIMIT فقط یک صفحه در حافظه می‌ماند',
+    'users_search_page': 'فقط کاربران منطبق بر پیشوند مرتب می‌شوند و با LIMIT فقط یک صفحه در حافظه می‌ماند',
+    'forecast_history': 'GROUP BY فقط روی وعده‌های قبلی غذاهای یک منو در بازه پیش‌بینی است',
+    'forecast_history_archive': 'GROUP BY فقط روی وعده‌های قبلی غذاهای یک منو در بازه پیش‌بینی است',
+}
+
+
+def _users_page(*conditions) -> str:
+    """همان کوئری get_users_page با شرط‌های داده شده"""
+    return USERS_PAGE_SQL.format(where='WHERE ' + ' AND '.join(c.format(p='?') for c in conditions), p='?')
+
+
+def hot_queries(schemas=('',)) -> Dict[str, tuple]:
+    """کوئری‌های مسیر داغ که نباید به اسکن کامل جدول یا مرتب‌سازی کل نتیجه برسند
+
+    از همان ثابت‌های SQL متدهای Database ساخته می‌شوند؛ schemas همان history_schemas است.
+    """
+    cursor = ('2100-01-01 00:00:00', 0)
+    search = ('ر', 'ر\U0010ffff', 'r', 'r\U0010ffff')
+    queries = {
+        'get_weekly_menu': (
+            'SELECT * FROM weekly_menus WHERE is_active = 1 ORDER BY week_start DESC LIMIT 1', ()
+        ),
+        'weekly_menu_items': (WEEKLY_MENU_ITEMS_SQL.format(p='?'), (1,)),
+        'reserved_counts': (
+            'SELECT id, reserved_count FROM menu_items WHERE weekly_menu_id = ?', (1,)
+        ),
+        'get_foods_for_day': (FOODS_FOR_DAY_SQL.format(p='?'), (1, 'شنبه')),
+        'user_reservations': (user_reservations_sql(schemas, '?'), (1,) * len(schemas)),
+        'users_page': (_users_page(USERS_CURSOR_CONDITION), cursor + (51,)),
+        'users_page_department': (
+            _users_page('department = {p}', USERS_CURSOR_CONDITION), ('IT',) + cursor + (51,)
+        ),
+        'users_search': (_users_page(USERS_SEARCH_CONDITION), search + (51,)),
+        'users_search_page': (
+            _users_page(USERS_CURSOR_CONDITION, USERS_SEARCH_CONDITION), cursor + search + (51,)
+        ),
+        'idempotency_lookup': (
+            '''
+            SELECT request_fingerprint, success, message FROM idempotency_keys
+            WHERE user_id = ? AND idempotency_key = ? AND created_at >= ?
+            ''', (1, 'k', 0)
+        ),
+        'idempotency_purge': (
+            'DELETE FROM idempotency_keys WHERE created_at < ?', (0,)
+        ),
+        'waitlist_head': (
+            '''
+            SELECT id, user_id, quantity, is_extra FROM waitlist
+            WHERE menu_item_id = ? AND status = 'WAITING'
+            ORDER BY id LIMIT 1
+            ''', (1,)
+        ),
+        'waitlist_position': (
+            "SELECT COUNT(*) FROM waitlist WHERE menu_item_id = ? AND status = 'WAITING' AND id <= ?", (1, 1)
+        ),
+        'user_waitlist': (
+            "SELECT id FROM waitlist WHERE user_id = ? AND status = 'WAITING'", (1,)
+        ),
+        'forecast_items': (FORECAST_ITEMS_SQL.format(p='?'), (1,)),
+        'calculate_stats': (
+            '''
+            SELECT SUM(s.confirmed_quantity), SUM(s.company_share), SUM(s.user_share)
+            FROM weekly_menus w
+            JOIN menu_stats s ON s.weekly_menu_id = w.id AND s.menu_item_id = 0
+            WHERE w.is_active = 1
+            ''', ()
+        ),
+    }
+    # سابقه غذاها جدا برای هر دیتابیس خوانده می‌شود (get_dish_history)
+    for schema in schemas:
+        name = f"forecast_history_{schema.rstrip('.')}" if schema not in ('', 'main.') else 'forecast_history'
+        queries[name] = (FORECAST_HISTORY_SQL.format(schema=schema, p='?'), (1, '2024-01-01', '2025-01-01'))
+    return queries
+
+
+HOT_QUERIES = hot_queries()
+
+
+def get_version(conn) -> int:
+    """نسخه فعلی اسکیما (PRAGMA user_version)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn) -> List[int]:
+    """اجرای مهاجرت‌های اجرا نشده؛ هر مهاجرت در تراکنش جداگانه"""
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if get_version(conn) >= version:
+            continue
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            # ممکن است پروسه دیگری همزمان مهاجرت را انجام داده باشد
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        applied.append(version)
+        print(f"✅ مهاجرت {version} اجرا شد: {description}")
+
+    return applied
+
+
+def check_query_plans(conn, schemas=('',)) -> Dict[str, List[str]]:
+    """بررسی EXPLAIN QUERY PLAN کوئری‌های داغ؛ خروجی: کوئری‌هایی که اسکن کامل یا مرتب‌سازی موقت دارند"""
+    failures = {}
+    for name, (sql, params) in hot_queries(schemas).items():
+        try:
+            plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+        except sqlite3.Error as e:
+            failures[name] = [f'error: {e}']
+            continue
+
+        scans = [row[3] for row in plan if row[3].startswith('SCAN ')
+                 or (row[3].startswith('USE TEMP B-TREE') and name not in BOUNDED_SORTS)]
+        if scans:
+            failures[name] = scans
+
+    return failures
@@ -0,0 +1,1253 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import psycopg2
+    import psycopg2.errors
+    import psycopg2.extensions
+    import psycopg2.extras
+except ImportError:  # backend اختیاری؛ فقط با DATABASE_URL=postgresql://... لازم است
+    psycopg2 = None
+
+from migrations import BOUNDED_SORTS
+from records import MenuItem, UserReservation, WaitlistEntry
+from storage import (Storage, USER_PUBLIC_COLUMNS, RESERVATION_OK, CAPACITY_FULL, ITEM_NOT_FOUND,
+                     IDEMPOTENCY_CONFLICT, CANCEL_OK, RESERVATION_NOT_FOUND, ALREADY_CANCELLED, DEADLINE_PASSED,
+                     WAITLIST_JOINED, ALREADY_WAITING, WAITLIST_NOT_FOUND, sample_users, sample_menu,
+                     _encode_cursor, _decode_cursor, _split_price, _menu_item_values, _shift_date, _shift_datetime,
+                     _deadline_passed, FORECAST_HISTORY_SQL, FORECAST_ITEMS_SQL, FOODS_FOR_DAY_SQL, USERS_PAGE_SQL,
+                     WEEKLY_MENU_ITEMS_SQL, user_reservations_sql)
+
+# مهاجرت‌های PostgreSQL؛ شماره‌ها با migrations.py یکی است
+# پرچم‌ها SMALLINT و تاریخ‌های منو TEXT هستند تا ردیف‌ها با نسخه SQLite یکسان باشند (week_start شمسی است)
+PG_MIGRATIONS = [
+    (1, 'جداول اولیه', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            employee_id TEXT UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            department TEXT,
+            is_active SMALLINT DEFAULT 1,
+            is_admin SMALLINT DEFAULT 0,
+            created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS weekly_menus (
+            id SERIAL PRIMARY KEY,
+            week_start TEXT NOT NULL,
+            week_end TEXT NOT NULL,
+            reservation_deadline TEXT NOT NULL,
+            is_active SMALLINT DEFAULT 1,
+            created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS menu_items (
+            id SERIAL PRIMARY KEY,
+            weekly_menu_id INTEGER NOT NULL REFERENCES weekly_menus(id) ON DELETE CASCADE,
+            day_of_week TEXT NOT NULL,
+            food_name TEXT NOT NULL,
+            description TEXT,
+            full_price DOUBLE PRECISION NOT NULL,
+            user_price DOUBLE PRECISION NOT NULL,
+            company_share DOUBLE PRECISION NOT NULL,
+            capacity INTEGER NOT NULL,
+            reserved_count INTEGER DEFAULT 0,
+            extra_food SMALLINT DEFAULT 0,
+            extra_food_price DOUBLE PRECISION
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS reservations (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            menu_item_id INTEGER NOT NULL REFERENCES menu_items(id) ON DELETE CASCADE,
+            reservation_date DATE NOT NULL,
+            quantity INTEGER DEFAULT 1,
+            is_extra SMALLINT DEFAULT 0,
+            paid_amount DOUBLE PRECISION NOT NULL,
+            status TEXT DEFAULT 'PENDING',
+            reserved_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (2, 'خلاصه آمار رزرو', [
+        # در PostgreSQL فقط ردیف هر غذا نگه داشته می‌شود؛ ردیف جمع کل (menu_item_id = 0)
+        # همه رزروهای هفته را پشت یک قفل ردیفی سری می‌کرد و جمع با SUM خوانده می‌شود
+        '''
+        CREATE TABLE IF NOT EXISTS menu_stats (
+            weekly_menu_id INTEGER NOT NULL,
+            menu_item_id INTEGER NOT NULL DEFAULT 0,
+            confirmed_quantity INTEGER NOT NULL DEFAULT 0,
+            user_share DOUBLE PRECISION NOT NULL DEFAULT 0,
+            company_share DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (weekly_menu_id, menu_item_id)
+        )
+        ''',
+        '''
+        INSERT INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+        SELECT m.weekly_menu_id, m.id, SUM(r.quantity), SUM(m.user_price * r.quantity), SUM(m.company_share * r.quantity)
+        FROM reservations r
+        JOIN menu_items m ON r.menu_item_id = m.id
+        WHERE r.status = 'CONFIRMED'
+        GROUP BY m.id
+        ON CONFLICT DO NOTHING
+        ''',
+    ]),
+    (3, 'ایندکس‌های مسیرهای پرتکرار', [
+        'CREATE INDEX IF NOT EXISTS idx_reservations_user_status_time ON reservations (user_id, status, reserved_at)',
+        'CREATE INDEX IF NOT EXISTS idx_reservations_menu_item_status ON reservations (menu_item_id, status)',
+        'CREATE INDEX IF NOT EXISTS idx_menu_items_menu_day ON menu_items (weekly_menu_id, day_of_week)',
+        'CREATE INDEX IF NOT EXISTS idx_weekly_menus_active_start ON weekly_menus (is_active, week_start)',
+    ]),
+    (4, 'ایندکس‌های صفحه‌بندی و جستجوی کاربران', [
+        'CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_users_department_created ON users (department, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_users_active_created ON users (is_active, created_at, id)',
+        # جستجوی پیشوندی LIKE 'x%' مستقل از collation
+        'CREATE INDEX IF NOT EXISTS idx_users_full_name ON users (full_name text_pattern_ops)',
+        'CREATE INDEX IF NOT EXISTS idx_users_email_prefix ON users (email text_pattern_ops)',
+    ]),
+    (5, 'کلیدهای تکرار رزرو', [
+        '''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id INTEGER NOT NULL,
+            idempotency_key TEXT NOT NULL,
+            request_fingerprint TEXT NOT NULL,
+            success SMALLINT NOT NULL,
+            message TEXT NOT NULL,
+            created_at DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (user_id, idempotency_key)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys (created_at)',
+    ]),
+    (6, 'ایندکس‌های گزارش مالی', [
+        'CREATE INDEX IF NOT EXISTS idx_reservations_date ON reservations (reservation_date)',
+        'CREATE INDEX IF NOT EXISTS idx_reservations_user_date ON reservations (user_id, reservation_date)',
+    ]),
+    (7, 'لیست انتظار غذاها', [
+        '''
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            menu_item_id INTEGER NOT NULL REFERENCES menu_items(id) ON DELETE CASCADE,
+            quantity INTEGER NOT NULL DEFAULT 1,
+            is_extra SMALLINT DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'WAITING',
+            created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+            promoted_at TIMESTAMP(0)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_waitlist_item_status ON waitlist (menu_item_id, status, id)',
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_waitlist_user_waiting ON waitlist (user_id, menu_item_id) "
+        "WHERE status = 'WAITING'",
+    ]),
+    (8, 'ایندکس سابقه غذاها', [
+        'CREATE INDEX IF NOT EXISTS idx_menu_items_food_name ON menu_items (food_name, weekly_menu_id)',
+    ]),
+]
+
+PG_SCHEMA_VERSION = PG_MIGRATIONS[-1][0]
+
+# کلید قفل advisory برای سری کردن مهاجرت‌های همزمان چند سرور
+MIGRATION_LOCK_ID = 7242001
+
+# شرط‌های صفحه کاربران در PostgreSQL: cast صریح نشانگر و LIKE پیشوندی روی ایندکس text_pattern_ops
+PG_USERS_CURSOR_CONDITION = '(created_at, id) < (%s::timestamp, %s)'
+PG_USERS_SEARCH_CONDITION = '(full_name LIKE %s OR email LIKE %s)'
+
+
+def _pg_users_page(*conditions) -> str:
+    """همان کوئری get_users_page با شرط‌های داده شده"""
+    return USERS_PAGE_SQL.format(where='WHERE ' + ' AND '.join(conditions), p='%s')
+
+
+# کوئری‌های مسیر داغ با همان ثابت‌های SQL متدها (با enable_seqscan=off بررسی می‌شوند تا نبود ایندکس
+# معلوم شود)؛ نام‌ها با migrations.HOT_QUERIES یکی است
+PG_HOT_QUERIES = {
+    'get_weekly_menu': (
+        'SELECT * FROM weekly_menus WHERE is_active = 1 ORDER BY week_start DESC LIMIT 1', ()
+    ),
+    'weekly_menu_items': (WEEKLY_MENU_ITEMS_SQL.format(p='%s'), (1,)),
+    'get_foods_for_day': (FOODS_FOR_DAY_SQL.format(p='%s'), (1, 'شنبه')),
+    'user_reservations': (user_reservations_sql(('',), '%s'), (1,)),
+    'users_page': (_pg_users_page(PG_USERS_CURSOR_CONDITION), ('2100-01-01 00:00:00', 0, 51)),
+    'users_search': (_pg_users_page(PG_USERS_SEARCH_CONDITION), ('ر%', 'r%', 51)),
+    'users_search_page': (
+        _pg_users_page(PG_USERS_CURSOR_CONDITION, PG_USERS_SEARCH_CONDITION),
+        ('2100-01-01 00:00:00', 0, 'ر%', 'r%', 51)
+    ),
+    'idempotency_lookup': (
+        'SELECT request_fingerprint, success, message FROM idempotency_keys '
+        'WHERE user_id = %s AND idempotency_key = %s', (1, 'k')
+    ),
+    'waitlist_head': (
+        "SELECT id, user_id, quantity, is_extra FROM waitlist WHERE menu_item_id = %s AND status = 'WAITING' "
+        "ORDER BY id LIMIT 1", (1,)
+    ),
+    'waitlist_position': (
+        "SELECT COUNT(*) FROM waitlist WHERE menu_item_id = %s AND status = 'WAITING' AND id <= %s", (1, 1)
+    ),
+    'forecast_items': (FORECAST_ITEMS_SQL.format(p='%s'), (1,)),
+    'forecast_history': (
+        FORECAST_HISTORY_SQL.format(schema='', p='%s'), (1, '2024-01-01', '2025-01-01')
+    ),
+}
+
+PG_INSERT_MENU_ITEM_SQL = '''
+INSERT INTO menu_items
+(weekly_menu_id, day_of_week, food_name, description, full_price,
+ user_price, company_share, capacity, extra_food, extra_food_price)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+'''
+
+# خطاهای گذرا که تکرار تراکنش آنها را برطرف می‌کند
+if psycopg2 is not None:
+    RETRYABLE_ERRORS = (psycopg2.errors.DeadlockDetected, psycopg2.errors.SerializationFailure,
+                        psycopg2.errors.LockNotAvailable)
+    # DATE و TIMESTAMP مثل SQLite به صورت متن برگردانده می‌شوند
+    TEXT_DATES = psycopg2.extensions.new_type((1082, 1114, 1184), 'FOOD_TEXT_DATES',
+                                              lambda value, cursor: value)
+
+    class HookedConnection(psycopg2.extensions.connection):
+        """اتصالی که با فعال بودن query_hook استخر، cursorهای زمان‌سنج می‌سازد"""
+
+        query_hook = None
+
+        def cursor(self, *args, **kwargs):
+            hook = self.query_hook
+            if hook is None:
+                return super().cursor(*args, **kwargs)
+            base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            kwargs['cursor_factory'] = _timed_cursor_class(base)
+            cursor = super().cursor(*args, **kwargs)
+            cursor.query_hook = hook
+            return cursor
+else:
+    RETRYABLE_ERRORS = ()
+    TEXT_DATES = None
+    HookedConnection = None
+
+
+class _TimedCursorMixin:
+    """زمان اجرای کوئری و ردیف‌های خوانده شده را به query_hook گزارش می‌دهد (مثل TimedCursor در SQLite)"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        result = super().execute(query, vars)
+        self.query_hook.on_query(query, time.perf_counter() - started)
+        return result
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        result = super().executemany(query, vars_list)
+        self.query_hook.on_query(query, time.perf_counter() - started)
+        return result
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self.query_hook.on_rows(0 if row is None else 1, time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.query_hook.on_rows(len(rows), time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self.query_hook.on_rows(len(rows), time.perf_counter() - started)
+        return rows
+
+    def __iter__(self):
+        # cursor نام‌دار (خروجی جریانی) ردیف‌ها را دسته‌ای با itersize می‌خواند
+        rows = super().__iter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            self.query_hook.on_rows(1, time.perf_counter() - started)
+            yield row
+
+
+_TIMED_CURSORS = {}
+
+
+def _timed_cursor_class(base):
+    """زیرکلاس زمان‌سنج یک کلاس cursor (عادی، RealDictCursor، ...)؛ هر کلاس یک بار ساخته می‌شود"""
+    timed = _TIMED_CURSORS.get(base)
+    if timed is None:
+        timed = _TIMED_CURSORS[base] = type(f'Timed{base.__name__}', (_TimedCursorMixin, base), {})
+    return timed
+
+
+class PgPoolTimeout(Exception):
+    """هیچ اتصال آزادی در زمان مقرر پیدا نشد"""
+
+
+class PgConnectionPool:
+    """استخر اتصال‌های ماندگار PostgreSQL با انتظار به جای خطا هنگام پر بودن
+
+    اتصال‌ها در اولین نیاز باز می‌شوند و پس از برگشت باز می‌مانند (مثل استخر SQLite).
+    """
+
+    def __init__(self, dsn: str, max_size: int = 16, timeout: float = 30.0):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.timeout = timeout
+        # hook اختیاری زمان‌سنجی کوئری‌ها (on_query و on_rows)؛ هنگام گرفتن اتصال به آن داده می‌شود
+        self.query_hook = None
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._size = 0
+        self._in_use = 0
+        self._stats = {
+            'connections_created': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'lock_retries': 0,
+            'lock_failures': 0,
+        }
+
+    def acquire(self):
+        """گرفتن یک اتصال از استخر"""
+        started = time.perf_counter()
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=self.timeout):
+            raise PgPoolTimeout('connection pool exhausted')
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            try:
+                conn = psycopg2.connect(self.dsn, connection_factory=HookedConnection)
+            except Exception:
+                self._slots.release()
+                raise
+            psycopg2.extensions.register_type(TEXT_DATES, conn)
+            with self._lock:
+                self._size += 1
+                self._stats['connections_created'] += 1
+
+        elapsed = time.perf_counter() - started
+        conn.query_hook = self.query_hook
+        with self._lock:
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += elapsed
+                self._stats['max_wait_time'] = max(self._stats['max_wait_time'], elapsed)
+        return conn
+
+    def release(self, conn):
+        """برگرداندن اتصال به استخر (تراکنش باز rollback می‌شود)"""
+        broken = bool(conn.closed)
+        if not broken and conn.status != psycopg2.extensions.STATUS_READY:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+
+        with self._lock:
+            self._in_use -= 1
+            if broken:
+                self._size -= 1
+            else:
+                self._idle.append(conn)
+        if broken and not conn.closed:
+            conn.close()
+        self._slots.release()
+
+    def run_with_retry(self, func: Callable, retries: int = 5, base_delay: float = 0.01):
+        """اجرای func با تلاش مجدد در صورت بن‌بست یا تعارض سریال‌سازی"""
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except RETRYABLE_ERRORS:
+                if attempt >= retries:
+                    with self._lock:
+                        self._stats['lock_failures'] += 1
+                    raise
+                with self._lock:
+                    self._stats['lock_retries'] += 1
+                time.sleep(base_delay * (2 ** attempt))
+                attempt += 1
+
+    def get_stats(self) -> Dict:
+        """آمار استخر اتصال (کلیدها مثل استخر SQLite)"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['in_use'] = self._in_use
+            stats['idle'] = len(self._idle)
+            stats['max_size'] = self.max_size
+
+        waits = stats['waits']
+        stats['avg_wait_ms'] = round(stats['wait_time'] / waits * 1000, 3) if waits else 0.0
+        stats['wait_time'] = round(stats['wait_time'], 6)
+        stats['max_wait_time'] = round(stats['max_wait_time'], 6)
+        return stats
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+
+class PostgresDatabase(Storage):
+    """پیاده‌سازی PostgreSQL: چند سرور برنامه، قفل ردیفی ظرفیت با SELECT … FOR UPDATE"""
+
+    placeholder = '%s'
+
+    def __init__(self, dsn: str, pool_size: int = 16, idempotency_ttl: float = 24 * 3600, hasher=None):
+        if psycopg2 is None:
+            raise RuntimeError("برای استفاده از PostgreSQL بسته psycopg2 را نصب کنید (pip install psycopg2-binary)")
+
+        super().__init__(idempotency_ttl, hasher)
+        self.dsn = dsn
+        self._next_idempotency_purge = 0.0
+        self._attached = False
+        self.pool = PgConnectionPool(dsn, max_size=pool_size)
+
+    @contextmanager
+    def _connection(self):
+        """اتصال قرضی از استخر؛ در پایان (حتی با خطا) برگردانده می‌شود"""
+        conn = self.pool.acquire()
+        try:
+            if not self._attached:
+                self._attach(conn)
+            yield conn
+        finally:
+            self.pool.release(conn)
+
+    def _attach(self, conn):
+        """بررسی یک‌باره آماده بودن اسکیما در اولین اتصال"""
+        version = _get_version(conn)
+        conn.commit()
+        if version < PG_SCHEMA_VERSION:
+            raise RuntimeError(
+                f"نسخه اسکیمای دیتابیس {version} است (مورد نیاز: {PG_SCHEMA_VERSION}). "
+                f"ابتدا دستور 'flask --app app init-db' را اجرا کنید"
+            )
+        self._attached = True
+
+    def _fetch(self, sql: str, params=(), one: bool = False, record=None):
+        """اجرای یک کوئری خواندنی؛ خروجی: دیکشنری(ها) یا با record رکوردهای فشرده"""
+        with self._connection() as conn:
+            if record is not None:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    result = [record(*row) for row in cursor.fetchall()]
+                conn.commit()
+                return (result[0] if result else None) if one else result
+
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(sql, params)
+                if one:
+                    row = cursor.fetchone()
+                    result = dict(row) if row else None
+                else:
+                    result = [dict(row) for row in cursor.fetchall()]
+            conn.commit()
+        return result
+
+    def get_pool_stats(self) -> Dict:
+        """آمار استخر اتصال‌ها"""
+        return self.pool.get_stats()
+
+    def close(self):
+        """بستن همه اتصال‌ها"""
+        self.pool.close_all()
+
+    def init_db(self, with_sample_data: bool = True):
+        """ایجاد/به‌روزرسانی جداول با مهاجرت‌های شماره‌دار"""
+        conn = self.pool.acquire()
+        try:
+            _migrate(conn)
+            if with_sample_data:
+                with conn.cursor() as cursor:
+                    self.create_initial_data(cursor)
+                conn.commit()
+        finally:
+            self.pool.release(conn)
+
+        self._attached = True
+        print("✅ پایگاه داده ایجاد شد")
+
+    def create_initial_data(self, cursor):
+        """ایجاد داده‌های اولیه"""
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchone()[0] == 0:
+            users = sample_users()
+            hashes = self.hasher.hash_many([user[3] for user in users])
+            psycopg2.extras.execute_values(cursor, '''
+            INSERT INTO users (employee_id, full_name, email, password, department, is_admin) VALUES %s
+            ''', [user[:3] + (password_hash,) + user[4:] for user, password_hash in zip(users, hashes)])
+            print("✅ کاربران اولیه ایجاد شدند")
+
+        cursor.execute("SELECT COUNT(*) FROM weekly_menus")
+        if cursor.fetchone()[0] == 0:
+            (week_start, week_end, deadline), foods = sample_menu()
+            cursor.execute('''
+            INSERT INTO weekly_menus (week_start, week_end, reservation_deadline, is_active)
+            VALUES (%s, %s, %s, 1) RETURNING id
+            ''', (week_start, week_end, deadline))
+            weekly_menu_id = cursor.fetchone()[0]
+            psycopg2.extras.execute_values(cursor, '''
+            INSERT INTO menu_items
+            (weekly_menu_id, day_of_week, food_name, description, full_price, user_price, company_share, capacity)
+            VALUES %s
+            ''', [(weekly_menu_id,) + food for food in foods])
+            print("✅ منوی نمونه (شمسی) ایجاد شد")
+
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """کوئری‌های داغی که حتی با غیرفعال بودن seq scan به اسکن کامل یا مرتب‌سازی کل نتیجه می‌رسند"""
+        failures = {}
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                for name, (sql, params) in PG_HOT_QUERIES.items():
+                    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                    plan = cursor.fetchone()[0]
+                    scans = []
+                    for node in _plan_nodes(plan[0]['Plan']):
+                        if node['Node Type'] == 'Seq Scan':
+                            scans.append(f"Seq Scan on {node.get('Relation Name')}")
+                        elif node['Node Type'] in ('Sort', 'Incremental Sort') and name not in BOUNDED_SORTS:
+                            scans.append(f"{node['Node Type']} by {', '.join(node.get('Sort Key', []))}")
+                    if scans:
+                        failures[name] = scans
+            conn.rollback()
+        return failures
+
+    # --- کاربران ---
+
+    def _get_login_user(self, email: str) -> Optional[Dict]:
+        """کاربر فعال با این ایمیل (ستون‌های عمومی به همراه password)"""
+        return self._fetch(f'''
+        SELECT {USER_PUBLIC_COLUMNS}, password FROM users
+        WHERE email = %s AND is_active = 1
+        ''', (email,), one=True)
+
+    def _set_password_hash(self, user_id: int, old_hash: str, new_hash: str):
+        """جایگزینی هش رمز، فقط اگر در این فاصله عوض نشده باشد"""
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('UPDATE users SET password = %s WHERE id = %s AND password = %s',
+                               (new_hash, user_id, old_hash))
+            conn.commit()
+
+    def get_users_page(self, limit: int = 50, cursor: Optional[str] = None, department: Optional[str] = None,
+                       is_active: Optional[bool] = None, search: Optional[str] = None) -> Dict:
+        """یک صفحه از کاربران (صفحه‌بندی keyset روی created_at و id، بدون ستون password)"""
+        limit = max(1, min(int(limit), 200))
+        conditions = []
+        params = []
+
+        if cursor:
+            created_at, user_id = _decode_cursor(cursor)
+            conditions.append(PG_USERS_CURSOR_CONDITION)
+            params.extend([created_at, user_id])
+        if department:
+            conditions.append('department = %s')
+            params.append(department)
+        if is_active is not None:
+            conditions.append('is_active = %s')
+            params.append(1 if is_active else 0)
+        if search:
+            pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conditions.append(PG_USERS_SEARCH_CONDITION)
+            params.extend([pattern, pattern])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        users = self._fetch(USERS_PAGE_SQL.format(where=where, p='%s'), params + [limit + 1])
+
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = _encode_cursor(users[-1]['created_at'], users[-1]['id'])
+
+        return {'users': users, 'next_cursor': next_cursor}
+
+    def create_user(self, employee_id: str, full_name: str, email: str, password: str,
+                    department: str, is_admin: bool = False):
+        """ایجاد کاربر جدید (رمز هش‌شده ذخیره می‌شود)"""
+        if not password:
+            return False, "رمز عبور الزامی است"
+        password_hash = self.hasher.hash(password)
+
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute('''
+                    INSERT INTO users (employee_id, full_name, email, password, department, is_admin)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ''', (employee_id, full_name, email, password_hash, department, 1 if is_admin else 0))
+                conn.commit()
+            return True, "کاربر با موفقیت ایجاد شد"
+        except psycopg2.errors.UniqueViolation as e:
+            constraint = e.diag.constraint_name or ''
+            if 'email' in constraint:
+                return False, "این ایمیل قبلاً ثبت شده است"
+            elif 'employee_id' in constraint:
+                return False, "این شماره پرسنلی قبلاً ثبت شده است"
+            return False, f"خطا در ایجاد کاربر: {str(e)}"
+        except Exception as e:
+            return False, f"خطای ناشناخته: {str(e)}"
+
+    def set_user_active(self, user_id: int, is_active: bool):
+        """فعال/غیرفعال کردن کاربر"""
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('UPDATE users SET is_active = %s WHERE id = %s', (1 if is_active else 0, user_id))
+                updated = cursor.rowcount
+            conn.commit()
+
+        if updated == 0:
+            return False, "کاربر پیدا نشد"
+        return True, "کاربر فعال شد" if is_active else "کاربر غیرفعال شد"
+
+    def bulk_upsert_users(self, rows: List[tuple]) -> Dict:
+        """درج دسته‌ای کاربران جدید و به‌روزرسانی دپارتمان کاربران موجود در یک تراکنش
+
+        rows: (شماره ردیف، employee_id، full_name، email، password، department)
+        """
+        result = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': []}
+        if not rows:
+            return result
+
+        with self._connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                    # هش رمز کاربران جدید (کند) پیش از قفل جدول انجام می‌شود
+                    cursor.execute('SELECT employee_id FROM users WHERE employee_id = ANY(%s)',
+                                   ([row[1] for row in rows],))
+                    hashes = self._hash_new_user_passwords(rows, {row['employee_id'] for row in cursor.fetchall()})
+                    conn.commit()
+
+                    # نوشتن همزمان در users تا پایان تراکنش متوقف می‌شود (خواندن آزاد است)
+                    cursor.execute('LOCK TABLE users IN SHARE ROW EXCLUSIVE MODE')
+
+                    cursor.execute('SELECT employee_id, email, department FROM users WHERE employee_id = ANY(%s)',
+                                   ([row[1] for row in rows],))
+                    by_employee_id = {row['employee_id']: row for row in cursor.fetchall()}
+
+                    cursor.execute('SELECT email FROM users WHERE email = ANY(%s)', ([row[3] for row in rows],))
+                    taken_emails = {row['email'] for row in cursor.fetchall()}
+
+                    inserts = []
+                    updates = []
+                    seen_employee_ids = set()
+                    seen_emails = set()
+                    for row_number, employee_id, full_name, email, password, department in rows:
+                        if employee_id in seen_employee_ids:
+                            result['errors'].append((row_number, "شماره پرسنلی در فایل تکراری است"))
+                            continue
+                        if email in seen_emails:
+                            result['errors'].append((row_number, "ایمیل در فایل تکراری است"))
+                            continue
+                        seen_employee_ids.add(employee_id)
+                        seen_emails.add(email)
+
+                        existing = by_employee_id.get(employee_id)
+                        if existing is None:
+                            if email in taken_emails:
+                                result['errors'].append((row_number, "این ایمیل قبلاً ثبت شده است"))
+                            else:
+                                password_hash = hashes.get(employee_id) or self.hasher.hash(password)
+                                inserts.append((employee_id, full_name, email, password_hash, department))
+                        elif existing['email'] != email:
+                            result['errors'].append((row_number, "این شماره پرسنلی قبلاً با ایمیل دیگری ثبت شده است"))
+                        elif existing['department'] != department:
+                            updates.append((department, employee_id))
+                        else:
+                            result['unchanged'] += 1
+
+                    psycopg2.extras.execute_values(cursor, '''
+                    INSERT INTO users (employee_id, full_name, email, password, department) VALUES %s
+                    ''', inserts, page_size=1000)
+                    psycopg2.extras.execute_batch(cursor, 'UPDATE users SET department = %s WHERE employee_id = %s',
+                                                  updates, page_size=1000)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        result['inserted'] = len(inserts)
+        result['updated'] = len(updates)
+        return result
+
+    # --- منو ---
+
+    def _load_weekly_menu(self) -> Optional[Dict]:
+        """خواندن منوی هفته جاری از دیتابیس"""
+        with self._connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute('''
+                SELECT * FROM weekly_menus
+                WHERE is_active = 1
+                ORDER BY week_start DESC
+                LIMIT 1
+                ''')
+                menu_row = cursor.fetchone()
+                if not menu_row:
+                    conn.commit()
+                    return None
+
+                menu = dict(menu_row)
+                cursor.execute(WEEKLY_MENU_ITEMS_SQL.format(p='%s'), (menu['id'],))
+                menu['items'] = [MenuItem(**row) for row in cursor.fetchall()]
+            conn.commit()
+        return menu
+
+    def _load_reserved_counts(self, weekly_menu_id: int) -> Dict[int, int]:
+        """خواندن تعداد رزرو شده آیتم‌های یک منو"""
+        rows = self._fetch('SELECT id, reserved_count FROM menu_items WHERE weekly_menu_id = %s', (weekly_menu_id,))
+        return {row['id']: row['reserved_count'] for row in rows}
+
+    def create_weekly_menu(self, week_start: str, week_end: str, reservation_deadline: str):
+        """ایجاد منوی هفتگی جدید"""
+        return self._create_menu(week_start, week_end, reservation_deadline, [], "منوی هفته جدید ایجاد شد")
+
+    def add_menu_item(self, weekly_menu_id: int, day_of_week: str, food_name: str, description: str,
+                      full_price: float, capacity: int, extra_food: bool = False, extra_food_price: float = None):
+        """اضافه کردن غذا به منو"""
+        user_price, company_share = _split_price(full_price)
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(PG_INSERT_MENU_ITEM_SQL, (
+                        weekly_menu_id, day_of_week, food_name, description, full_price,
+                        user_price, company_share, capacity, 1 if extra_food else 0, extra_food_price
+                    ))
+                conn.commit()
+        except Exception as e:
+            return False, f"خطا در اضافه کردن غذا: {str(e)}"
+
+        self.menu_cache.invalidate()
+        return True, "غذا با موفقیت اضافه شد"
+
+    def create_weekly_menu_bulk(self, week_start: str, week_end: str, reservation_deadline: str,
+                                items: List[Dict]):
+        """ایجاد منوی هفتگی همراه با همه غذاها در یک تراکنش"""
+        try:
+            rows = [_menu_item_values(item) for item in items]
+        except (KeyError, TypeError, ValueError) as e:
+            return False, None, f"اطلاعات غذا نامعتبر است: {str(e)}"
+
+        return self._create_menu(week_start, week_end, reservation_deadline, rows,
+                                 f"منوی هفته با {len(rows)} غذا ایجاد شد")
+
+    def _create_menu(self, week_start: str, week_end: str, reservation_deadline: str, rows: List[tuple],
+                     message: str):
+        """غیرفعال کردن منوهای قبلی و درج منوی جدید با غذاهایش"""
+        try:
+            with self._connection() as conn:
+                with conn.cursor() as cursor:
+                    # ایجاد منو در چند سرور همزمان سری می‌شود (مثل BEGIN IMMEDIATE در SQLite)
+                    cursor.execute('LOCK TABLE weekly_menus IN SHARE ROW EXCLUSIVE MODE')
+                    cursor.execute("UPDATE weekly_menus SET is_active = 0 WHERE is_active = 1")
+                    cursor.execute('''
+                    INSERT INTO weekly_menus (week_start, week_end, reservation_deadline, is_active)
+                    VALUES (%s, %s, %s, 1) RETURNING id
+                    ''', (week_start, week_end, reservation_deadline))
+                    weekly_menu_id = cursor.fetchone()[0]
+
+                    if rows:
+                        psycopg2.extras.execute_values(cursor, '''
+                        INSERT INTO menu_items
+                        (weekly_menu_id, day_of_week, food_name, description, full_price,
+                         user_price, company_share, capacity, extra_food, extra_food_price)
+                        VALUES %s
+                        ''', [(weekly_menu_id,) + row for row in rows])
+                conn.commit()
+        except Exception as e:
+            return False, None, f"خطا در ایجاد منو: {str(e)}"
+
+        self.menu_cache.invalidate()
+        return True, weekly_menu_id, message
+
+    def clone_weekly_menu(self, source_menu_id: Optional[int] = None, shift_days: int = 7,
+                          reservation_deadline: Optional[str] = None):
+        """کپی منوی یک هفته (پیش‌فرض: آخرین منو) با جابه‌جایی تاریخ‌ها"""
+        try:
+            with self._connection() as conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                    cursor.execute('LOCK TABLE weekly_menus IN SHARE ROW EXCLUSIVE MODE')
+                    if source_menu_id is None:
+                        cursor.execute('SELECT * FROM weekly_menus ORDER BY week_start DESC, id DESC LIMIT 1')
+                    else:
+                        cursor.execute('SELECT * FROM weekly_menus WHERE id = %s', (source_menu_id,))
+                    source = cursor.fetchone()
+
+                    if not source:
+                        conn.rollback()
+                        return False, None, "منوی مبدأ پیدا نشد"
+
+                    week_start = _shift_date(source['week_start'], shift_days)
+                    week_end = _shift_date(source['week_end'], shift_days)
+                    if not reservation_deadline:
+                        reservation_deadline = _shift_datetime(source['reservation_deadline'], shift_days)
+
+                    cursor.execute("UPDATE weekly_menus SET is_active = 0 WHERE is_active = 1")
+                    cursor.execute('''
+                    INSERT INTO weekly_menus (week_start, week_end, reservation_deadline, is_active)
+                    VALUES (%s, %s, %s, 1) RETURNING id
+                    ''', (week_start, week_end, reservation_deadline))
+                    weekly_menu_id = cursor.fetchone()['id']
+
+                    cursor.execute('''
+                    INSERT INTO menu_items
+                    (weekly_menu_id, day_of_week, food_name, description, full_price,
+                     user_price, company_share, capacity, extra_food, extra_food_price)
+                    SELECT %s, day_of_week, food_name, description, full_price,
+                           user_price, company_share, capacity, extra_food, extra_food_price
+                    FROM menu_items
+                    WHERE weekly_menu_id = %s
+                    ORDER BY id
+                    ''', (weekly_menu_id, source['id']))
+                    copied = cursor.rowcount
+                conn.commit()
+        except Exception as e:
+            return False, None, f"خطا در کپی منو: {str(e)}"
+
+        self.menu_cache.invalidate()
+        return True, weekly_menu_id, f"منوی هفته با {copied} غذا کپی شد"
+
+    def get_foods_for_day(self, weekly_menu_id: int, day_of_week: str) -> List[MenuItem]:
+        """دریافت غذاهای یک روز خاص"""
+        return self._fetch(FOODS_FOR_DAY_SQL.format(p='%s'), (weekly_menu_id, day_of_week), record=MenuItem)
+
+    # --- رزرو ---
+
+    def iter_user_reservations(self, user_id: int, batch_size: int = 1000):
+        """رزروهای قطعی یک کاربر به صورت جریانی"""
+        sql = user_reservations_sql(self.history_schemas, '%s')
+        return self._iter_query(sql, [user_id] * len(self.history_schemas), batch_size, record=UserReservation)
+
+    def _reserve(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                 idempotency_key: Optional[str]):
+        """ثبت رزرو با تلاش مجدد روی بن‌بست"""
+        return self.pool.run_with_retry(
+            lambda: self._reserve_once(user_id, menu_item_id, quantity, is_extra, idempotency_key)
+        )
+
+    def _reserve_once(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                      idempotency_key: Optional[str] = None):
+        """یک تلاش رزرو در یک تراکنش؛ خروجی: (موفقیت، پیام، تکراری بودن)"""
+        with self._connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                    if idempotency_key is None:
+                        success, message = self._reserve_in_transaction(cursor, user_id, menu_item_id,
+                                                                        quantity, is_extra)
+                        replayed = False
+                    else:
+                        success, message, replayed = self._reserve_idempotent(
+                            cursor, user_id, menu_item_id, quantity, is_extra, idempotency_key
+                        )
+                # رزرو ناموفق چیزی در menu_items ننوشته است؛ فقط کلید تکرار ذخیره می‌شود
+                conn.commit()
+                return success, message, replayed
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _reserve_in_transaction(self, cursor, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        """ثبت رزرو داخل تراکنش باز با قفل ردیفی روی غذا؛ رزرو غذاهای دیگر همزمان پیش می‌رود"""
+        cursor.execute('''
+        SELECT weekly_menu_id, user_price, company_share, extra_food, extra_food_price, capacity, reserved_count
+        FROM menu_items
+        WHERE id = %s
+        FOR UPDATE
+        ''', (menu_item_id,))
+        menu_item = cursor.fetchone()
+
+        if not menu_item:
+            return False, ITEM_NOT_FOUND
+        if menu_item['reserved_count'] + quantity > menu_item['capacity']:
+            return False, CAPACITY_FULL
+
+        cursor.execute('UPDATE menu_items SET reserved_count = reserved_count + %s WHERE id = %s',
+                       (quantity, menu_item_id))
+
+        if is_extra and menu_item['extra_food'] and menu_item['extra_food_price'] is not None:
+            paid_amount = menu_item['extra_food_price'] * quantity
+        else:
+            paid_amount = menu_item['user_price'] * quantity
+
+        cursor.execute('''
+        INSERT INTO reservations (user_id, menu_item_id, reservation_date, quantity, is_extra, paid_amount, status)
+        VALUES (%s, %s, CURRENT_DATE, %s, %s, %s, 'CONFIRMED')
+        ''', (user_id, menu_item_id, quantity, 1 if is_extra else 0, paid_amount))
+
+        self._update_menu_stats(cursor, menu_item['weekly_menu_id'], menu_item_id, quantity,
+                                menu_item['user_price'] * quantity, menu_item['company_share'] * quantity)
+
+        return True, RESERVATION_OK
+
+    def _update_menu_stats(self, cursor, weekly_menu_id: int, menu_item_id: int, quantity: int,
+                           user_share: float, company_share: float):
+        """افزودن به خلاصه آمار همان غذا (ردیف پشت همان قفل غذا؛ بدون ردیف مشترک هفته)"""
+        cursor.execute('''
+        INSERT INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (weekly_menu_id, menu_item_id) DO UPDATE SET
+            confirmed_quantity = menu_stats.confirmed_quantity + EXCLUDED.confirmed_quantity,
+            user_share = menu_stats.user_share + EXCLUDED.user_share,
+            company_share = menu_stats.company_share + EXCLUDED.company_share
+        ''', (weekly_menu_id, menu_item_id, quantity, user_share, company_share))
+
+    def _reserve_idempotent(self, cursor, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                            idempotency_key: str):
+        """رزرو با کلید تکرار؛ کلید پیش از رزرو ثبت می‌شود تا درخواست تکراری همزمان پشت آن منتظر بماند"""
+        now = time.time()
+        expired_before = now - self.idempotency_ttl
+        fingerprint = f"{menu_item_id}:{quantity}:{1 if is_extra else 0}"
+
+        if now >= self._next_idempotency_purge:
+            self._next_idempotency_purge = now + 60
+            cursor.execute('DELETE FROM idempotency_keys WHERE created_at < %s', (expired_before,))
+        else:
+            cursor.execute('DELETE FROM idempotency_keys WHERE user_id = %s AND idempotency_key = %s '
+                           'AND created_at < %s', (user_id, idempotency_key, expired_before))
+
+        cursor.execute('''
+        INSERT INTO idempotency_keys (user_id, idempotency_key, request_fingerprint, success, message, created_at)
+        VALUES (%s, %s, %s, 0, '', %s)
+        ON CONFLICT (user_id, idempotency_key) DO NOTHING
+        ''', (user_id, idempotency_key, fingerprint, now))
+
+        if cursor.rowcount == 0:
+            cursor.execute('''
+            SELECT request_fingerprint, success, message FROM idempotency_keys
+            WHERE user_id = %s AND idempotency_key = %s
+            ''', (user_id, idempotency_key))
+            stored = cursor.fetchone()
+            if stored['request_fingerprint'] != fingerprint:
+                return False, IDEMPOTENCY_CONFLICT, True
+            return bool(stored['success']), stored['message'], True
+
+        success, message = self._reserve_in_transaction(cursor, user_id, menu_item_id, quantity, is_extra)
+        cursor.execute('''
+        UPDATE idempotency_keys SET success = %s, message = %s
+        WHERE user_id = %s AND idempotency_key = %s
+        ''', (1 if success else 0, message, user_id, idempotency_key))
+
+        return success, message, False
+
+    # --- لغو و لیست انتظار ---
+
+    def _cancel(self, user_id: int, reservation_id: int):
+        """لغو رزرو با تلاش مجدد روی بن‌بست"""
+        return self.pool.run_with_retry(lambda: self._cancel_once(user_id, reservation_id))
+
+    def _cancel_once(self, user_id: int, reservation_id: int):
+        """لغو رزرو، آزاد کردن ظرفیت و ارتقای صف انتظار؛ قفل ردیف رزرو و سپس ردیف غذا"""
+        with self._connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                    cursor.execute('''
+                    SELECT r.menu_item_id, r.quantity, r.status, m.weekly_menu_id, m.user_price, m.company_share,
+                           w.reservation_deadline
+                    FROM reservations r
+                    JOIN menu_items m ON m.id = r.menu_item_id
+                    JOIN weekly_menus w ON w.id = m.weekly_menu_id
+                    WHERE r.id = %s AND r.user_id = %s
+                    FOR UPDATE OF r
+                    ''', (reservation_id, user_id))
+                    reservation = cursor.fetchone()
+
+                    if not reservation:
+                        result = (False, RESERVATION_NOT_FOUND, None, 0, 0)
+                    elif reservation['status'] != 'CONFIRMED':
+                        result = (False, ALREADY_CANCELLED, None, 0, 0)
+                    elif _deadline_passed(reservation['reservation_deadline']):
+                        result = (False, DEADLINE_PASSED, None, 0, 0)
+                    else:
+                        menu_item_id = reservation['menu_item_id']
+                        quantity = reservation['quantity']
+                        cursor.execute("UPDATE reservations SET status = 'CANCELLED' WHERE id = %s", (reservation_id,))
+                        # قفل ردیف غذا؛ لغوهای همزمان همان غذا صف انتظار را یکی‌یکی می‌بینند
+                        cursor.execute('UPDATE menu_items SET reserved_count = reserved_count - %s WHERE id = %s',
+                                       (quantity, menu_item_id))
+                        self._update_menu_stats(cursor, reservation['weekly_menu_id'], menu_item_id, -quantity,
+                                                -reservation['user_price'] * quantity,
+                                                -reservation['company_share'] * quantity)
+                        promoted_quantity, promoted = self._promote_waitlist(cursor, menu_item_id)
+                        result = (True, CANCEL_OK, menu_item_id, promoted_quantity - quantity, promoted)
+
+                if result[0]:
+                    conn.commit()
+                else:
+                    conn.rollback()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _promote_waitlist(self, cursor, menu_item_id: int):
+        """رزرو برای سر صف انتظار تا جایی که ظرفیت اجازه دهد؛ خروجی: (تعداد غذا، تعداد نفرات)"""
+        promoted_quantity = 0
+        promoted = 0
+        while True:
+            cursor.execute('''
+            SELECT id, user_id, quantity, is_extra FROM waitlist
+            WHERE menu_item_id = %s AND status = 'WAITING'
+            ORDER BY id LIMIT 1
+            ''', (menu_item_id,))
+            entry = cursor.fetchone()
+            if not entry:
+                break
+
+            success, _ = self._reserve_in_transaction(cursor, entry['user_id'], menu_item_id, entry['quantity'],
+                                                      bool(entry['is_extra']))
+            if not success:
+                # سر صف جا نمی‌شود؛ نفرات بعدی از او جلو نمی‌زنند (FIFO)
+                break
+
+            cursor.execute("UPDATE waitlist SET status = 'PROMOTED', promoted_at = CURRENT_TIMESTAMP WHERE id = %s",
+                           (entry['id'],))
+            promoted_quantity += entry['quantity']
+            promoted += 1
+
+        return promoted_quantity, promoted
+
+    def _join_waitlist(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        """رزرو یا ورود به صف انتظار با تلاش مجدد روی بن‌بست"""
+        return self.pool.run_with_retry(
+            lambda: self._join_waitlist_once(user_id, menu_item_id, quantity, is_extra)
+        )
+
+    def _join_waitlist_once(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        """رزرو یا ورود به صف انتظار؛ قفل ردیف غذا تا پایان تراکنش نگه داشته می‌شود"""
+        with self._connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                    cursor.execute('''
+                    SELECT w.reservation_deadline
+                    FROM menu_items m
+                    JOIN weekly_menus w ON w.id = m.weekly_menu_id
+                    WHERE m.id = %s
+                    ''', (menu_item_id,))
+                    menu_item = cursor.fetchone()
+
+                    if not menu_item:
+                        result = (False, ITEM_NOT_FOUND, None)
+                    elif _deadline_passed(menu_item['reservation_deadline']):
+                        result = (False, DEADLINE_PASSED, None)
+                    else:
+                        result = self._reserve_or_enqueue(cursor, user_id, menu_item_id, quantity, is_extra)
+
+                if result[0]:
+                    conn.commit()
+                else:
+                    conn.rollback()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _reserve_or_enqueue(self, cursor, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        success, message = self._reserve_in_transaction(cursor, user_id, menu_item_id, quantity, is_extra)
+        if success:
+            return True, message, None
+
+        cursor.execute('''
+        SELECT id FROM waitlist
+        WHERE user_id = %s AND menu_item_id = %s AND status = 'WAITING'
+        ''', (user_id, menu_item_id))
+        existing = cursor.fetchone()
+        if existing:
+            return False, ALREADY_WAITING, self._waitlist_position(cursor, menu_item_id, existing['id'])
+
+        cursor.execute('''
+        INSERT INTO waitlist (user_id, menu_item_id, quantity, is_extra)
+        VALUES (%s, %s, %s, %s) RETURNING id
+        ''', (user_id, menu_item_id, quantity, 1 if is_extra else 0))
+        waitlist_id = cursor.fetchone()['id']
+        return True, WAITLIST_JOINED, self._waitlist_position(cursor, menu_item_id, waitlist_id)
+
+    @staticmethod
+    def _waitlist_position(cursor, menu_item_id: int, waitlist_id: int) -> int:
+        """جایگاه در صف: شمارش منتظران جلوتر روی ایندکس (menu_item_id, status, id)"""
+        cursor.execute('''
+        SELECT COUNT(*) AS position FROM waitlist
+        WHERE menu_item_id = %s AND status = 'WAITING' AND id <= %s
+        ''', (menu_item_id, waitlist_id))
+        return cursor.fetchone()['position']
+
+    def leave_waitlist(self, user_id: int, waitlist_id: int):
+        """خروج از صف انتظار"""
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('''
+                UPDATE waitlist SET status = 'CANCELLED'
+                WHERE id = %s AND user_id = %s AND status = 'WAITING'
+                ''', (waitlist_id, user_id))
+                updated = cursor.rowcount
+            conn.commit()
+
+        if updated == 0:
+            return False, WAITLIST_NOT_FOUND
+        return True, "از لیست انتظار خارج شدید"
+
+    def get_user_waitlist(self, user_id: int) -> List[WaitlistEntry]:
+        """درخواست‌های انتظار فعال کاربر با جایگاه در صف"""
+        return self._fetch('''
+        SELECT w.id, w.menu_item_id, w.quantity, w.created_at, m.food_name, m.day_of_week,
+               (SELECT COUNT(*) FROM waitlist a
+                WHERE a.menu_item_id = w.menu_item_id AND a.status = 'WAITING' AND a.id <= w.id) AS position
+        FROM waitlist w
+        JOIN menu_items m ON m.id = w.menu_item_id
+        WHERE w.user_id = %s AND w.status = 'WAITING'
+        ORDER BY w.id
+        ''', (user_id,), record=WaitlistEntry)
+
+    def _count_overbooked(self) -> int:
+        """تعداد غذاهایی که بیش از ظرفیت رزرو شده‌اند"""
+        return self._fetch('SELECT COUNT(*) AS count FROM menu_items WHERE reserved_count > capacity',
+                           one=True)['count']
+
+    # --- گزارش ---
+
+    def _iter_query(self, sql: str, params: list, batch_size: int = 1000, record=None):
+        """اجرای جریانی کوئری با cursor سمت سرور (named cursor)؛ ردیف‌ها دسته‌ای منتقل می‌شوند"""
+        factory = None if record is not None else psycopg2.extras.RealDictCursor
+        with self._connection() as conn:
+            try:
+                with conn.cursor(name='food_export', cursor_factory=factory) as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(sql, params)
+                    for row in cursor:
+                        yield record(*row) if record is not None else dict(row)
+            finally:
+                conn.rollback()
+
+    # --- آمار ---
+
+    def calculate_stats(self) -> Dict:
+        """محاسبه آمار سیستم"""
+        users = self._fetch('SELECT COUNT(*) AS count FROM users WHERE is_active = 1', one=True)
+        totals = self._fetch('''
+        SELECT
+            SUM(s.confirmed_quantity) AS total,
+            SUM(s.company_share) AS company_total,
+            SUM(s.user_share) AS user_total
+        FROM weekly_menus w
+        JOIN menu_stats s ON s.weekly_menu_id = w.id
+        WHERE w.is_active = 1
+        ''', one=True)
+
+        return {
+            'total_users': users['count'],
+            'total_reservations': totals['total'] or 0,
+            'total_company_share': totals['company_total'] or 0,
+            'total_user_share': totals['user_total'] or 0
+        }
+
+    def rebuild_menu_stats(self, verify_only: bool = False) -> List[Dict]:
+        """بررسی (و در صورت نیاز بازسازی) خلاصه آمار؛ خروجی: ردیف‌های دارای اختلاف"""
+        select_stats = '''
+        SELECT weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share
+        FROM menu_stats
+        '''
+        with self._connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    # رزرو جدید تا پایان بازسازی منتظر می‌ماند
+                    cursor.execute('LOCK TABLE reservations, menu_stats IN SHARE ROW EXCLUSIVE MODE')
+                    cursor.execute(select_stats)
+                    stored = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+
+                    cursor.execute('DELETE FROM menu_stats')
+                    cursor.execute('''
+                    INSERT INTO menu_stats (weekly_menu_id, menu_item_id, confirmed_quantity, user_share, company_share)
+                    SELECT m.weekly_menu_id, m.id, SUM(r.quantity), SUM(m.user_price * r.quantity),
+                           SUM(m.company_share * r.quantity)
+                    FROM reservations r
+                    JOIN menu_items m ON r.menu_item_id = m.id
+                    WHERE r.status = 'CONFIRMED'
+                    GROUP BY m.id
+                    ''')
+                    cursor.execute(select_stats)
+                    expected = {(row[0], row[1]): tuple(row[2:]) for row in cursor.fetchall()}
+
+                if verify_only:
+                    conn.rollback()
+                else:
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        drift = []
+        for key in sorted(stored.keys() | expected.keys()):
+            old = stored.get(key, (0, 0.0, 0.0))
+            new = expected.get(key, (0, 0.0, 0.0))
+            if old[0] != new[0] or abs(old[1] - new[1]) > 0.01 or abs(old[2] - new[2]) > 0.01:
+                drift.append({
+                    'weekly_menu_id': key[0],
+                    'menu_item_id': key[1],
+                    'stored': dict(zip(('confirmed_quantity', 'user_share', 'company_share'), old)),
+                    'expected': dict(zip(('confirmed_quantity', 'user_share', 'company_share'), new))
+                })
+        return drift
+
+
+def _get_version(conn) -> int:
+    """نسخه فعلی اسکیما (جدول schema_version)"""
+    with conn.cursor() as cursor:
+        cursor.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        return cursor.fetchone()[0]
+
+
+def _migrate(conn) -> List[int]:
+    """اجرای مهاجرت‌های اجرا نشده؛ هر مهاجرت در تراکنش جداگانه و پشت قفل advisory"""
+    applied = []
+    for version, description, statements in PG_MIGRATIONS:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_ID,))
+                if _get_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute('INSERT INTO schema_version (version) VALUES (%s)', (version,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        applied.append(version)
+        print(f"✅ مهاجرت {version} اجرا شد: {description}")
+
+    return applied
+
+
+def _plan_nodes(node: Dict):
+    """همه گره‌های یک EXPLAIN (FORMAT JSON)"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
@@ -0,0 +1,288 @@
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from flask import Response, g, jsonify, request, session
+
+from connection_pool import ConnectionPool
+
+# محدودیت‌های پیش‌فرض: endpoint یا endpoint:METHOD → [(کلید، تعداد، بازه ثانیه، ظرفیت انفجاری)]
+# کلید user شناسه کاربر سشن، کلید ip آدرس کلاینت (پشت پراکسی با FOOD_TRUSTED_PROXIES) و کلید email
+# ایمیل فرم ورود همراه آدرس کلاینت است؛ سقف ip ورود بالاتر است چون همه کارکنان پشت NAT دفتر یک IP دارند
+DEFAULT_LIMITS = {
+    'login:POST': [('email', 10, 60, 10), ('ip', 100, 60, 100)],
+    'reserve': [('user', 5, 1, 10), ('ip', 30, 1, 60)],
+    'cancel_reservation': [('user', 5, 1, 10), ('ip', 30, 1, 60)],
+    'waitlist_join': [('user', 5, 1, 10), ('ip', 30, 1, 60)],
+    'api_get_foods_for_day': [('user', 10, 1, 20), ('ip', 50, 1, 100)],
+}
+
+LIMITED_MESSAGE = "تعداد درخواست‌ها بیش از حد مجاز است؛ لحظاتی بعد دوباره تلاش کنید"
+
+
+class Limit:
+    """یک سطل توکن: rate توکن در ثانیه با ظرفیت burst"""
+
+    __slots__ = ('scope', 'count', 'period', 'rate', 'burst')
+
+    def __init__(self, scope: str, count: int, period: float, burst: Optional[int] = None):
+        if scope not in ('user', 'ip', 'email'):
+            raise ValueError(f"کلید محدودیت نامعتبر است: {scope}")
+        self.scope = scope
+        self.count = count
+        self.period = period
+        self.rate = count / period
+        self.burst = burst or count
+
+
+class MemoryBucketStore:
+    """سطل‌ها در حافظه همین پروسه؛ هر سطل فقط (توکن، زمان) است
+
+    ترتیب dict همان ترتیب آخرین استفاده است؛ سطل‌های پر (بیکار) در پاک‌سازی دوره‌ای
+    و قدیمی‌ترین‌ها هنگام رسیدن به max_buckets حذف می‌شوند (سطل حذف‌شده یعنی سطل پر).
+    """
+
+    def __init__(self, max_buckets: int = 100000, sweep_interval: float = 60.0):
+        self.max_buckets = max_buckets
+        self.sweep_interval = sweep_interval
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._evicted = 0
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> Tuple[bool, float, float]:
+        """برداشتن cost توکن؛ خروجی: (مجاز است، توکن باقی‌مانده، ثانیه تا توکن کافی)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None)
+            if bucket is None:
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+
+            if len(self._buckets) > self.max_buckets:
+                del self._buckets[next(iter(self._buckets))]
+                self._evicted += 1
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+    def _sweep(self, now: float):
+        """حذف سطل‌هایی که یک بازه پاک‌سازی استفاده نشده‌اند (تا الان دوباره پر شده‌اند)"""
+        cutoff = now - self.sweep_interval
+        stale = [key for key, (_, updated) in self._buckets.items() if updated < cutoff]
+        for key in stale:
+            del self._buckets[key]
+        self._evicted += len(stale)
+        self._next_sweep = now + self.sweep_interval
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'store': 'memory', 'buckets': len(self._buckets), 'evicted': self._evicted}
+
+
+class SqliteBucketStore:
+    """سطل‌ها در فایل SQLite مشترک بین چند پروسه (worker)؛ هر برداشت یک UPSERT اتمی است"""
+
+    def __init__(self, path: str, sweep_interval: float = 60.0):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        # از دست رفتن چند برداشت آخر در قطع برق مهم نیست
+        self.pool = ConnectionPool(path, max_size=4, synchronous='OFF')
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._next_sweep = 0.0
+        self._evicted = 0
+
+    def _connection(self):
+        conn = self.pool.acquire()
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    conn.execute('''
+                    CREATE TABLE IF NOT EXISTS rate_buckets (
+                        key TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        updated REAL NOT NULL
+                    ) WITHOUT ROWID
+                    ''')
+                    conn.commit()
+                    self._schema_ready = True
+        return conn
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> Tuple[bool, float, float]:
+        """برداشتن cost توکن؛ خروجی: (مجاز است، توکن باقی‌مانده، ثانیه تا توکن کافی)"""
+        # زمان دیواری چون پروسه‌ها ساعت monotonic مشترک ندارند
+        now = time.time()
+        conn = self._connection()
+        try:
+            row = conn.execute('''
+            INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ? - ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = MIN(?, tokens + (excluded.updated - updated) * ?) - ?,
+                updated = excluded.updated
+            WHERE MIN(?, tokens + (excluded.updated - updated) * ?) >= ?
+            RETURNING tokens
+            ''', (key, burst, cost, now, burst, rate, cost, burst, rate, cost)).fetchone()
+
+            if row is None:
+                current = conn.execute('SELECT tokens, updated FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+                tokens = min(burst, current['tokens'] + (now - current['updated']) * rate) if current else burst
+            if now >= self._next_sweep:
+                self._sweep(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+
+        if row is not None:
+            return True, row['tokens'], 0.0
+        return False, tokens, max(cost - tokens, 0) / rate
+
+    def _sweep(self, conn, now: float):
+        cursor = conn.execute('DELETE FROM rate_buckets WHERE updated < ?', (now - self.sweep_interval,))
+        self._evicted += cursor.rowcount
+        self._next_sweep = now + self.sweep_interval
+
+    def get_stats(self) -> Dict:
+        conn = self._connection()
+        try:
+            buckets = conn.execute('SELECT COUNT(*) FROM rate_buckets').fetchone()[0]
+        finally:
+            conn.close()
+        return {'store': 'sqlite', 'buckets': buckets, 'evicted': self._evicted}
+
+
+class RateLimiter:
+    """محدودسازی نرخ درخواست‌ها با سطل توکن به ازای کاربر و IP، جدا برای هر مسیر"""
+
+    def __init__(self, store=None, limits: Optional[Dict[str, List[tuple]]] = None):
+        self.store = store or MemoryBucketStore()
+        self.limits = {
+            route: [Limit(*rule) for rule in rules]
+            for route, rules in (DEFAULT_LIMITS if limits is None else limits).items()
+        }
+        # سطل بیکار پس از طولانی‌ترین زمان پر شدن معادل سطل پر است و می‌تواند حذف شود
+        longest_refill = max((limit.burst / limit.rate for rules in self.limits.values() for limit in rules),
+                             default=60.0)
+        self.store.sweep_interval = max(self.store.sweep_interval, longest_refill)
+        self._lock = threading.Lock()
+        self._stats = {'checked': 0, 'limited': 0}
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.extensions['rate_limit'] = self
+
+    def _rules(self) -> Optional[List[Limit]]:
+        endpoint = request.endpoint
+        if endpoint is None:
+            return None
+        return self.limits.get(f'{endpoint}:{request.method}') or self.limits.get(endpoint)
+
+    def check(self, endpoint_key: str, rules: List[Limit], user_id, ip: str, email: Optional[str] = None):
+        """برداشت از همه سطل‌های یک درخواست؛ خروجی: (مجاز است، سخت‌گیرترین سطل، باقی‌مانده، ثانیه انتظار)"""
+        idents = {'user': user_id, 'ip': ip, 'email': f'{email}|{ip}' if email else None}
+        tightest = None
+        for limit in rules:
+            ident = idents[limit.scope]
+            if ident is None:
+                continue
+            allowed, remaining, retry_after = self.store.take(
+                f'{endpoint_key}:{limit.scope}:{ident}', limit.rate, limit.burst
+            )
+            if not allowed:
+                return False, limit, remaining, retry_after
+            if tightest is None or remaining / limit.burst < tightest[1] / tightest[0].burst:
+                tightest = (limit, remaining)
+
+        if tightest is None:
+            return True, None, 0.0, 0.0
+        return True, tightest[0], tightest[1], 0.0
+
+    def _before_request(self):
+        rules = self._rules()
+        if not rules:
+            return None
+
+        email = None
+        if any(limit.scope == 'email' for limit in rules):
+            email = (request.form.get('email') or '').strip().lower() or None
+        allowed, limit, remaining, retry_after = self.check(
+            request.endpoint, rules, session.get('user_id'), request.remote_addr or 'unknown', email
+        )
+        with self._lock:
+            self._stats['checked'] += 1
+            if not allowed:
+                self._stats['limited'] += 1
+
+        if limit is not None:
+            g.rate_limit = (limit, remaining)
+        if allowed:
+            return None
+
+        if request.path.startswith('/api/'):
+            response = jsonify({'success': False, 'message': LIMITED_MESSAGE})
+        else:
+            response = Response(LIMITED_MESSAGE, mimetype='text/plain')
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def _after_request(self, response):
+        state = g.pop('rate_limit', None)
+        if state is not None:
+            limit, remaining = state
+            response.headers['X-RateLimit-Limit'] = str(limit.burst)
+            response.headers['X-RateLimit-Remaining'] = str(int(remaining))
+            # ثانیه تا پر شدن کامل سطل
+            response.headers['X-RateLimit-Reset'] = str(math.ceil((limit.burst - remaining) / limit.rate))
+        return response
+
+    def get_stats(self) -> Dict:
+        """آمار محدودسازی و سطل‌ها"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.store.get_stats())
+        return stats
+
+
+def parse_limits(spec: str) -> Dict[str, List[tuple]]:
+    """'login:POST=email:10/60,ip:100/60;reserve=user:5/1:10,ip:30/1:60' → ساختار DEFAULT_LIMITS"""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(';'))):
+        route, _, rules = entry.partition('=')
+        parsed = []
+        for rule in filter(None, (part.strip() for part in rules.split(','))):
+            scope, _, rest = rule.partition(':')
+            rate, _, burst = rest.partition(':')
+            count, _, period = rate.partition('/')
+            parsed.append((scope, int(count), float(period or 1), int(burst) if burst else None))
+        limits[route.strip()] = parsed
+    return limits
+
+
+def from_environ(app) -> Optional[RateLimiter]:
+    """فعال به صورت پیش‌فرض (FOOD_RATE_LIMIT=0 خاموش)؛ FOOD_RATE_LIMIT_STORE=memory|sqlite"""
+    if os.environ.get('FOOD_RATE_LIMIT', '1') == '0':
+        return None
+
+    if os.environ.get('FOOD_RATE_LIMIT_STORE', 'memory') == 'sqlite':
+        store = SqliteBucketStore(os.environ.get('FOOD_RATE_LIMIT_DB', 'rate_limits.db'))
+    else:
+        store = MemoryBucketStore(max_buckets=int(os.environ.get('FOOD_RATE_LIMIT_MAX_BUCKETS', 100000)))
+
+    limits = DEFAULT_LIMITS.copy()
+    if os.environ.get('FOOD_RATE_LIMITS'):
+        limits.update(parse_limits(os.environ['FOOD_RATE_LIMITS']))
+
+    limiter = RateLimiter(store, limits)
+    limiter.init_app(app)
+    return limiter
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Optional
+
+
+class Record:
+    """پایه ردیف‌های فشرده (dataclass با __slots__، بدون دیکشنری برای هر ردیف)
+
+    مثل دیکشنری ردیف‌های قبلی هم خوانده می‌شود: row['x']، row.get('x')، dict(row)؛ قالب‌ها با row.x
+    و jsonify (که dataclassها را به دیکشنری تبدیل می‌کند) بدون تغییر کار می‌کنند.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key in self.__dataclass_fields__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        # فقط ستون‌های موجود؛ ستون تازه به ردیف اضافه نمی‌شود
+        if key not in self.__dataclass_fields__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key) -> bool:
+        return key in self.__dataclass_fields__
+
+    def __iter__(self):
+        return iter(self.__dataclass_fields__)
+
+    def __len__(self) -> int:
+        return len(self.__dataclass_fields__)
+
+    def get(self, key, default=None):
+        if key in self.__dataclass_fields__:
+            return getattr(self, key)
+        return default
+
+    def keys(self):
+        return self.__dataclass_fields__.keys()
+
+    def values(self):
+        return [getattr(self, name) for name in self.__dataclass_fields__]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.__dataclass_fields__]
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+    def replace(self, **changes):
+        """کپی ردیف با مقدارهای تازه برای چند ستون"""
+        return replace(self, **changes)
+
+
+def columns(record, alias: str = '') -> str:
+    """فهرست صریح ستون‌های SELECT به ترتیب فیلدهای رکورد (به‌جای SELECT *)"""
+    prefix = f'{alias}.' if alias else ''
+    return ', '.join(prefix + field.name for field in fields(record))
+
+
+def row_factory(record):
+    """row_factory برای cursor سقلایت: ساخت مستقیم رکورد از تاپل، بدون sqlite3.Row میانی"""
+    return lambda cursor, row: record(*row)
+
+
+@dataclass(slots=True)
+class MenuItem(Record):
+    id: int
+    weekly_menu_id: int
+    day_of_week: str
+    food_name: str
+    description: Optional[str]
+    full_price: float
+    user_price: float
+    company_share: float
+    capacity: int
+    reserved_count: int
+    extra_food: int
+    extra_food_price: Optional[float]
+
+
+@dataclass(slots=True)
+class User(Record):
+    """کاربر بدون ستون password"""
+    id: int
+    employee_id: str
+    full_name: str
+    email: str
+    department: Optional[str]
+    is_active: int
+    is_admin: int
+    created_at: str
+
+
+@dataclass(slots=True)
+class UserReservation(Record):
+    """رزرو کاربر با نام و روز غذا"""
+    id: int
+    user_id: int
+    menu_item_id: int
+    reservation_date: str
+    quantity: int
+    is_extra: int
+    paid_amount: float
+    status: str
+    reserved_at: str
+    food_name: str
+    day_of_week: str
+
+
+@dataclass(slots=True)
+class WaitlistEntry(Record):
+    """درخواست انتظار فعال با جایگاه در صف"""
+    id: int
+    menu_item_id: int
+    quantity: int
+    created_at: str
+    food_name: str
+    day_of_week: str
+    position: int
+
+
+MENU_ITEM_COLUMNS = columns(MenuItem)
+
+# ستون‌های رزرو کاربر از reservations r و menu_items m
+USER_RESERVATION_COLUMNS = ', '.join(
+    ('m.' if name in ('food_name', 'day_of_week') else 'r.') + name
+    for name in (field.name for field in fields(UserReservation))
+)
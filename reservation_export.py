@@ -0,0 +1,194 @@
+import csv
+import io
+import os
+import re
+import tempfile
+from typing import Dict, Iterable, Iterator, Optional
+
+try:
+    import openpyxl
+except ImportError:  # خروجی XLSX اختیاری است
+    openpyxl = None
+
+from jalali_calendar import convert_to_jalali, jalali_service
+from kitchen_forecast import FORECAST_COLUMNS, build_forecast
+
+# ستون‌های خروجی: (کلید، عنوان)
+RESERVATION_COLUMNS = (
+    ('id', 'شناسه رزرو'),
+    ('reservation_date_jalali', 'تاریخ (شمسی)'),
+    ('reservation_date', 'تاریخ (میلادی)'),
+    ('reserved_at_jalali', 'زمان ثبت (شمسی)'),
+    ('employee_id', 'شماره پرسنلی'),
+    ('full_name', 'نام'),
+    ('department', 'دپارتمان'),
+    ('food_name', 'غذا'),
+    ('day_of_week', 'روز'),
+    ('quantity', 'تعداد'),
+    ('is_extra', 'غذای اضافه'),
+    ('status', 'وضعیت'),
+    ('paid_amount', 'سهم کارمند'),
+    ('company_share', 'سهم شرکت'),
+)
+
+PAYROLL_COLUMNS = (
+    ('month', 'ماه (شمسی)'),
+    ('employee_id', 'شماره پرسنلی'),
+    ('full_name', 'نام'),
+    ('department', 'دپارتمان'),
+    ('reservations', 'تعداد رزرو'),
+    ('quantity', 'تعداد غذا'),
+    ('paid_amount', 'کسر از حقوق'),
+    ('company_share', 'سهم شرکت'),
+)
+
+EXPORT_KINDS = ('reservations', 'payroll', 'forecast')
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+# هر چند ردیف CSV یک تکه به پاسخ HTTP داده می‌شود
+CSV_FLUSH_ROWS = 500
+
+
+def parse_filters(date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  department: Optional[str] = None, status: Optional[str] = None) -> Dict:
+    """فیلترهای گزارش؛ تاریخ‌ها شمسی (1403/01/01) یا میلادی (2024-03-20) پذیرفته می‌شوند"""
+    return {
+        'date_from': _to_gregorian(date_from),
+        'date_to': _to_gregorian(date_to),
+        'department': department or None,
+        'status': status.upper() if status else None,
+    }
+
+
+def _to_gregorian(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+
+    value = value.strip()
+    match = re.fullmatch(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})', value)
+    if not match:
+        raise ValueError(f"تاریخ نامعتبر است: {value}")
+
+    year, month, day = (int(part) for part in match.groups())
+    if year < 1700:
+        result = jalali_service.to_gregorian(f'{year:04d}/{month:02d}/{day:02d}')
+        if result is None:
+            raise ValueError(f"تاریخ نامعتبر است: {value}")
+        return result
+    return f'{year:04d}-{month:02d}-{day:02d}'
+
+
+def reservation_rows(db, filters: Dict) -> Iterator[Dict]:
+    """ردیف‌های رزرو با ستون‌های شمسی"""
+    for row in db.iter_reservations(filters):
+        row['reservation_date_jalali'] = convert_to_jalali(row['reservation_date'])
+        reserved_at = row['reserved_at'] or ''
+        row['reserved_at_jalali'] = f"{convert_to_jalali(reserved_at)} {reserved_at[11:16]}".strip()
+        row['is_extra'] = 'بله' if row['is_extra'] else 'خیر'
+        yield row
+
+
+def payroll_rows(db, filters: Dict) -> Iterator[Dict]:
+    """جمع ماه شمسی هر کارمند؛ ردیف‌های روزانه به ترتیب کارمند و تاریخ می‌رسند و فقط یک ماه در حافظه است"""
+    current = None
+    for row in db.iter_user_daily_totals(filters):
+        month = convert_to_jalali(row['reservation_date'])[:7]
+        if current is not None and (current['user_id'], current['month']) == (row['user_id'], month):
+            for key in ('reservations', 'quantity', 'paid_amount', 'company_share'):
+                current[key] += row[key]
+            continue
+
+        if current is not None:
+            yield current
+        current = {
+            'user_id': row['user_id'],
+            'month': month,
+            'employee_id': row['employee_id'],
+            'full_name': row['full_name'],
+            'department': row['department'],
+            'reservations': row['reservations'],
+            'quantity': row['quantity'],
+            'paid_amount': row['paid_amount'],
+            'company_share': row['company_share'],
+        }
+
+    if current is not None:
+        yield current
+
+
+def export_rows(db, kind: str, filters: Dict):
+    """ستون‌ها و ردیف‌های یک نوع گزارش"""
+    if kind == 'reservations':
+        return RESERVATION_COLUMNS, reservation_rows(db, filters)
+    if kind == 'payroll':
+        # کسر از حقوق فقط برای رزروهای قطعی است مگر وضعیت دیگری خواسته شود
+        filters = dict(filters, status=filters.get('status') or 'CONFIRMED')
+        return PAYROLL_COLUMNS, payroll_rows(db, filters)
+    if kind == 'forecast':
+        # پیش‌بینی آشپزخانه همیشه برای منوی فعال است (فیلترها اثری ندارند)
+        forecast = build_forecast(db)
+        return FORECAST_COLUMNS, iter(forecast['items'] if forecast else [])
+    raise ValueError(f"نوع گزارش پشتیبانی نمی‌شود: {kind}")
+
+
+def stream_csv(columns, rows: Iterable[Dict]) -> Iterator[str]:
+    """CSV به صورت تکه‌تکه (با BOM تا Excel متن فارسی را درست نشان دهد)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([title for _, title in columns])
+
+    keys = [key for key, _ in columns]
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([row.get(key) for key in keys])
+        if count % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def stream_xlsx(columns, rows: Iterable[Dict], title: str = 'گزارش', chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """XLSX با workbook حالت write_only (ردیف‌ها روی دیسک)؛ فایل پس از ساخت تکه‌تکه ارسال می‌شود"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    sheet.sheet_view.rightToLeft = True
+    sheet.append([header for _, header in columns])
+
+    keys = [key for key, _ in columns]
+    for row in rows:
+        sheet.append([row.get(key) for key in keys])
+
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as stream:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_filename(kind: str, fmt: str, filters: Dict) -> str:
+    parts = [kind]
+    for key in ('date_from', 'date_to'):
+        if filters.get(key):
+            parts.append(convert_to_jalali(filters[key]).replace('/', ''))
+    return f"{'_'.join(parts)}.{fmt}"
+
+
+def stream_export(db, kind: str, fmt: str, filters: Dict) -> Iterator:
+    """گزارش کامل به صورت جریانی (str برای CSV، bytes برای XLSX)"""
+    columns, rows = export_rows(db, kind, filters)
+    if fmt == 'csv':
+        return stream_csv(columns, rows)
+    if fmt == 'xlsx':
+        if openpyxl is None:
+            raise RuntimeError("برای خروجی XLSX بسته openpyxl را نصب کنید (pip install openpyxl)")
+        return stream_xlsx(columns, rows, title=kind)
+    raise ValueError(f"فرمت پشتیبانی نمی‌شود: {fmt}")
@@ -0,0 +1,232 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+
+# پاسخ وقتی صف پر است (درخواست اصلاً ثبت نشده و تلاش مجدد امن است)
+QUEUE_FULL_MESSAGE = "سرور شلوغ است، لطفاً دوباره تلاش کنید"
+# پاسخ وقتی درخواست در مهلت به نوبت نرسید؛ پیش از اجرا لغو شده، پس رزروی ثبت نشده است
+QUEUE_TIMEOUT_MESSAGE = "رزرو در زمان مقرر انجام نشد و ثبت نشد، لطفاً دوباره تلاش کنید"
+
+
+class ReservationCommand:
+    """یک درخواست رزرو در صف نویسنده"""
+
+    __slots__ = ('user_id', 'menu_item_id', 'quantity', 'is_extra', 'idempotency_key', 'future', 'enqueued')
+
+    def __init__(self, user_id, menu_item_id, quantity, is_extra, idempotency_key):
+        self.user_id = user_id
+        self.menu_item_id = menu_item_id
+        self.quantity = quantity
+        self.is_extra = is_extra
+        self.idempotency_key = idempotency_key
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class ReservationWriter:
+    """نخ نویسنده رزروها: درخواست‌های صف را دسته‌ای در یک تراکنش ثبت می‌کند (group commit)"""
+
+    def __init__(self, database, max_batch: int = 128, max_wait_ms: float = 0.0,
+                 max_queue: int = 10000, result_timeout: float = 30.0):
+        self.database = database
+        self.max_batch = max_batch
+        # صبر اضافه برای پر شدن دسته؛ صفر یعنی فقط آنچه در صف هست
+        self.max_wait = max_wait_ms / 1000
+        self.result_timeout = result_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        # پس از stop هیچ درخواستی پشت نشانه پایان صف قرار نمی‌گیرد
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'batches': 0,
+            'commands': 0,
+            'batch_failures': 0,
+            'max_batch_size': 0,
+            'max_queue_depth': 0,
+            'queue_wait_time': 0.0,
+            'commit_time': 0.0,
+        }
+
+    def start(self):
+        """راه‌اندازی نخ نویسنده"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='reservation-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """پردازش باقی‌مانده صف و توقف نخ"""
+        with self._lock:
+            # submit صف را زیر همین قفل پر می‌کند؛ پس از این خط درخواست تازه‌ای وارد صف نمی‌شود
+            self._stopping = True
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            # بیرون از قفل: نخ نویسنده برای آمار به قفل نیاز دارد و صف پر را خالی می‌کند
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+               idempotency_key: Optional[str] = None) -> Optional[Future]:
+        """افزودن رزرو به صف؛ نتیجه (موفقیت، پیام، تکراری بودن) در Future برمی‌گردد
+
+        None یعنی نویسنده در حال توقف است و فراخواننده باید مستقیم ثبت کند.
+        """
+        command = ReservationCommand(user_id, menu_item_id, quantity, is_extra, idempotency_key)
+        with self._lock:
+            if self._stopping:
+                return None
+            try:
+                self._queue.put_nowait(command)
+            except queue.Full:
+                self._stats['rejected'] += 1
+                command.future.set_result((False, QUEUE_FULL_MESSAGE, False))
+                return command.future
+
+            depth = self._queue.qsize()
+            self._stats['submitted'] += 1
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+        return command.future
+
+    def execute(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                idempotency_key: Optional[str] = None):
+        """ثبت از طریق صف و انتظار برای نتیجه؛ None یعنی نویسنده در حال توقف است
+
+        اگر مهلت result_timeout بگذرد و درخواست هنوز اجرا نشده باشد لغو می‌شود تا بعداً بی‌خبر
+        از فراخواننده commit نشود؛ اگر در میانه commit باشد منتظر نتیجه واقعی می‌ماند.
+        """
+        future = self.submit(user_id, menu_item_id, quantity, is_extra, idempotency_key)
+        if future is None:
+            return None
+        try:
+            return future.result(self.result_timeout)
+        except FutureTimeout:
+            if future.cancel():
+                with self._lock:
+                    self._stats['timed_out'] += 1
+                return False, QUEUE_TIMEOUT_MESSAGE, False
+            return future.result()
+
+    def _run(self):
+        while True:
+            command = self._queue.get()
+            if command is None:
+                return
+
+            batch = [command]
+            stopping = False
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    command = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if command is None:
+                    stopping = True
+                    break
+                batch.append(command)
+
+            self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch: List[ReservationCommand]):
+        """ثبت یک دسته و تحویل نتیجه هر درخواست پس از commit"""
+        # درخواست‌هایی که فراخواننده لغو کرده کنار گذاشته می‌شوند
+        batch = [command for command in batch if command.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        queue_wait = sum(started - command.enqueued for command in batch)
+        try:
+            results = self.database.pool.run_with_retry(lambda: self._commit_batch(batch))
+        except Exception as e:
+            with self._lock:
+                self._stats['batch_failures'] += 1
+            for command in batch:
+                command.future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stats = self._stats
+            stats['batches'] += 1
+            stats['commands'] += len(batch)
+            stats['max_batch_size'] = max(stats['max_batch_size'], len(batch))
+            stats['queue_wait_time'] += queue_wait
+            stats['commit_time'] += elapsed
+
+        for command, result in zip(batch, results):
+            if isinstance(result, Exception):
+                command.future.set_exception(result)
+            else:
+                command.future.set_result(result)
+
+    def _commit_batch(self, batch: List[ReservationCommand]) -> list:
+        """همه رزروهای دسته در یک تراکنش؛ هر رزرو در savepoint جداگانه"""
+        database = self.database
+        conn = database.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            results = []
+            for command in batch:
+                cursor.execute('SAVEPOINT reservation')
+                try:
+                    # بررسی ظرفیت برای هر آیتم همان UPDATE شرطی مسیر عادی است
+                    if command.idempotency_key is None:
+                        success, message = database._reserve_in_transaction(
+                            cursor, command.user_id, command.menu_item_id, command.quantity, command.is_extra
+                        )
+                        result = (success, message, False)
+                    else:
+                        result = database._reserve_idempotent(
+                            cursor, command.user_id, command.menu_item_id, command.quantity,
+                            command.is_extra, command.idempotency_key
+                        )
+                    cursor.execute('RELEASE SAVEPOINT reservation')
+                except sqlite3.OperationalError:
+                    # قفل یا خطای دیتابیس: کل دسته دوباره تلاش می‌شود
+                    raise
+                except Exception as e:
+                    # خطای یک رزرو بقیه دسته را خراب نمی‌کند
+                    cursor.execute('ROLLBACK TO SAVEPOINT reservation')
+                    cursor.execute('RELEASE SAVEPOINT reservation')
+                    result = e
+                results.append(result)
+
+            conn.commit()
+            return results
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict:
+        """آمار صف و دسته‌ها"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        stats['queue_depth'] = self._queue.qsize()
+        stats['running'] = self._thread is not None
+        stats['max_batch'] = self.max_batch
+        stats['max_wait_ms'] = self.max_wait * 1000
+        batches, commands = stats['batches'], stats['commands']
+        stats['avg_batch_size'] = round(commands / batches, 2) if batches else 0.0
+        stats['avg_queue_wait_ms'] = round(stats['queue_wait_time'] / commands * 1000, 3) if commands else 0.0
+        stats['avg_commit_ms'] = round(stats['commit_time'] / batches * 1000, 3) if batches else 0.0
+        stats['queue_wait_time'] = round(stats['queue_wait_time'], 6)
+        stats['commit_time'] = round(stats['commit_time'], 6)
+        return stats
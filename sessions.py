@@ -0,0 +1,448 @@
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from connection_pool import ConnectionPool
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """سشن سمت سرور؛ کوکی فقط شناسه تصادفی را نگه می‌دارد و اطلاعات کاربر در store کش می‌شود"""
+
+    def __init__(self, sid: str, data: Optional[Dict] = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(data or {}, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        """شناسه جدید هنگام ورود (جلوگیری از session fixation)"""
+        self.rotate = True
+        self.modified = True
+
+
+class SessionRecord:
+    """یک سشن ذخیره شده"""
+
+    __slots__ = ('data', 'user_id', 'created_at', 'last_seen')
+
+    def __init__(self, data: Dict, created_at: float, last_seen: float):
+        self.data = data
+        self.user_id = data.get('user_id')
+        self.created_at = created_at
+        self.last_seen = last_seen
+
+
+class MemorySessionStore:
+    """سشن‌ها در حافظه همین پروسه (LRU با انقضای بیکاری و انقضای مطلق)"""
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 1800.0,
+                 absolute_timeout: float = 12 * 3600):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.absolute_timeout = absolute_timeout
+
+        self._lock = threading.Lock()
+        # ترتیب OrderedDict همان ترتیب last_seen است (قدیمی‌ترین اول)
+        self._sessions = OrderedDict()
+        self._by_user = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'created': 0,
+            'expired': 0,
+            'evicted': 0,
+            'revoked': 0,
+        }
+
+    def _expired(self, record: SessionRecord, now: float) -> bool:
+        return now - record.last_seen >= self.idle_timeout or now - record.created_at >= self.absolute_timeout
+
+    def _remove(self, sid: str):
+        """حذف سشن و ایندکس کاربر آن (زیر قفل صدا زده می‌شود)"""
+        record = self._sessions.pop(sid, None)
+        if record is not None and record.user_id is not None:
+            sids = self._by_user.get(record.user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._by_user[record.user_id]
+        return record
+
+    def get(self, sid: str) -> Optional[Dict]:
+        """داده سشن (و ثبت فعالیت)؛ None اگر وجود نداشته یا منقضی شده باشد"""
+        now = time.time()
+        with self._lock:
+            record = self._sessions.get(sid)
+            if record is None:
+                self._stats['misses'] += 1
+                return None
+            if self._expired(record, now):
+                self._remove(sid)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            record.last_seen = now
+            self._sessions.move_to_end(sid)
+            self._stats['hits'] += 1
+            return dict(record.data)
+
+    def save(self, sid: str, data: Dict):
+        """ذخیره داده سشن؛ در صورت پر بودن، کم‌استفاده‌ترین سشن کنار گذاشته می‌شود"""
+        now = time.time()
+        with self._lock:
+            old = self._remove(sid)
+            record = SessionRecord(dict(data), old.created_at if old else now, now)
+            if old is None:
+                self._stats['created'] += 1
+
+            self._sessions[sid] = record
+            if record.user_id is not None:
+                self._by_user.setdefault(record.user_id, set()).add(sid)
+
+            while len(self._sessions) > self.max_sessions:
+                self._remove(next(iter(self._sessions)))
+                self._stats['evicted'] += 1
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._remove(sid)
+
+    def revoke_user(self, user_id: int) -> int:
+        """خروج اجباری همه سشن‌های یک کاربر؛ خروجی: تعداد سشن‌ها"""
+        with self._lock:
+            sids = list(self._by_user.get(user_id, ()))
+            for sid in sids:
+                self._remove(sid)
+            self._stats['revoked'] += len(sids)
+        return len(sids)
+
+    def revoke_all(self) -> int:
+        """خروج اجباری همه کاربران"""
+        with self._lock:
+            count = len(self._sessions)
+            self._sessions.clear()
+            self._by_user.clear()
+            self._stats['revoked'] += count
+        return count
+
+    def expire_idle(self) -> int:
+        """حذف سشن‌های بیکار از ابتدای LRU؛ خروجی: تعداد حذف شده"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._sessions:
+                sid, record = next(iter(self._sessions.items()))
+                if now - record.last_seen < self.idle_timeout:
+                    break
+                self._remove(sid)
+                removed += 1
+            # انقضای مطلق به ترتیب LRU نیست؛ هنگام خواندن هم بررسی می‌شود
+            stale = [sid for sid, record in self._sessions.items()
+                     if now - record.created_at >= self.absolute_timeout]
+            for sid in stale:
+                self._remove(sid)
+            removed += len(stale)
+            self._stats['expired'] += removed
+        return removed
+
+    def get_stats(self) -> Dict:
+        """آمار سشن‌ها"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._sessions)
+            stats['users'] = len(self._by_user)
+        stats['backend'] = 'memory'
+        return stats
+
+
+class SqliteSessionStore:
+    """سشن‌ها در فایل SQLite مشترک بین پروسه‌ها، با کش محلی کوتاه‌مدت جلوی آن
+
+    هر سشن حداکثر هر cache_ttl ثانیه یک بار خوانده و هر touch_interval ثانیه یک بار
+    به‌روز می‌شود؛ لغو سشن در پروسه‌های دیگر حداکثر پس از cache_ttl اثر می‌کند.
+    """
+
+    def __init__(self, path: str, idle_timeout: float = 1800.0, absolute_timeout: float = 12 * 3600,
+                 cache_ttl: float = 5.0, touch_interval: float = 60.0, max_cached: int = 10000):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.absolute_timeout = absolute_timeout
+        self.cache_ttl = cache_ttl
+        self.touch_interval = touch_interval
+        self.max_cached = max_cached
+        self.pool = ConnectionPool(path, max_size=4)
+
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        # sid -> (record، زمان خواندن از فایل)
+        self._cache = OrderedDict()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'loads': 0,
+            'touches': 0,
+            'created': 0,
+            'expired': 0,
+            'revoked': 0,
+        }
+
+    def _connection(self):
+        conn = self.pool.acquire()
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    conn.execute('''
+                    CREATE TABLE IF NOT EXISTS sessions (
+                        sid TEXT PRIMARY KEY,
+                        user_id INTEGER,
+                        data TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_seen REAL NOT NULL
+                    ) WITHOUT ROWID
+                    ''')
+                    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions (last_seen)')
+                    conn.commit()
+                    self._schema_ready = True
+        return conn
+
+    def _expired(self, record: SessionRecord, now: float) -> bool:
+        return now - record.last_seen >= self.idle_timeout or now - record.created_at >= self.absolute_timeout
+
+    def _forget(self, sids):
+        with self._lock:
+            for sid in sids:
+                self._cache.pop(sid, None)
+
+    def get(self, sid: str) -> Optional[Dict]:
+        """داده سشن؛ از کش محلی اگر تازه باشد، وگرنه از فایل"""
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(sid)
+            if cached is not None and now - cached[1] < self.cache_ttl:
+                record = cached[0]
+                if not self._expired(record, now) and now - record.last_seen < self.touch_interval:
+                    self._cache.move_to_end(sid)
+                    self._stats['hits'] += 1
+                    return dict(record.data)
+
+        conn = self._connection()
+        try:
+            row = conn.execute('SELECT data, created_at, last_seen FROM sessions WHERE sid = ?', (sid,)).fetchone()
+            record = None if row is None else SessionRecord(json.loads(row['data']), row['created_at'],
+                                                            row['last_seen'])
+            if record is not None and self._expired(record, now):
+                conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+                conn.commit()
+                self._stats['expired'] += 1
+                record = None
+            elif record is not None and now - record.last_seen >= self.touch_interval:
+                conn.execute('UPDATE sessions SET last_seen = ? WHERE sid = ?', (now, sid))
+                conn.commit()
+                record.last_seen = now
+                self._stats['touches'] += 1
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._stats['loads'] += 1
+            if record is None:
+                self._cache.pop(sid, None)
+                self._stats['misses'] += 1
+                return None
+            self._cache[sid] = (record, now)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+            self._stats['hits'] += 1
+        return dict(record.data)
+
+    def save(self, sid: str, data: Dict):
+        now = time.time()
+        conn = self._connection()
+        try:
+            cursor = conn.execute('''
+            INSERT INTO sessions (sid, user_id, data, created_at, last_seen)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (sid) DO UPDATE SET
+                user_id = excluded.user_id,
+                data = excluded.data,
+                last_seen = excluded.last_seen
+            RETURNING created_at
+            ''', (sid, data.get('user_id'), json.dumps(data, ensure_ascii=False), now, now))
+            created_at = cursor.fetchone()[0]
+            conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            if created_at == now:
+                self._stats['created'] += 1
+            self._cache[sid] = (SessionRecord(dict(data), created_at, now), now)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+    def delete(self, sid: str):
+        self._forget([sid])
+        conn = self._connection()
+        try:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _delete_where(self, where: str, params=()) -> int:
+        """حذف سشن‌ها با شرط؛ خروجی: تعداد حذف شده"""
+        conn = self._connection()
+        try:
+            sids = [row[0] for row in conn.execute(f'DELETE FROM sessions WHERE {where} RETURNING sid', params)]
+            conn.commit()
+        finally:
+            conn.close()
+        self._forget(sids)
+        return len(sids)
+
+    def revoke_user(self, user_id: int) -> int:
+        """خروج اجباری همه سشن‌های یک کاربر (در همه پروسه‌ها)"""
+        count = self._delete_where('user_id = ?', (user_id,))
+        with self._lock:
+            self._stats['revoked'] += count
+        return count
+
+    def revoke_all(self) -> int:
+        """خروج اجباری همه کاربران"""
+        count = self._delete_where('1 = 1')
+        with self._lock:
+            self._cache.clear()
+            self._stats['revoked'] += count
+        return count
+
+    def expire_idle(self) -> int:
+        """حذف سشن‌های بیکار یا قدیمی از فایل"""
+        now = time.time()
+        count = self._delete_where('last_seen < ? OR created_at < ?',
+                                   (now - self.idle_timeout, now - self.absolute_timeout))
+        with self._lock:
+            self._stats['expired'] += count
+        return count
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = len(self._cache)
+        stats['backend'] = 'sqlite'
+        return stats
+
+
+class ServerSessionInterface(SessionInterface):
+    """جایگزین سشن کوکی Flask با store سمت سرور و پاک‌سازی دوره‌ای سشن‌های بیکار"""
+
+    def __init__(self, store, reap_interval: float = 60.0):
+        self.store = store
+        self.reap_interval = reap_interval
+        self._stop = threading.Event()
+        self._reaper = None
+        self._reaper_lock = threading.Lock()
+
+    def init_app(self, app):
+        # نخ پاک‌سازی با اولین درخواست شروع می‌شود، نه هنگام import (دستورهای CLI و آزمون‌ها نخ نمی‌سازند)
+        app.session_interface = self
+        app.extensions['sessions'] = self
+
+    def start_reaper(self):
+        """نخ پس‌زمینه حذف سشن‌های بیکار (یک بار؛ پس از stop_reaper دوباره شروع نمی‌شود)"""
+        if self._reaper is not None or self.reap_interval <= 0:
+            return
+        with self._reaper_lock:
+            if self._reaper is not None or self._stop.is_set():
+                return
+            self._reaper = threading.Thread(target=self._reap, name='session-reaper', daemon=True)
+            self._reaper.start()
+
+    def stop_reaper(self):
+        self._stop.set()
+        if self._reaper is not None:
+            self._reaper.join()
+            self._reaper = None
+
+    def _reap(self):
+        while not self._stop.wait(self.reap_interval):
+            try:
+                self.store.expire_idle()
+            except Exception:
+                # خطای گذرا (مثلاً قفل فایل) در دور بعد دوباره امتحان می‌شود
+                pass
+
+    def open_session(self, app, request) -> ServerSession:
+        self.start_reaper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(sid, data)
+        return ServerSession(_new_sid(), new=True)
+
+    def save_session(self, app, session: ServerSession, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            # سشن خالی (مثلاً پس از خروج) ذخیره نمی‌شود
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.modified:
+            return
+
+        if session.rotate and not session.new:
+            self.store.delete(session.sid)
+            session.sid = _new_sid()
+        self.store.save(session.sid, dict(session))
+
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        response.vary.add('Cookie')
+
+
+def _new_sid() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def from_environ(app) -> ServerSessionInterface:
+    """انتخاب store با FOOD_SESSION_STORE: memory (پیش‌فرض، یک پروسه) یا sqlite (چند پروسه)"""
+    idle_timeout = float(os.environ.get('FOOD_SESSION_IDLE_TIMEOUT', 1800))
+    absolute_timeout = float(os.environ.get('FOOD_SESSION_MAX_AGE', 12 * 3600))
+
+    if os.environ.get('FOOD_SESSION_STORE', 'memory') == 'sqlite':
+        store = SqliteSessionStore(os.environ.get('FOOD_SESSION_DB', 'sessions.db'),
+                                   idle_timeout=idle_timeout, absolute_timeout=absolute_timeout)
+    else:
+        store = MemorySessionStore(max_sessions=int(os.environ.get('FOOD_SESSION_MAX', 10000)),
+                                   idle_timeout=idle_timeout, absolute_timeout=absolute_timeout)
+
+    interface = ServerSessionInterface(store)
+    interface.init_app(app)
+    return interface
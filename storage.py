@@ -0,0 +1,641 @@
+import base64
+import heapq
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import jdatetime
+
+import credentials
+from capacity_events import CapacityBroadcaster, menu_snapshot
+from menu_cache import MenuCache
+from records import MENU_ITEM_COLUMNS, USER_RESERVATION_COLUMNS, MenuItem, User, UserReservation, WaitlistEntry, columns
+
+# ستون‌های قابل نمایش کاربران (بدون password)
+USER_PUBLIC_COLUMNS = columns(User)
+
+# پیام‌های مشترک موتور رزرو (شمارنده‌ها بر اساس همین پیام‌ها دسته‌بندی می‌شوند)
+RESERVATION_OK = "رزرو با موفقیت ثبت شد"
+CAPACITY_FULL = "ظرفیت کامل است"
+ITEM_NOT_FOUND = "غذا پیدا نشد"
+IDEMPOTENCY_CONFLICT = "این کلید تکرار قبلاً برای درخواست دیگری استفاده شده است"
+CANCEL_OK = "رزرو لغو شد"
+RESERVATION_NOT_FOUND = "رزرو پیدا نشد"
+ALREADY_CANCELLED = "این رزرو قبلاً لغو شده است"
+DEADLINE_PASSED = "مهلت رزرو و لغو این هفته گذشته است"
+WAITLIST_JOINED = "به لیست انتظار اضافه شدید"
+ALREADY_WAITING = "شما قبلاً در لیست انتظار این غذا هستید"
+WAITLIST_NOT_FOUND = "درخواست انتظار پیدا نشد"
+
+# آیتم‌های منوی یک هفته به ترتیب روزهای هفته؛ {p} = placeholder
+WEEKLY_MENU_ITEMS_SQL = f'''
+SELECT {MENU_ITEM_COLUMNS} FROM menu_items
+WHERE weekly_menu_id = {{p}}
+ORDER BY
+    CASE day_of_week
+        WHEN 'شنبه' THEN 1
+        WHEN 'یکشنبه' THEN 2
+        WHEN 'دوشنبه' THEN 3
+        WHEN 'سه‌شنبه' THEN 4
+        WHEN 'چهارشنبه' THEN 5
+        ELSE 6
+    END, id
+'''
+
+FOODS_FOR_DAY_SQL = f'''
+SELECT {MENU_ITEM_COLUMNS} FROM menu_items
+WHERE weekly_menu_id = {{p}} AND day_of_week = {{p}}
+ORDER BY id
+'''
+
+# رزروهای قطعی کاربر در یک دیتابیس؛ شاخه‌های history_schemas با user_reservations_sql کنار هم می‌آیند
+USER_RESERVATIONS_SQL = f'''
+SELECT {USER_RESERVATION_COLUMNS}
+FROM {{schema}}reservations r
+JOIN {{schema}}menu_items m ON r.menu_item_id = m.id
+WHERE r.user_id = {{p}} AND r.status = 'CONFIRMED'
+'''
+
+# صفحه کاربران؛ {where} را هر backend از شرط‌های keyset، بخش، وضعیت و جستجو می‌سازد
+USERS_PAGE_SQL = f'''
+SELECT {USER_PUBLIC_COLUMNS}
+FROM users
+{{where}}
+ORDER BY created_at DESC, id DESC
+LIMIT {{p}}
+'''
+USERS_CURSOR_CONDITION = '(created_at, id) < ({p}, {p})'
+# جستجوی پیشوندی به شکل بازه تا از ایندکس نام و ایمیل استفاده شود
+USERS_SEARCH_CONDITION = '((full_name >= {p} AND full_name < {p}) OR (email >= {p} AND email < {p}))'
+
+# خروجی رزروها برای مالی؛ {where} و placeholderها را هر backend و {schema} را history_schemas پر می‌کند
+EXPORT_RESERVATIONS_SQL = '''
+SELECT r.id, r.reservation_date, r.reserved_at, r.status, r.quantity, r.is_extra, r.paid_amount,
+       m.company_share * r.quantity AS company_share,
+       u.employee_id, u.full_name, u.department, m.food_name, m.day_of_week
+FROM {schema}reservations r
+JOIN users u ON u.id = r.user_id
+JOIN {schema}menu_items m ON m.id = r.menu_item_id
+{where}
+ORDER BY r.reservation_date, r.id
+'''
+
+# جمع روزانه هر کارمند (به ترتیب کارمند و تاریخ تا جمع ماه شمسی جریانی ساخته شود)
+EXPORT_USER_DAILY_SQL = '''
+SELECT u.id AS user_id, u.employee_id, u.full_name, u.department, r.reservation_date,
+       COUNT(*) AS reservations, SUM(r.quantity) AS quantity,
+       SUM(r.paid_amount) AS paid_amount, SUM(m.company_share * r.quantity) AS company_share
+FROM {schema}reservations r
+JOIN users u ON u.id = r.user_id
+JOIN {schema}menu_items m ON m.id = r.menu_item_id
+{where}
+GROUP BY u.id, r.reservation_date
+ORDER BY u.id, r.reservation_date
+'''
+
+
+# پیش‌بینی آشپزخانه: رزروهای قطعی هر غذای منو (عادی و اضافه) و صف انتظار آن؛ {p} = placeholder
+FORECAST_ITEMS_SQL = '''
+SELECT m.id, m.day_of_week, m.food_name, m.capacity,
+       COALESCE(SUM(r.quantity), 0) AS confirmed,
+       COALESCE(SUM(CASE WHEN r.is_extra = 1 THEN r.quantity ELSE 0 END), 0) AS extra,
+       (SELECT COALESCE(SUM(q.quantity), 0) FROM waitlist q
+        WHERE q.menu_item_id = m.id AND q.status = 'WAITING') AS waiting
+FROM menu_items m
+LEFT JOIN reservations r ON r.menu_item_id = m.id AND r.status = 'CONFIRMED'
+WHERE m.weekly_menu_id = {p}
+GROUP BY m.id, m.day_of_week, m.food_name, m.capacity
+ORDER BY m.id
+'''
+
+# سابقه همان غذاها در هفته‌های قبل؛ تقاضای هر وعده از خلاصه آمار + صف انتظار بی‌پاسخ،
+# لغوها از ایندکس (menu_item_id, status) — بدون خواندن همه رزروهای گذشته؛ غذاهای منوی فعال همیشه از اصلی
+FORECAST_HISTORY_SQL = '''
+WITH history AS (
+    SELECT m.food_name, m.capacity,
+           COALESCE(s.confirmed_quantity, 0) AS confirmed,
+           (SELECT COALESCE(SUM(q.quantity), 0) FROM {schema}waitlist q
+            WHERE q.menu_item_id = m.id AND q.status = 'WAITING') AS unmet,
+           (SELECT COALESCE(SUM(c.quantity), 0) FROM {schema}reservations c
+            WHERE c.menu_item_id = m.id AND c.status = 'CANCELLED') AS cancelled
+    FROM {schema}menu_items m
+    JOIN {schema}weekly_menus w ON w.id = m.weekly_menu_id
+    LEFT JOIN {schema}menu_stats s ON s.weekly_menu_id = m.weekly_menu_id AND s.menu_item_id = m.id
+    WHERE m.food_name IN (SELECT food_name FROM menu_items WHERE weekly_menu_id = {p})
+      AND w.week_start >= {p} AND w.week_start < {p}
+)
+SELECT food_name, COUNT(*) AS servings, SUM(confirmed) AS confirmed, SUM(unmet) AS unmet,
+       SUM(cancelled) AS cancelled, SUM(CASE WHEN confirmed >= capacity THEN 1 ELSE 0 END) AS sold_out
+FROM history
+GROUP BY food_name
+'''
+
+
+def user_reservations_sql(schemas, placeholder: str) -> str:
+    """رزروهای قطعی کاربر در همه دیتابیس‌های سابقه، تازه‌ترین اول (هر شاخه روی ایندکس خودش)"""
+    return ' UNION ALL '.join(
+        USER_RESERVATIONS_SQL.format(schema=schema, p=placeholder) for schema in schemas
+    ) + ' ORDER BY reserved_at DESC'
+
+
+class Storage(ABC):
+    """رابط ذخیره‌سازی سیستم رزرو؛ کش منو، پخش ظرفیت و شمارنده‌ها بین backendها مشترک است"""
+
+    # نشانه پارامتر SQL این backend ('?' یا '%s')
+    placeholder = None
+    # پیشوند schemaهایی که تاریخچه از آن‌ها خوانده می‌شود (SQLite با بایگانی: main. و archive.)
+    history_schemas = ('',)
+
+    def __init__(self, idempotency_ttl: float = 24 * 3600, hasher: Optional[credentials.PasswordHasher] = None):
+        self.idempotency_ttl = idempotency_ttl
+        # هش رمز عبور (هزینه و استخر KDF از متغیرهای FOOD_PASSWORD_*)
+        self.hasher = hasher or credentials.from_environ()
+        self.menu_cache = MenuCache()
+        # پخش زنده تغییرات ظرفیت به کلاینت‌های SSE
+        self.capacity_events = CapacityBroadcaster()
+        self._stats_lock = threading.Lock()
+        self._stats_started = time.monotonic()
+        self._reservation_stats = {
+            'attempts': 0,
+            'confirmed': 0,
+            'rejected_full': 0,
+            'rejected_other': 0,
+            'replayed': 0,
+            'errors': 0,
+            'cancelled': 0,
+            'promoted': 0,
+            'quantity': 0,
+            'total_time': 0.0
+        }
+
+    # --- چرخه عمر و آمار اتصال ---
+
+    @abstractmethod
+    def init_db(self, with_sample_data: bool = True):
+        """ایجاد/به‌روزرسانی اسکیما و داده‌های اولیه"""
+
+    @abstractmethod
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """کوئری‌های داغی که از ایندکس استفاده نمی‌کنند"""
+
+    @abstractmethod
+    def get_pool_stats(self) -> Dict:
+        """آمار استخر اتصال‌ها"""
+
+    @abstractmethod
+    def close(self):
+        """بستن همه اتصال‌ها"""
+
+    def get_writer_stats(self) -> Optional[Dict]:
+        """آمار نویسنده دسته‌ای رزروها (فقط backendهایی که آن را دارند)"""
+        return None
+
+    # --- کاربران ---
+
+    def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
+        """احراز هویت کاربر؛ رمز قدیمی (متن ساده) یا با هزینه کمتر در همین ورود دوباره هش می‌شود
+
+        اگر استخر KDF پر باشد credentials.CredentialsBusy بالا می‌رود.
+        """
+        if not email or not password:
+            return None
+
+        user = self._get_login_user(email)
+        if user is None:
+            return None
+
+        stored = user.pop('password')
+        ok, rehash = self.hasher.verify(password, stored, cache_key=user['id'])
+        if not ok:
+            return None
+        if rehash:
+            self._set_password_hash(user['id'], stored, self.hasher.hash(password))
+        return user
+
+    @abstractmethod
+    def _get_login_user(self, email: str) -> Optional[Dict]:
+        """کاربر فعال با این ایمیل (ستون‌های عمومی به همراه password)"""
+
+    @abstractmethod
+    def _set_password_hash(self, user_id: int, old_hash: str, new_hash: str):
+        """جایگزینی هش رمز، فقط اگر در این فاصله عوض نشده باشد"""
+
+    def _hash_new_user_passwords(self, rows: List[tuple], existing_employee_ids) -> Dict[str, str]:
+        """هش رمز ردیف‌هایی از درون‌ریزی که کاربر جدید می‌شوند، پیش از گرفتن قفل نوشتن
+
+        rows: (شماره ردیف، employee_id، full_name، email، password، department)؛ خروجی: employee_id → هش
+        """
+        pending = {}
+        for row in rows:
+            if row[1] not in existing_employee_ids:
+                pending.setdefault(row[1], row[4])
+        return dict(zip(pending, self.hasher.hash_many(list(pending.values()))))
+
+    def get_all_users(self) -> List[User]:
+        """دریافت همه کاربران"""
+        return list(self.iter_users())
+
+    def iter_users(self, batch_size: int = 1000) -> Iterator[User]:
+        """همه کاربران به صورت جریانی (بدون password)، جدیدترین اول"""
+        return self._iter_query(f'SELECT {USER_PUBLIC_COLUMNS} FROM users ORDER BY created_at DESC', [],
+                                batch_size, record=User)
+
+    @abstractmethod
+    def get_users_page(self, limit: int = 50, cursor: Optional[str] = None, department: Optional[str] = None,
+                       is_active: Optional[bool] = None, search: Optional[str] = None) -> Dict:
+        """یک صفحه از کاربران (صفحه‌بندی keyset)"""
+
+    @abstractmethod
+    def create_user(self, employee_id: str, full_name: str, email: str, password: str,
+                    department: str, is_admin: bool = False):
+        """ایجاد کاربر جدید؛ خروجی: (موفقیت، پیام)"""
+
+    @abstractmethod
+    def set_user_active(self, user_id: int, is_active: bool):
+        """فعال/غیرفعال کردن کاربر؛ خروجی: (موفقیت، پیام)"""
+
+    @abstractmethod
+    def bulk_upsert_users(self, rows: List[tuple]) -> Dict:
+        """درج/به‌روزرسانی دسته‌ای کاربران در یک تراکنش"""
+
+    # --- منو ---
+
+    def get_weekly_menu(self) -> Optional[Dict]:
+        """دریافت منوی هفته جاری (از کش)"""
+        return self.menu_cache.get(self._load_weekly_menu, self._load_reserved_counts)
+
+    def get_menu_cache_stats(self) -> Dict:
+        """آمار کش منو"""
+        return self.menu_cache.get_stats()
+
+    @abstractmethod
+    def _load_weekly_menu(self) -> Optional[Dict]:
+        """خواندن منوی هفته جاری از دیتابیس"""
+
+    @abstractmethod
+    def _load_reserved_counts(self, weekly_menu_id: int) -> Dict[int, int]:
+        """خواندن تعداد رزرو شده آیتم‌های یک منو"""
+
+    @abstractmethod
+    def create_weekly_menu(self, week_start: str, week_end: str, reservation_deadline: str):
+        """ایجاد منوی هفتگی جدید؛ خروجی: (موفقیت، شناسه، پیام)"""
+
+    @abstractmethod
+    def add_menu_item(self, weekly_menu_id: int, day_of_week: str, food_name: str, description: str,
+                      full_price: float, capacity: int, extra_food: bool = False, extra_food_price: float = None):
+        """اضافه کردن غذا به منو؛ خروجی: (موفقیت، پیام)"""
+
+    @abstractmethod
+    def create_weekly_menu_bulk(self, week_start: str, week_end: str, reservation_deadline: str,
+                                items: List[Dict]):
+        """ایجاد منوی هفتگی همراه با همه غذاها؛ خروجی: (موفقیت، شناسه، پیام)"""
+
+    @abstractmethod
+    def clone_weekly_menu(self, source_menu_id: Optional[int] = None, shift_days: int = 7,
+                          reservation_deadline: Optional[str] = None):
+        """کپی منوی یک هفته با جابه‌جایی تاریخ‌ها؛ خروجی: (موفقیت، شناسه، پیام)"""
+
+    @abstractmethod
+    def get_foods_for_day(self, weekly_menu_id: int, day_of_week: str) -> List[MenuItem]:
+        """دریافت غذاهای یک روز خاص"""
+
+    # --- رزرو ---
+
+    def get_user_reservations(self, user_id: int) -> List[UserReservation]:
+        """دریافت رزروهای یک کاربر"""
+        return list(self.iter_user_reservations(user_id))
+
+    @abstractmethod
+    def iter_user_reservations(self, user_id: int, batch_size: int = 1000) -> Iterator[UserReservation]:
+        """رزروهای قطعی یک کاربر به صورت جریانی، جدیدترین اول"""
+
+    def create_reservation(self, user_id: int, menu_item_id: int, quantity: int = 1, is_extra: bool = False,
+                           idempotency_key: Optional[str] = None):
+        """ایجاد رزرو جدید؛ با idempotency_key تکرار درخواست همان نتیجه اول را برمی‌گرداند"""
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
+            return False, "تعداد نامعتبر است"
+        if idempotency_key is not None and not (0 < len(idempotency_key) <= 128):
+            return False, "کلید تکرار نامعتبر است"
+
+        started = time.perf_counter()
+        try:
+            success, message, replayed = self._reserve(user_id, menu_item_id, quantity, is_extra, idempotency_key)
+        except Exception as e:
+            self._record_reservation('errors', started)
+            return False, f"خطا در ثبت رزرو: {str(e)}"
+
+        if replayed:
+            # نتیجه قبلی؛ menu_items و کش دست نخورده‌اند
+            self._record_reservation('replayed', started)
+        elif success:
+            self._publish_capacity(menu_item_id, quantity)
+            self._record_reservation('confirmed', started, quantity)
+        elif message == CAPACITY_FULL:
+            self._record_reservation('rejected_full', started)
+        else:
+            self._record_reservation('rejected_other', started)
+        return success, message
+
+    @abstractmethod
+    def _reserve(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool,
+                 idempotency_key: Optional[str]):
+        """ثبت رزرو با بررسی ظرفیت؛ خروجی: (موفقیت، پیام، تکراری بودن)"""
+
+    def _publish_capacity(self, menu_item_id: int, delta: int):
+        """به‌روزرسانی شمارنده کش و ارسال تغییر ظرفیت به کلاینت‌های متصل"""
+        cached = self.menu_cache.record_reservation(menu_item_id, delta)
+        reserved_count, capacity = cached if cached else (None, None)
+        self.capacity_events.publish(menu_item_id, delta, reserved_count, capacity)
+
+    def get_capacity_snapshot(self) -> Dict:
+        """ظرفیت باقی‌مانده غذاهای منوی فعال (از کش منو)"""
+        return menu_snapshot(self.get_weekly_menu())
+
+    def _record_reservation(self, outcome: str, started: float, quantity: int = 0):
+        """ثبت شمارنده‌های رزرو"""
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            stats = self._reservation_stats
+            stats['attempts'] += 1
+            stats[outcome] += 1
+            stats['quantity'] += quantity
+            stats['total_time'] += elapsed
+
+    def get_reservation_stats(self) -> Dict:
+        """شمارنده‌های موتور رزرو"""
+        with self._stats_lock:
+            stats = dict(self._reservation_stats)
+
+        uptime = time.monotonic() - self._stats_started
+        stats['uptime'] = round(uptime, 3)
+        stats['throughput'] = round(stats['confirmed'] / uptime, 3) if uptime else 0.0
+        stats['avg_latency_ms'] = round(stats['total_time'] / stats['attempts'] * 1000, 3) if stats['attempts'] else 0.0
+        stats['total_time'] = round(stats['total_time'], 6)
+
+        # غذاهایی که بیش از ظرفیت رزرو شده‌اند (باید همیشه صفر باشد)
+        stats['overbooked_items'] = self._count_overbooked()
+        return stats
+
+    # --- لغو و لیست انتظار ---
+
+    def cancel_reservation(self, user_id: int, reservation_id: int):
+        """لغو رزرو پیش از مهلت؛ ظرفیت آزاد شده در همان تراکنش به نفرات اول لیست انتظار می‌رسد"""
+        try:
+            success, message, menu_item_id, delta, promoted = self._cancel(user_id, reservation_id)
+        except Exception as e:
+            return False, f"خطا در لغو رزرو: {str(e)}"
+
+        if success:
+            if delta:
+                self._publish_capacity(menu_item_id, delta)
+            with self._stats_lock:
+                self._reservation_stats['cancelled'] += 1
+                self._reservation_stats['promoted'] += promoted
+        return success, message
+
+    @abstractmethod
+    def _cancel(self, user_id: int, reservation_id: int):
+        """لغو رزرو و ارتقای لیست انتظار در یک تراکنش؛ خروجی: (موفقیت، پیام، غذا، تغییر reserved_count، تعداد ارتقا)"""
+
+    def join_waitlist(self, user_id: int, menu_item_id: int, quantity: int = 1, is_extra: bool = False):
+        """رزرو اگر جا باز شده باشد، وگرنه ورود به صف انتظار غذا؛ خروجی: (موفقیت، پیام، جایگاه در صف)"""
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
+            return False, "تعداد نامعتبر است", None
+
+        started = time.perf_counter()
+        try:
+            success, message, position = self._join_waitlist(user_id, menu_item_id, quantity, is_extra)
+        except Exception as e:
+            return False, f"خطا در ثبت لیست انتظار: {str(e)}", None
+
+        if success and position is None:
+            # در فاصله پر شدن تا درخواست انتظار جا باز شده بود و رزرو مستقیم ثبت شد
+            self._publish_capacity(menu_item_id, quantity)
+            self._record_reservation('confirmed', started, quantity)
+        return success, message, position
+
+    @abstractmethod
+    def _join_waitlist(self, user_id: int, menu_item_id: int, quantity: int, is_extra: bool):
+        """رزرو یا ورود به صف انتظار در یک تراکنش؛ خروجی: (موفقیت، پیام، جایگاه یا None اگر رزرو شد)"""
+
+    @abstractmethod
+    def leave_waitlist(self, user_id: int, waitlist_id: int):
+        """خروج از صف انتظار؛ خروجی: (موفقیت، پیام)"""
+
+    @abstractmethod
+    def get_user_waitlist(self, user_id: int) -> List[WaitlistEntry]:
+        """درخواست‌های انتظار فعال یک کاربر همراه با جایگاه در صف"""
+
+    @abstractmethod
+    def _count_overbooked(self) -> int:
+        """تعداد غذاهایی که reserved_count آنها از capacity بیشتر است"""
+
+    # --- گزارش ---
+
+    @abstractmethod
+    def _iter_query(self, sql: str, params: list, batch_size: int, record=None) -> Iterator[Dict]:
+        """اجرای جریانی یک کوئری خواندنی (دسته‌ای، بدون بارگذاری همه ردیف‌ها در حافظه)
+
+        با record ردیف‌ها مستقیم رکورد فشرده آن نوع هستند (ستون‌های SELECT به ترتیب فیلدهای رکورد).
+        """
+
+    def iter_reservations(self, filters: Dict, batch_size: int = 1000) -> Iterator[Dict]:
+        """ردیف‌های رزرو با اطلاعات کارمند و غذا، به ترتیب تاریخ"""
+        return self._iter_history(EXPORT_RESERVATIONS_SQL, filters, batch_size,
+                                  key=lambda row: (row['reservation_date'], row['id']))
+
+    def iter_user_daily_totals(self, filters: Dict, batch_size: int = 1000) -> Iterator[Dict]:
+        """جمع روزانه رزروهای هر کارمند، به ترتیب کارمند و تاریخ"""
+        return self._iter_history(EXPORT_USER_DAILY_SQL, filters, batch_size,
+                                  key=lambda row: (row['user_id'], row['reservation_date']))
+
+    def _iter_history(self, template: str, filters: Dict, batch_size: int, key) -> Iterator[Dict]:
+        """اجرای کوئری گزارش روی هر schema تاریخچه و ادغام جریان‌های مرتب (بدون مرتب‌سازی دوباره)"""
+        where, params = _export_where(filters, self.placeholder)
+        streams = [self._iter_query(template.format(schema=schema, where=where), params, batch_size)
+                   for schema in self.history_schemas]
+        if len(streams) == 1:
+            return streams[0]
+        # هر روز فقط در یکی از دو دیتابیس است (هفته‌ها کامل بایگانی می‌شوند)
+        return heapq.merge(*streams, key=key)
+
+    def get_forecast_items(self, weekly_menu_id: int) -> List[Dict]:
+        """غذاهای یک منو با رزروهای قطعی (عادی و اضافه) و صف انتظار"""
+        return list(self._iter_query(FORECAST_ITEMS_SQL.format(p=self.placeholder), [weekly_menu_id]))
+
+    def get_dish_history(self, weekly_menu_id: int, since: str, before: str) -> Dict[str, Dict]:
+        """سابقه غذاهای یک منو در هفته‌های [since, before)؛ کلید: نام غذا"""
+        history = {}
+        for schema in self.history_schemas:
+            sql = FORECAST_HISTORY_SQL.format(p=self.placeholder, schema=schema)
+            for row in self._iter_query(sql, [weekly_menu_id, since, before]):
+                total = history.get(row['food_name'])
+                if total is None:
+                    history[row['food_name']] = row
+                    continue
+                for key in ('servings', 'confirmed', 'unmet', 'cancelled', 'sold_out'):
+                    total[key] += row[key]
+        return history
+
+    # --- آمار ---
+
+    @abstractmethod
+    def calculate_stats(self) -> Dict:
+        """محاسبه آمار سیستم"""
+
+    @abstractmethod
+    def rebuild_menu_stats(self, verify_only: bool = False) -> List[Dict]:
+        """بررسی (و در صورت نیاز بازسازی) خلاصه آمار؛ خروجی: ردیف‌های دارای اختلاف"""
+
+
+def _deadline_passed(deadline: Optional[str], now: Optional[datetime] = None) -> bool:
+    """گذشتن مهلت رزرو ('YYYY-MM-DD HH:MM[:SS]' میلادی یا شمسی)؛ مهلت نامعتبر مانع نمی‌شود"""
+    if not deadline:
+        return False
+
+    try:
+        if int(deadline[:4]) < 1700:
+            date_part, _, time_part = deadline.partition(' ')
+            year, month, day = (int(part) for part in date_part.replace('/', '-').split('-'))
+            value = jdatetime.date(year, month, day).togregorian().isoformat() + (' ' + time_part if time_part else '')
+        else:
+            value = deadline
+        limit = datetime.fromisoformat(value.replace('/', '-'))
+    except ValueError:
+        return False
+    return (now or datetime.now()) > limit
+
+
+def _export_where(filters: Dict, placeholder: str):
+    """شرط WHERE گزارش از فیلترهای date_from، date_to (میلادی)، department و status"""
+    conditions = []
+    params = []
+    for key, condition in (('date_from', 'r.reservation_date >= {}'), ('date_to', 'r.reservation_date <= {}'),
+                           ('department', 'u.department = {}'), ('status', 'r.status = {}')):
+        if filters.get(key):
+            conditions.append(condition.format(placeholder))
+            params.append(filters[key])
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ''), params
+
+
+def sample_users() -> List[tuple]:
+    """کاربران اولیه: (employee_id، full_name، email، password، department، is_admin)"""
+    return [
+        ('ADMIN001', 'مدیر سیستم', 'admin@company.com', 'Admin@123!', 'IT', 1),
+        ('EMP001', 'رضا محمدی', 'reza@company.com', 'User@123!', 'فروش', 0),
+        ('EMP002', 'سارا احمدی', 'sara@company.com', 'User@123!', 'مالی', 0),
+        ('EMP003', 'علی کریمی', 'ali@company.com', 'User@123!', 'پشتیبانی', 0)
+    ]
+
+
+def sample_menu():
+    """منوی نمونه هفته جاری شمسی؛ خروجی: ((week_start، week_end، deadline)، غذاها بدون weekly_menu_id)"""
+    # تاریخ امروز به شمسی
+    today_jalali = jdatetime.datetime.now()
+
+    # پیدا کردن شنبه این هفته
+    current_weekday = today_jalali.weekday()  # 0=شنبه, 1=یکشنبه, ...
+
+    if current_weekday == 0:  # اگر امروز شنبه است
+        week_start = today_jalali
+    else:
+        # رفتن به شنبه گذشته
+        week_start = today_jalali - timedelta(days=current_weekday)
+
+    # هفته کاری از شنبه تا چهارشنبه (5 روز)
+    week_end = week_start + timedelta(days=4)
+
+    # مهلت رزرو: چهارشنبه ساعت ۱۸:۰۰
+    deadline = week_start + timedelta(days=3, hours=18)  # سه روز بعد از شنبه = چهارشنبه
+
+    # تبدیل به رشته برای ذخیره در دیتابیس
+    week_start_str = week_start.strftime('%Y-%m-%d')
+    week_end_str = week_end.strftime('%Y-%m-%d')
+    deadline_str = deadline.togregorian().strftime('%Y-%m-%d %H:%M:%S')
+
+    print(f"📅 ایجاد منوی هفته شمسی:")
+    print(f"   شروع: {week_start_str} ({week_start.strftime('%Y/%m/%d')} شمسی)")
+    print(f"   پایان: {week_end_str} ({week_end.strftime('%Y/%m/%d')} شمسی)")
+    print(f"   مهلت: {deadline_str}")
+
+    # روزهای هفته به فارسی
+    days_fa = ['شنبه', 'یکشنبه', 'دوشنبه', 'سه‌شنبه', 'چهارشنبه']
+
+    # غذاهای نمونه برای هر روز (2 غذا برای هر روز)
+    foods = []
+    for day in days_fa:
+        # غذا اول برای هر روز
+        foods.append((day, 'قیمه بادمجان', 'با گوشت گوساله و لپه', 50000, 30000, 20000, 50))
+        # غذا دوم برای هر روز (گزینه دوم)
+        foods.append((day, 'مرغ گریل شده', 'با سس مخصوص', 45000, 27000, 18000, 40))
+
+    return (week_start_str, week_end_str, deadline_str), foods
+
+
+def _encode_cursor(created_at: str, user_id: int) -> str:
+    """ساخت cursor صفحه‌بندی از آخرین ردیف صفحه"""
+    raw = json.dumps([created_at, user_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str):
+    """خواندن cursor صفحه‌بندی"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, user_id = json.loads(raw)
+        return str(created_at), int(user_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('cursor نامعتبر است') from e
+
+
+def _split_price(full_price: float):
+    """تقسیم قیمت: ۶۰٪ سهم کاربر و ۴۰٪ سهم شرکت"""
+    return full_price * 0.6, full_price * 0.4
+
+
+def _menu_item_values(item: Dict) -> tuple:
+    """ستون‌های یک غذا (بدون weekly_menu_id) از دیکشنری ورودی API"""
+    day_of_week = item['day_of_week']
+    food_name = item['food_name']
+    if not day_of_week or not food_name:
+        raise ValueError('روز و نام غذا ضروری است')
+
+    full_price = float(item.get('full_price', 0))
+    capacity = int(item.get('capacity', 0))
+    extra_food = bool(item.get('extra_food', False))
+    extra_food_price = item.get('extra_food_price')
+    if extra_food_price is not None:
+        extra_food_price = float(extra_food_price)
+
+    user_price, company_share = _split_price(full_price)
+    return (day_of_week, food_name, item.get('description', ''), full_price,
+            user_price, company_share, capacity, 1 if extra_food else 0, extra_food_price)
+
+
+def _shift_date(value: str, days: int) -> str:
+    """جابه‌جایی تاریخ 'YYYY-MM-DD' (شمسی یا میلادی) به اندازه چند روز"""
+    year, month, day = (int(part) for part in value.split(' ')[0].split('-'))
+    if year < 1700:  # تاریخ شمسی
+        shifted = jdatetime.date(year, month, day) + timedelta(days=days)
+    else:
+        shifted = date(year, month, day) + timedelta(days=days)
+    return shifted.strftime('%Y-%m-%d')
+
+
+def _shift_datetime(value: str, days: int) -> str:
+    """جابه‌جایی تاریخ و ساعت میلادی به اندازه چند روز"""
+    if int(value[:4]) < 1700:
+        return _shift_date(value, days) + value[10:]
+    shifted = datetime.fromisoformat(value) + timedelta(days=days)
+    return shifted.strftime('%Y-%m-%d %H:%M:%S')
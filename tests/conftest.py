@@ -0,0 +1,90 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# DATABASE_URL فقط نشانی PostgreSQL آزمون‌هاست (اسکیمای public آن پاک می‌شود)؛
+# نمونه سراسری database.db نباید آن را بردارد
+PG_URL = os.environ.pop('DATABASE_URL', '')
+
+import credentials  # noqa: E402
+from database import Database  # noqa: E402
+
+# مهلت رزرو منوی آزمون هرگز نمی‌گذرد
+DEADLINE = '2099-12-31 18:00:00'
+
+
+def _fast_hasher():
+    return credentials.PasswordHasher(iterations=1000)
+
+
+def _reset_postgres(url: str):
+    """پاک کردن همه جدول‌ها تا هر آزمون از اسکیمای خالی شروع شود"""
+    import psycopg2
+
+    conn = psycopg2.connect(url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('DROP SCHEMA public CASCADE')
+            cursor.execute('CREATE SCHEMA public')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def db(request, tmp_path):
+    """دیتابیس تازه با کاربران نمونه؛ PostgreSQL فقط وقتی DATABASE_URL داده شده باشد"""
+    if request.param == 'postgres':
+        if not PG_URL:
+            pytest.skip('DATABASE_URL تنظیم نشده است')
+        pytest.importorskip('psycopg2')
+        from pg_database import PostgresDatabase
+
+        _reset_postgres(PG_URL)
+        database = PostgresDatabase(PG_URL, pool_size=8, hasher=_fast_hasher())
+    else:
+        database = Database(str(tmp_path / 'food.db'), hasher=_fast_hasher())
+
+    database.init_db()
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def users(db):
+    """شناسه کاربران نمونه بر اساس ایمیل"""
+    return {user['email']: user['id'] for user in db.iter_users()}
+
+
+@pytest.fixture
+def make_menu(db):
+    """ساخت منوی فعال با مهلت باز؛ خروجی: شناسه غذاها به ترتیب ورودی"""
+    def make(*capacities):
+        items = [{'day_of_week': 'شنبه', 'food_name': f'غذای {index}', 'full_price': 50000, 'capacity': capacity}
+                 for index, capacity in enumerate(capacities)]
+        success, weekly_menu_id, message = db.create_weekly_menu_bulk('1499-01-01', '1499-01-05', DEADLINE, items)
+        assert success, message
+        return [item['id'] for item in db.get_weekly_menu()['items']]
+    return make
+
+
+@pytest.fixture
+def execute(db):
+    """اجرای مستقیم یک دستور (برای خراب کردن عمدی داده در آزمون)"""
+    def run(sql: str):
+        if db.placeholder == '?':
+            conn = db.get_connection()
+            try:
+                conn.execute(sql)
+                conn.commit()
+            finally:
+                conn.close()
+        else:
+            with db._connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql)
+                conn.commit()
+    return run
@@ -0,0 +1,107 @@
+import pytest
+
+from archive import Archiver
+from conftest import DEADLINE, _fast_hasher
+from database import Database
+
+
+class Interrupt(Exception):
+    pass
+
+
+class InterruptingHook:
+    """hook زمان‌سنجی که پس از ثبت چند تکه، پیش از commit تکه بعد خطا می‌دهد (مثل قطع شدن پروسه)"""
+
+    def __init__(self, chunks: int):
+        self.chunks = chunks
+
+    def on_query(self, sql, seconds):
+        if 'UPDATE archive.archive_progress SET last_reservation_id' in sql:
+            self.chunks -= 1
+            if self.chunks < 0:
+                raise Interrupt()
+
+    def on_rows(self, count, seconds):
+        pass
+
+
+@pytest.fixture
+def archived_db(tmp_path):
+    database = Database(str(tmp_path / 'food.db'), hasher=_fast_hasher(), archive_path=str(tmp_path / 'archive.db'))
+    database.init_db()
+    yield database
+    database.close()
+
+
+def _count(db, sql, params=()):
+    conn = db.get_connection()
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _old_week(db):
+    """هفته‌ای قدیمی با ۵ رزرو؛ پس از آن منوی تازه فعال می‌شود"""
+    success, weekly_menu_id, _ = db.create_weekly_menu_bulk('2020-01-04', '2020-01-08', DEADLINE, [
+        {'day_of_week': 'شنبه', 'food_name': 'کباب', 'full_price': 50000, 'capacity': 10}])
+    assert success
+    item_id = db.get_weekly_menu()['items'][0].id
+    users = [user['id'] for user in db.iter_users()]
+    for user_id in users + [users[0]]:
+        assert db.create_reservation(user_id, item_id, 1)[0]
+
+    assert db.create_weekly_menu_bulk('2099-01-03', '2099-01-07', DEADLINE, [
+        {'day_of_week': 'شنبه', 'food_name': 'خورش', 'full_price': 50000, 'capacity': 10}])[0]
+    return weekly_menu_id, users[0]
+
+
+def test_archive_resumes_after_interruption(archived_db):
+    db = archived_db
+    weekly_menu_id, reza = _old_week(db)
+    reza_before = sorted(row.id for row in db.get_user_reservations(reza))
+    archiver = Archiver(db, retention_weeks=26, chunk_size=2)
+    assert archiver.pending_weeks() == [weekly_menu_id]
+
+    db.pool.query_hook = InterruptingHook(chunks=1)
+    with pytest.raises(Interrupt):
+        archiver.run()
+    db.pool.query_hook = None
+
+    # تکه اول منتقل شده و تکه دوم کامل برگشته است؛ هیچ رزروی گم یا تکراری نشده
+    assert _count(db, 'SELECT last_reservation_id FROM archive.archive_progress') == 2
+    assert _count(db, 'SELECT COUNT(*) FROM archive.reservations') == 2
+    assert _count(db, 'SELECT COUNT(*) FROM main.reservations') == 3
+    assert sorted(row.id for row in db.get_user_reservations(reza)) == reza_before
+
+    # قطع شدن بین commit دو فایل: ردیفی که هم در اصلی و هم در بایگانی مانده
+    conn = db.get_connection()
+    conn.execute('INSERT INTO archive.reservations SELECT * FROM main.reservations WHERE id = 3')
+    conn.commit()
+    conn.close()
+
+    # اجرای بعدی اول هفته نیمه‌کاره را تمام می‌کند
+    assert archiver.pending_weeks() == [weekly_menu_id]
+    summary = archiver.run()
+    assert (summary['weeks'], summary['reservations']) == (1, 5)
+    assert archiver.pending_weeks() == []
+
+    assert _count(db, 'SELECT COUNT(*) FROM main.reservations') == 0
+    assert _count(db, 'SELECT COUNT(*) FROM main.weekly_menus WHERE id = ?', (weekly_menu_id,)) == 0
+    assert _count(db, 'SELECT COUNT(*) FROM archive.reservations') == 5
+    assert _count(db, 'SELECT COUNT(*) FROM archive.archive_progress WHERE finished_at IS NOT NULL') == 1
+    assert sorted(row.id for row in db.get_user_reservations(reza)) == reza_before
+
+
+def test_active_and_recent_weeks_stay(archived_db):
+    db = archived_db
+    weekly_menu_id, _ = _old_week(db)
+    archiver = Archiver(db, retention_weeks=52 * 200)
+    assert archiver.pending_weeks() == []
+    assert archiver.run()['weeks'] == 0
+    assert db.get_weekly_menu()['week_start'] == '2099-01-03'
+
+
+def test_archiver_requires_archive_db(tmp_path):
+    with pytest.raises(RuntimeError):
+        Archiver(Database(str(tmp_path / 'food.db')))
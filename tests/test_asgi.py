@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+
+from flask import Flask, request
+
+import asgi
+from asgi import AsgiApp
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _scope(path, method='GET', headers=()):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': b'', 'headers': list(headers),
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+    }
+
+
+async def _request(application, path, method='GET', body=b''):
+    """یک درخواست کامل؛ خروجی: (وضعیت، سرآیندها، بدنه)"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {'body': b''}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = dict(message['headers'])
+        else:
+            response['body'] += message.get('body', b'')
+
+    await application(_scope(path, method), receive, send)
+    return response['status'], response['headers'], response['body']
+
+
+def _blocking_app():
+    """اپلیکیشن Flask با مسیری که تا رها شدن gate مشغول می‌ماند"""
+    flask_app = Flask(__name__)
+    gate = threading.Event()
+    entered = threading.Event()
+
+    @flask_app.route('/slow')
+    def slow():
+        entered.set()
+        gate.wait(5)
+        return 'done'
+
+    @flask_app.route('/fast', methods=['POST'])
+    def fast():
+        return {'length': len(request.get_data())}
+
+    return flask_app, gate, entered
+
+
+async def _wait_for(event):
+    while not event.is_set():
+        await asyncio.sleep(0.005)
+
+
+def test_busy_returns_503_with_retry_after():
+    flask_app, gate, entered = _blocking_app()
+    application = AsgiApp(flask_app, FakeDatabase(), workers=2, max_concurrency=1, queue_timeout=0.05)
+
+    async def main():
+        slow = asyncio.ensure_future(_request(application, '/slow'))
+        await _wait_for(entered)
+        busy = await _request(application, '/fast', 'POST', b'x')
+        gate.set()
+        return await slow, busy, await _request(application, '/fast', 'POST', b'abc')
+
+    slow, busy, after = asyncio.run(main())
+    assert (slow[0], slow[2]) == (200, b'done')
+    assert busy[0] == 503
+    assert busy[1][b'retry-after'] == b'1'
+    assert json.loads(busy[2])['success'] is False
+    assert (after[0], json.loads(after[2])) == (200, {'length': 3})
+    assert application.get_stats()['rejected_busy'] == 1
+    application.executor.shutdown()
+
+
+def test_draining_rejects_new_requests_and_waits_for_running():
+    flask_app, gate, entered = _blocking_app()
+    database = FakeDatabase()
+    application = AsgiApp(flask_app, database, workers=2, shutdown_timeout=5)
+
+    async def main():
+        slow = asyncio.ensure_future(_request(application, '/slow'))
+        await _wait_for(entered)
+        shutdown = asyncio.ensure_future(application.shutdown())
+        await asyncio.sleep(0)
+        rejected = await _request(application, '/fast', 'POST')
+        # دیتابیس تا پایان درخواست در حال اجرا بسته نمی‌شود
+        assert not database.closed
+        gate.set()
+        result = await slow
+        await shutdown
+        return result, rejected
+
+    slow, rejected = asyncio.run(main())
+    assert (slow[0], slow[2]) == (200, b'done')
+    assert (rejected[0], rejected[1][b'retry-after']) == (503, b'1')
+    assert database.closed
+    assert application.get_stats()['rejected_draining'] == 1
+
+
+def test_capacity_stream_without_session_falls_back_to_401():
+    application = AsgiApp(asgi.flask_app, FakeDatabase(), workers=1)
+
+    status, headers, body = asyncio.run(_request(application, asgi.CAPACITY_STREAM_PATH))
+    assert status == 401
+    assert headers[b'content-type'] == b'application/json'
+    assert json.loads(body)['success'] is False
+    assert application.get_stats()['streams_opened'] == 0
+    application.executor.shutdown()
@@ -0,0 +1,65 @@
+import pytest
+
+from credentials import PasswordHasher
+
+EMAIL = 'reza@company.com'
+PASSWORD = 'User@123!'
+
+
+@pytest.fixture
+def stored_password(db):
+    """رمز ذخیره شده یک کاربر، مستقیم از جدول users"""
+    def read(email):
+        sql = f'SELECT password FROM users WHERE email = {db.placeholder}'
+        if db.placeholder == '?':
+            conn = db.get_connection()
+            try:
+                return conn.execute(sql, (email,)).fetchone()['password']
+            finally:
+                conn.close()
+        return db._fetch(sql, (email,), one=True)['password']
+    return read
+
+
+def test_legacy_plaintext_upgraded_on_login(db, execute, stored_password):
+    execute(f"UPDATE users SET password = '{PASSWORD}' WHERE email = '{EMAIL}'")
+
+    # رمز اشتباه چیزی را تغییر نمی‌دهد
+    assert db.authenticate_user(EMAIL, 'wrong') is None
+    assert stored_password(EMAIL) == PASSWORD
+
+    user = db.authenticate_user(EMAIL, PASSWORD)
+    assert user['email'] == EMAIL and 'password' not in user
+    stored = stored_password(EMAIL)
+    assert stored.startswith('pbkdf2_sha256$1000$')
+    assert PASSWORD not in stored
+    assert db.hasher.get_stats()['legacy_upgrades'] == 1
+
+    db.hasher.clear_cache()
+    assert db.authenticate_user(EMAIL, PASSWORD)['email'] == EMAIL
+    assert db.authenticate_user(EMAIL, 'wrong') is None
+    assert stored_password(EMAIL) == stored
+
+
+def test_cost_change_rehashes_on_login(db, stored_password):
+    before = stored_password(EMAIL)
+    db.hasher.iterations = 2000
+    assert db.authenticate_user(EMAIL, PASSWORD) is not None
+    assert stored_password(EMAIL).startswith('pbkdf2_sha256$2000$')
+    assert stored_password(EMAIL) != before
+
+
+def test_verify_schemes():
+    hasher = PasswordHasher(iterations=1000, cache_ttl=0)
+    pbkdf2 = hasher.hash(PASSWORD)
+    assert hasher.verify(PASSWORD, pbkdf2) == (True, False)
+    assert hasher.verify('wrong', pbkdf2) == (False, False)
+    assert hasher.verify(PASSWORD, PASSWORD) == (True, True)
+    assert hasher.verify('wrong', PASSWORD) == (False, False)
+    assert hasher.verify(PASSWORD, 'pbkdf2_sha256$x$y') == (False, False)
+
+    scrypt = PasswordHasher(scheme='scrypt', scrypt_n=2 ** 10, cache_ttl=0)
+    assert scrypt.verify(PASSWORD, pbkdf2) == (True, True)
+    assert scrypt.verify(PASSWORD, scrypt.hash(PASSWORD)) == (True, False)
+    hasher.close()
+    scrypt.close()
@@ -0,0 +1,63 @@
+from datetime import date, datetime, timedelta
+
+import jdatetime
+import pytest
+
+from jalali_calendar import JalaliDateService
+
+
+@pytest.fixture
+def service():
+    return JalaliDateService(years_back=1, years_ahead=1, cache_size=4)
+
+
+def test_table_matches_jdatetime_and_round_trips(service):
+    service.to_jalali('2000-01-01')
+    to_jalali, to_gregorian = service._tables()
+
+    today = date.today()
+    first, last = date(today.year - 1, 1, 1), date(today.year + 1, 12, 31)
+    assert len(to_jalali) == len(to_gregorian) == (last - first).days + 1
+
+    day = first
+    while day <= last:
+        jalali_str = jdatetime.date.fromgregorian(date=day).strftime('%Y/%m/%d')
+        assert service.to_jalali(day.isoformat()) == jalali_str
+        assert service.to_gregorian(jalali_str) == day.isoformat()
+        day += timedelta(days=1)
+
+    # همه تبدیل‌های داخل بازه از جدول آمده‌اند
+    assert service.get_stats()['lru_misses'] == 1
+
+
+def test_input_forms(service):
+    assert service.to_jalali('2024-03-20 12:30:00') == '1403/01/01'
+    assert service.to_jalali(date(2024, 3, 19)) == '1402/12/29'
+    assert service.to_jalali(datetime(2024, 3, 20, 8, 0)) == '1403/01/01'
+    assert service.to_gregorian('1403-01-01') == '2024-03-20'
+    assert service.to_gregorian('1403/01/01 18:00:00') == '2024-03-20'
+    assert service.to_jalali('') == ''
+    assert service.to_gregorian('') is None
+
+
+def test_out_of_range_years_use_bounded_lru(service):
+    assert service.to_jalali('1990-03-21') == '1369/01/01'
+    assert service.to_jalali('1990-03-21') == '1369/01/01'
+    assert service.to_gregorian('1369/01/01') == '1990-03-21'
+    assert service.to_gregorian('1500/01/01') == jdatetime.date(1500, 1, 1).togregorian().isoformat()
+
+    stats = service.get_stats()
+    assert (stats['lru_hits'], stats['lru_misses']) == (1, 1)
+
+    for year in range(1980, 1990):
+        service.to_jalali(f'{year}-06-01')
+    assert service.get_stats()['lru_size'] == 4
+
+
+def test_invalid_dates(service):
+    # تاریخ نامعتبر همان ورودی را برمی‌گرداند (مثل قبل از کش)
+    assert service.to_jalali('2024-02-30') == '2024-02-30'
+    assert service.to_jalali('not a date') == 'not a date'
+    assert service.to_gregorian('1403/12/31') is None  # اسفند ۳۱ روز ندارد
+    assert service.to_gregorian('1403/13/01') is None
+    assert service.to_gregorian('abc') is None
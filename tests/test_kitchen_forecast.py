@@ -0,0 +1,47 @@
+from conftest import DEADLINE
+from kitchen_forecast import FORECAST_COLUMNS, build_forecast
+
+
+def _menu(db, week_start, week_end, items):
+    success, weekly_menu_id, message = db.create_weekly_menu_bulk(week_start, week_end, DEADLINE, [
+        {'day_of_week': day, 'food_name': name, 'full_price': 50000, 'capacity': capacity}
+        for day, name, capacity in items
+    ])
+    assert success, message
+    return [item['id'] for item in db.get_weekly_menu()['items']]
+
+
+def test_forecast_from_history(db, users):
+    reza, sara, ali = users['reza@company.com'], users['sara@company.com'], users['ali@company.com']
+
+    # هفته قبل: کباب پر شد و یک نفر در صف ماند؛ یکی از دو رزرو خورش لغو شد
+    kebab, stew = _menu(db, '1498-12-25', '1498-12-29', [('شنبه', 'کباب', 2), ('یکشنبه', 'خورش', 5)])
+    assert db.create_reservation(reza, kebab, 1)[0]
+    assert db.create_reservation(ali, kebab, 1)[0]
+    assert db.join_waitlist(sara, kebab, 1)[0]
+    assert db.create_reservation(reza, stew, 1)[0]
+    assert db.create_reservation(sara, stew, 1)[0]
+    cancelled = [row for row in db.get_user_reservations(sara) if row.menu_item_id == stew]
+    assert db.cancel_reservation(sara, cancelled[0].id)[0]
+
+    kebab, stew, soup = _menu(db, '1499-01-01', '1499-01-05', [
+        ('شنبه', 'کباب', 10), ('یکشنبه', 'خورش', 10), ('یکشنبه', 'سوپ', 4)])
+    assert db.create_reservation(reza, kebab, 1)[0]
+    assert db.create_reservation(ali, soup, 2)[0]
+
+    forecast = build_forecast(db)
+    items = {item['food_name']: item for item in forecast['items']}
+    assert set(items['کباب']) >= {key for key, _ in FORECAST_COLUMNS}
+    assert 'predicted_demand' not in items['کباب']
+
+    # تقاضای کباب = دو رزرو + یک نفر صف؛ ظرفیت قبلی کم بوده
+    assert (items['کباب']['history_avg_demand'], items['کباب']['history_sold_out'],
+            items['کباب']['portions']) == (3.0, 1, 3)
+    assert (items['خورش']['cancellation_rate'], items['خورش']['history_sold_out'],
+            items['خورش']['portions']) == (0.5, 0, 1)
+    # بدون سابقه: همان رزروهای فعلی
+    assert (items['سوپ']['history_servings'], items['سوپ']['portions']) == (0, 2)
+
+    days = {day['day_of_week']: day for day in forecast['days']}
+    assert days['شنبه'] == {'day_of_week': 'شنبه', 'confirmed': 1, 'extra': 0, 'portions': 3}
+    assert days['یکشنبه']['portions'] == 3
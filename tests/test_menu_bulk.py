@@ -0,0 +1,66 @@
+import pytest
+
+from conftest import DEADLINE
+
+
+def _item(food_name, capacity=10, **extra):
+    return dict({'day_of_week': 'شنبه', 'food_name': food_name, 'full_price': 100000, 'capacity': capacity}, **extra)
+
+
+def test_bulk_create_in_one_call(db):
+    success, weekly_menu_id, message = db.create_weekly_menu_bulk('1499-01-01', '1499-01-05', DEADLINE, [
+        _item('کباب', 30),
+        _item('خورش', 20, day_of_week='یکشنبه', description='قیمه', extra_food=True, extra_food_price=70000),
+    ])
+    assert success, message
+
+    menu = db.get_weekly_menu()
+    assert menu['id'] == weekly_menu_id
+    kebab, stew = menu['items']
+    assert (kebab.food_name, kebab.capacity, kebab.reserved_count, kebab.extra_food) == ('کباب', 30, 0, 0)
+    assert (kebab.user_price, kebab.company_share) == pytest.approx((60000, 40000))
+    assert (stew.day_of_week, stew.description, stew.extra_food, stew.extra_food_price) == \
+        ('یکشنبه', 'قیمه', 1, 70000)
+
+
+def test_bulk_create_rejects_invalid_item_without_partial_menu(db, make_menu):
+    make_menu(5)
+    active = db.get_weekly_menu()['id']
+
+    for bad in (_item(''), _item('کباب', capacity='زیاد'), {'food_name': 'بدون روز'}):
+        success, weekly_menu_id, _ = db.create_weekly_menu_bulk('1499-01-08', '1499-01-12', DEADLINE,
+                                                                [_item('سالم'), bad])
+        assert (success, weekly_menu_id) == (False, None)
+    assert db.get_weekly_menu()['id'] == active
+
+
+def test_clone_copies_items_with_empty_capacity(db, users, make_menu):
+    first, second = make_menu(5, 8)
+    source = db.get_weekly_menu()
+    assert db.create_reservation(users['reza@company.com'], first, 2)[0]
+
+    success, weekly_menu_id, message = db.clone_weekly_menu()
+    assert success, message
+
+    menu = db.get_weekly_menu()
+    assert menu['id'] == weekly_menu_id != source['id']
+    assert (menu['week_start'], menu['week_end']) == ('1499-01-08', '1499-01-12')
+    assert menu['reservation_deadline'] == '2100-01-07 18:00:00'
+    assert [(item.food_name, item.capacity, item.reserved_count) for item in menu['items']] == \
+        [('غذای 0', 5, 0), ('غذای 1', 8, 0)]
+    assert {item.id for item in menu['items']}.isdisjoint({first, second})
+
+
+def test_clone_by_id_with_deadline(db, make_menu):
+    make_menu(5)
+    source_id = db.get_weekly_menu()['id']
+    make_menu(1, 2, 3)
+
+    success, _, _ = db.clone_weekly_menu(source_id, shift_days=14, reservation_deadline='2099-06-01 12:00:00')
+    assert success
+    menu = db.get_weekly_menu()
+    assert (menu['week_start'], menu['reservation_deadline']) == ('1499-01-15', '2099-06-01 12:00:00')
+    assert [item.capacity for item in menu['items']] == [5]
+
+    assert db.clone_weekly_menu(10 ** 6) == (False, None, 'منوی مبدأ پیدا نشد')
+    assert db.get_weekly_menu()['id'] == menu['id']
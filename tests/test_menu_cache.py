@@ -0,0 +1,71 @@
+import pytest
+
+import menu_cache
+
+
+class Clock:
+    """ساعت دستی به جای time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(menu_cache.time, 'monotonic', clock)
+    return clock
+
+
+def _counts(db):
+    return [item.reserved_count for item in db.get_weekly_menu()['items']]
+
+
+def test_reserve_and_cancel_write_through(db, users, make_menu, clock):
+    reza = users['reza@company.com']
+    first, second = make_menu(5, 5)
+    assert _counts(db) == [0, 0]
+
+    assert db.create_reservation(reza, first, 2)[0]
+    assert _counts(db) == [2, 0]
+
+    reservation, = db.get_user_reservations(reza)
+    assert db.cancel_reservation(reza, reservation.id)[0]
+    assert _counts(db) == [0, 0]
+
+    # شمارنده‌ها از خود کش آمده‌اند، نه از خواندن دوباره دیتابیس
+    stats = db.get_menu_cache_stats()
+    assert (stats['misses'], stats['counter_refreshes']) == (1, 0)
+
+
+def test_menu_change_bumps_version(db, make_menu, clock):
+    make_menu(5)
+    version = db.get_menu_cache_stats()['version']
+    db.get_weekly_menu()
+
+    make_menu(3, 4)
+    assert db.get_menu_cache_stats()['version'] == version + 1
+    assert [item.capacity for item in db.get_weekly_menu()['items']] == [3, 4]
+
+
+def test_ttl_expiry_picks_up_outside_changes(db, make_menu, execute, clock):
+    item_id, = make_menu(5)
+    db.get_weekly_menu()
+
+    # تغییر از پروسه دیگر: تا پایان TTL دیده نمی‌شود
+    execute(f'UPDATE menu_items SET reserved_count = 3 WHERE id = {item_id}')
+    assert _counts(db) == [0]
+
+    clock.now += db.menu_cache.counter_ttl
+    assert _counts(db) == [3]
+    assert db.get_menu_cache_stats()['counter_refreshes'] == 1
+
+    execute(f"UPDATE menu_items SET food_name = 'سوپ' WHERE id = {item_id}")
+    assert db.get_weekly_menu()['items'][0].food_name != 'سوپ'
+
+    clock.now += db.menu_cache.menu_ttl
+    assert db.get_weekly_menu()['items'][0].food_name == 'سوپ'
+    assert db.get_menu_cache_stats()['misses'] == 2
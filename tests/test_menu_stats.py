@@ -0,0 +1,76 @@
+import pytest
+
+
+@pytest.fixture
+def menu_stats(db):
+    """ردیف‌های جدول menu_stats منوی فعال؛ کلید: menu_item_id (۰ = جمع هفته)"""
+    sql = '''
+    SELECT menu_item_id, confirmed_quantity, user_share, company_share
+    FROM menu_stats s JOIN weekly_menus w ON w.id = s.weekly_menu_id
+    WHERE w.is_active = 1
+    '''
+
+    def read():
+        if db.placeholder == '?':
+            conn = db.get_connection()
+            try:
+                rows = conn.execute(sql).fetchall()
+            finally:
+                conn.close()
+        else:
+            rows = db._fetch(sql, ())
+        return {row['menu_item_id']: (row['confirmed_quantity'], row['user_share'], row['company_share'])
+                for row in rows if row['confirmed_quantity']}
+    return read
+
+
+def _check(db, menu_stats, expected_quantities):
+    stats = menu_stats()
+    assert {item_id: row[0] for item_id, row in stats.items() if item_id} == expected_quantities
+
+    items = [row for item_id, row in stats.items() if item_id]
+    total = tuple(sum(row[index] for row in items) for index in range(3))
+    if db.placeholder == '?':
+        # ردیف menu_item_id=0 جمع ردیف‌های غذاهاست
+        assert stats.get(0, (0, 0, 0)) == pytest.approx(total)
+    else:
+        # PostgreSQL ردیف جمع ندارد (جمع با SUM خوانده می‌شود)
+        assert 0 not in stats
+
+    summary = db.calculate_stats()
+    assert (summary['total_reservations'], summary['total_user_share'],
+            summary['total_company_share']) == pytest.approx(total)
+
+    # نگهداری افزایشی همان نتیجه بازسازی کامل است
+    assert db.rebuild_menu_stats(verify_only=True) == []
+
+
+def test_menu_stats_follow_reserve_and_cancel(db, users, make_menu, menu_stats):
+    first, second = make_menu(5, 5)
+    reza, sara = users['reza@company.com'], users['sara@company.com']
+    _check(db, menu_stats, {})
+
+    assert db.create_reservation(reza, first, 2)[0]
+    assert db.create_reservation(sara, first, 1)[0]
+    assert db.create_reservation(sara, second, 3)[0]
+    _check(db, menu_stats, {first: 3, second: 3})
+
+    reservation = next(row for row in db.get_user_reservations(sara) if row.menu_item_id == second)
+    assert db.cancel_reservation(sara, reservation.id)[0]
+    _check(db, menu_stats, {first: 3})
+
+    for user_id in (reza, sara):
+        for row in db.get_user_reservations(user_id):
+            assert db.cancel_reservation(user_id, row.id)[0]
+    _check(db, menu_stats, {})
+
+
+def test_menu_stats_follow_waitlist_promotion(db, users, make_menu, menu_stats):
+    item_id, = make_menu(2)
+    reza, sara = users['reza@company.com'], users['sara@company.com']
+    assert db.create_reservation(reza, item_id, 2)[0]
+    assert db.join_waitlist(sara, item_id, 1)[0]
+
+    # لغو رزرو و ارتقای صف در یک تراکنش؛ خلاصه آمار باید هر دو را ببیند
+    assert db.cancel_reservation(reza, db.get_user_reservations(reza)[0].id)[0]
+    _check(db, menu_stats, {item_id: 1})
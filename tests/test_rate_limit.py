@@ -0,0 +1,105 @@
+import pytest
+from flask import Flask, jsonify
+
+import rate_limit
+from rate_limit import MemoryBucketStore, RateLimiter, SqliteBucketStore, parse_limits
+
+
+class Clock:
+    """ساعت دستی به جای time.monotonic و time.time"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock)
+    monkeypatch.setattr(rate_limit.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path, clock):
+    if request.param == 'sqlite':
+        store = SqliteBucketStore(str(tmp_path / 'rate.db'))
+        yield store
+        store.pool.close_all()
+    else:
+        yield MemoryBucketStore()
+
+
+def _app(store, limits):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    RateLimiter(store, limits).init_app(app)
+
+    @app.route('/api/reserve', methods=['POST'])
+    def reserve():
+        return jsonify({'success': True})
+
+    @app.route('/login', methods=['GET', 'POST'])
+    def login():
+        return 'ok'
+
+    return app
+
+
+def test_bucket_returns_429_with_retry_after(store, clock):
+    client = _app(store, {'reserve': [('ip', 1, 10, 2)]}).test_client()
+
+    first = client.post('/api/reserve')
+    assert (first.status_code, first.headers['X-RateLimit-Limit'], first.headers['X-RateLimit-Remaining']) == \
+        (200, '2', '1')
+    assert client.post('/api/reserve').status_code == 200
+
+    limited = client.post('/api/reserve')
+    assert limited.status_code == 429
+    assert limited.get_json() == {'success': False, 'message': rate_limit.LIMITED_MESSAGE}
+    assert limited.headers['Retry-After'] == '10'
+
+    # نصف زمان پر شدن یک توکن: هنوز محدود، با انتظار کمتر
+    clock.now += 5
+    assert client.post('/api/reserve').headers['Retry-After'] == '5'
+    clock.now += 5
+    assert client.post('/api/reserve').status_code == 200
+
+
+def test_user_scope_and_burst(store, clock):
+    app = _app(store, {'reserve': [('user', 1, 1, 3)]})
+    reza, sara = app.test_client(), app.test_client()
+    for client, user_id in ((reza, 2), (sara, 3)):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+
+    assert [reza.post('/api/reserve').status_code for _ in range(4)] == [200, 200, 200, 429]
+    assert sara.post('/api/reserve').status_code == 200
+    # بدون سشن، کلید user نادیده گرفته می‌شود
+    assert app.test_client().post('/api/reserve').status_code == 200
+
+
+def test_login_limited_per_email(store, clock):
+    client = _app(store, {'login:POST': [('email', 2, 60, 2), ('ip', 3, 60, 3)]}).test_client()
+
+    codes = [client.post('/login', data={'email': ' Reza@Company.com '}).status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+    # ایمیل دیگر سطل خودش را دارد تا سقف IP پر شود
+    assert client.post('/login', data={'email': 'sara@company.com'}).status_code == 200
+    limited = client.post('/login', data={'email': 'ali@company.com'})
+    assert (limited.status_code, limited.mimetype) == (429, 'text/plain')
+    assert int(limited.headers['Retry-After']) >= 1
+    # GET صفحه ورود محدود نیست
+    assert client.get('/login').status_code == 200
+
+
+def test_parse_limits():
+    assert parse_limits('login:POST=email:10/60,ip:100/60; reserve=user:5/1:10') == {
+        'login:POST': [('email', 10, 60.0, None), ('ip', 100, 60.0, None)],
+        'reserve': [('user', 5, 1.0, 10)],
+    }
+    with pytest.raises(ValueError):
+        RateLimiter(MemoryBucketStore(), {'reserve': [('host', 1, 1, 1)]})
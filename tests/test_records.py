@@ -0,0 +1,42 @@
+from records import MenuItem, UserReservation, WaitlistEntry
+
+
+class CountingHook:
+    """hook زمان‌سنجی مثل Instrumentation؛ فقط تعداد را می‌شمارد"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def on_query(self, sql, seconds):
+        self.queries += 1
+
+    def on_rows(self, count, seconds):
+        self.rows += count
+
+
+def test_hot_reads_return_records_with_query_hook(db, users, make_menu):
+    # با FOOD_INSTRUMENTATION=1 همه cursorها زمان‌سنج هستند و row_factory باید به cursor واقعی برسد
+    hook = CountingHook()
+    db.pool.query_hook = hook
+    first, second = make_menu(1, 5)
+    reza, sara = users['reza@company.com'], users['sara@company.com']
+    db.create_reservation(reza, first, 1)
+    db.join_waitlist(sara, first, 1)
+    db.create_reservation(reza, second, 2)
+
+    menu = db.get_weekly_menu()
+    assert all(isinstance(item, MenuItem) for item in menu['items'])
+    assert [item.reserved_count for item in menu['items']] == [1, 2]
+
+    foods = db.get_foods_for_day(menu['id'], 'شنبه')
+    assert [type(item) for item in foods] == [MenuItem, MenuItem]
+
+    reservations = db.get_user_reservations(reza)
+    assert all(isinstance(row, UserReservation) for row in reservations)
+    assert sorted(row.menu_item_id for row in reservations) == [first, second]
+
+    waitlist = db.get_user_waitlist(sara)
+    assert [(type(entry), entry.position) for entry in waitlist] == [(WaitlistEntry, 1)]
+
+    assert hook.queries > 0 and hook.rows > 0
@@ -0,0 +1,77 @@
+import threading
+
+from storage import CAPACITY_FULL, RESERVATION_OK
+
+
+def _reserved(db, weekly_menu_id):
+    """reserved_count ذخیره شده و جمع رزروهای قطعی، مستقیم از دیتابیس"""
+    counts = db._load_reserved_counts(weekly_menu_id)
+    confirmed = {row['id']: row['confirmed'] for row in db.get_forecast_items(weekly_menu_id)}
+    return counts, confirmed
+
+
+def test_concurrent_mixed_quantities_keep_capacity(db, users, make_menu):
+    item_id, = make_menu(7)
+    weekly_menu_id = db.get_weekly_menu()['id']
+    user_ids = list(users.values())
+    start = threading.Barrier(24)
+    results = []
+    remaining = []
+
+    def reserve(index):
+        quantity = 3 - index % 3
+        start.wait()
+        results.append((quantity, db.create_reservation(user_ids[index % len(user_ids)], item_id, quantity)))
+
+    def watch():
+        start.wait()
+        for _ in range(50):
+            remaining.extend(item['remaining'] for item in db.get_capacity_snapshot()['items'])
+
+    threads = [threading.Thread(target=reserve, args=(index,)) for index in range(20)]
+    threads += [threading.Thread(target=watch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(result in ((True, RESERVATION_OK), (False, CAPACITY_FULL)) for _, result in results)
+    booked = sum(quantity for quantity, (success, _) in results if success)
+    assert 5 <= booked <= 7
+    assert min(remaining) >= 0
+
+    counts, confirmed = _reserved(db, weekly_menu_id)
+    assert counts == confirmed == {item_id: booked}
+    assert db.get_reservation_stats()['overbooked_items'] == 0
+
+
+def test_concurrent_cancel_and_reserve_keep_capacity(db, users, make_menu):
+    item_id, = make_menu(3)
+    weekly_menu_id = db.get_weekly_menu()['id']
+    reza, sara, ali = users['reza@company.com'], users['sara@company.com'], users['ali@company.com']
+    for user_id in (reza, sara, ali):
+        assert db.create_reservation(user_id, item_id, 1) == (True, RESERVATION_OK)
+    reservations = [db.get_user_reservations(user_id)[0].id for user_id in (reza, sara)]
+    start = threading.Barrier(12)
+    results = []
+
+    def cancel(user_id, reservation_id):
+        start.wait()
+        results.append(db.cancel_reservation(user_id, reservation_id)[0])
+
+    def reserve():
+        start.wait()
+        results.append(db.create_reservation(users['admin@company.com'], item_id, 1)[0])
+
+    threads = [threading.Thread(target=cancel, args=pair) for pair in zip((reza, sara), reservations)]
+    threads += [threading.Thread(target=reserve) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts, confirmed = _reserved(db, weekly_menu_id)
+    assert counts == confirmed
+    assert 1 <= counts[item_id] <= 3
+    # هر جای آزاد شده حداکثر یک بار دوباره رزرو شد
+    assert results.count(True) - 2 == counts[item_id] - 1
@@ -0,0 +1,90 @@
+import csv
+import io
+from datetime import date
+
+import pytest
+
+import reservation_export
+from jalali_calendar import convert_to_jalali
+from reservation_export import parse_filters, stream_csv, stream_export
+
+COLUMNS = (('n', 'شماره'), ('name', 'نام'))
+
+
+def test_csv_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(reservation_export, 'CSV_FLUSH_ROWS', 2)
+    consumed = []
+
+    def rows():
+        for n in range(5):
+            consumed.append(n)
+            yield {'n': n, 'name': f'ردیف {n}'}
+
+    chunks = stream_csv(COLUMNS, rows())
+    first = next(chunks)
+    # تکه اول پیش از خواندن بقیه ردیف‌ها فرستاده می‌شود
+    assert consumed == [0, 1]
+    assert first.startswith('\ufeffشماره,نام')
+
+    rest = list(chunks)
+    assert len(rest) == 2
+    parsed = list(csv.reader(io.StringIO((first + ''.join(rest)).lstrip('\ufeff'))))
+    assert parsed == [['شماره', 'نام']] + [[str(n), f'ردیف {n}'] for n in range(5)]
+
+
+def _reserve_and_cancel(db, users, make_menu):
+    first, second = make_menu(5, 5)
+    reza = users['reza@company.com']
+    assert db.create_reservation(reza, first, 2)[0]
+    assert db.create_reservation(reza, second, 1)[0]
+    cancelled = next(row for row in db.get_user_reservations(reza) if row.menu_item_id == second)
+    assert db.cancel_reservation(reza, cancelled.id)[0]
+
+
+def _read_csv(db, kind, filters):
+    text = ''.join(stream_export(db, kind, 'csv', filters)).lstrip('\ufeff')
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def test_reservations_and_payroll_csv(db, users, make_menu):
+    _reserve_and_cancel(db, users, make_menu)
+    today = convert_to_jalali(date.today().isoformat())
+
+    rows = _read_csv(db, 'reservations', parse_filters())
+    assert sorted(row['وضعیت'] for row in rows) == ['CANCELLED', 'CONFIRMED']
+    assert {row['تاریخ (شمسی)'] for row in rows} == {today}
+
+    confirmed = _read_csv(db, 'reservations', parse_filters(date_from=today, status='confirmed'))
+    assert [(row['غذا'], row['تعداد']) for row in confirmed] == [('غذای 0', '2')]
+    assert _read_csv(db, 'reservations', parse_filters(date_to='1390/01/01')) == []
+
+    # کسر از حقوق فقط رزروهای قطعی، جمع ماه شمسی
+    payroll, = _read_csv(db, 'payroll', parse_filters())
+    assert (payroll['ماه (شمسی)'], payroll['تعداد غذا']) == (today[:7], '2')
+    assert float(payroll['کسر از حقوق']) == pytest.approx(2 * 50000 * 0.6)
+
+
+def test_xlsx_export(db, users, make_menu):
+    openpyxl = pytest.importorskip('openpyxl')
+    _reserve_and_cancel(db, users, make_menu)
+
+    data = b''.join(stream_export(db, 'reservations', 'xlsx', parse_filters()))
+    sheet = openpyxl.load_workbook(io.BytesIO(data), read_only=True)['reservations']
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0][0] == 'شناسه رزرو'
+    assert len(rows) == 3
+
+
+def test_xlsx_without_openpyxl(db, monkeypatch):
+    monkeypatch.setattr(reservation_export, 'openpyxl', None)
+    with pytest.raises(RuntimeError):
+        stream_export(db, 'payroll', 'xlsx', parse_filters())
+
+
+def test_parse_filters():
+    assert parse_filters('1403/01/01', '2024-03-21', '', 'cancelled') == {
+        'date_from': '2024-03-20', 'date_to': '2024-03-21', 'department': None, 'status': 'CANCELLED'
+    }
+    for bad in ('1403/13/01', '20240320', '2024-3'):
+        with pytest.raises(ValueError):
+            parse_filters(date_from=bad)
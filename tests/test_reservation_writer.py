@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from reservation_writer import QUEUE_TIMEOUT_MESSAGE
+from storage import RESERVATION_OK
+
+# نویسنده دسته‌ای فقط در SQLite وجود دارد
+pytestmark = pytest.mark.parametrize('db', ['sqlite'], indirect=True)
+
+
+def test_reserve_through_writer(db, users, make_menu):
+    item_id, = make_menu(5)
+    db.start_writer()
+    try:
+        assert db.create_reservation(users['reza@company.com'], item_id, 1, idempotency_key='w-1') == \
+            (True, RESERVATION_OK)
+    finally:
+        db.stop_writer()
+    assert db.get_writer_stats() is None
+    assert len(db.get_user_reservations(users['reza@company.com'])) == 1
+
+
+def test_submit_after_stop_falls_back_to_direct_commit(db, users, make_menu):
+    item_id, = make_menu(5)
+    writer = db.start_writer()
+    writer.stop()
+
+    # درخواستی که با stop همزمان شده پشت نشانه پایان صف نمی‌ماند
+    assert writer.submit(users['reza@company.com'], item_id, 1, False) is None
+    assert db.create_reservation(users['reza@company.com'], item_id, 1) == (True, RESERVATION_OK)
+    db.stop_writer()
+
+
+def test_timed_out_reservation_is_cancelled_before_commit(db, users, make_menu):
+    item_id, = make_menu(5)
+    writer = db.start_writer(result_timeout=0.05)
+    gate = threading.Event()
+    process = writer._process
+
+    def blocked_process(batch):
+        gate.wait()
+        process(batch)
+
+    writer._process = blocked_process
+    try:
+        # نخ نویسنده روی این دسته گیر کرده و درخواست بعدی در صف می‌ماند
+        blocker = writer.submit(users['sara@company.com'], item_id, 1, False)
+        result = db.create_reservation(users['reza@company.com'], item_id, 1, idempotency_key='late')
+        assert result == (False, QUEUE_TIMEOUT_MESSAGE)
+    finally:
+        gate.set()
+        db.stop_writer()
+
+    assert blocker.result() == (True, RESERVATION_OK, False)
+    assert db.get_user_reservations(users['reza@company.com']) == []
+    assert writer.get_stats()['timed_out'] == 1
@@ -0,0 +1,90 @@
+import pytest
+from flask import Flask, session
+
+from sessions import MemorySessionStore, ServerSessionInterface, SqliteSessionStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        store = SqliteSessionStore(str(tmp_path / 'sessions.db'))
+        yield store
+        store.pool.close_all()
+    else:
+        yield MemorySessionStore()
+
+
+def _app(store):
+    app = Flask(__name__)
+    interface = ServerSessionInterface(store, reap_interval=60)
+    interface.init_app(app)
+
+    @app.route('/login/<int:user_id>')
+    def login(user_id):
+        session.regenerate()
+        session['user_id'] = user_id
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return str(session.get('user_id', '-'))
+
+    return app, interface
+
+
+def test_reaper_starts_on_first_request(store):
+    app, interface = _app(store)
+    try:
+        # ساختن اپلیکیشن (import) نخی نمی‌سازد
+        assert interface._reaper is None
+        app.test_client().get('/whoami')
+        assert interface._reaper.is_alive()
+    finally:
+        interface.stop_reaper()
+
+    app.test_client().get('/whoami')
+    assert interface._reaper is None
+
+
+def test_revoke_user_logs_out_only_that_user(store):
+    app, interface = _app(store)
+    reza, reza_phone, sara = app.test_client(), app.test_client(), app.test_client()
+    reza.get('/login/2')
+    reza_phone.get('/login/2')
+    sara.get('/login/3')
+
+    assert store.revoke_user(2) == 2
+    assert reza.get('/whoami').text == '-'
+    assert reza_phone.get('/whoami').text == '-'
+    assert sara.get('/whoami').text == '3'
+    assert store.get_stats()['revoked'] == 2
+
+    assert store.revoke_all() == 1
+    assert sara.get('/whoami').text == '-'
+    interface.stop_reaper()
+
+
+def test_login_rotates_session_id(store):
+    app, interface = _app(store)
+    client = app.test_client()
+    client.get('/login/2')
+    old_sid = client.get_cookie('session').value
+
+    client.get('/login/2')
+    assert client.get_cookie('session').value != old_sid
+    assert store.get(old_sid) is None
+    interface.stop_reaper()
+
+
+def test_sqlite_revoke_reaches_other_process(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    first, second = SqliteSessionStore(path, cache_ttl=0), SqliteSessionStore(path, cache_ttl=0)
+    try:
+        first.save('sid-1', {'user_id': 2})
+        assert second.get('sid-1') == {'user_id': 2}
+
+        assert second.revoke_user(2) == 1
+        assert first.get('sid-1') is None
+    finally:
+        first.pool.close_all()
+        second.pool.close_all()
@@ -0,0 +1,89 @@
+import threading
+
+from storage import CAPACITY_FULL, IDEMPOTENCY_CONFLICT, RESERVATION_OK, WAITLIST_JOINED
+
+
+def test_reserve_within_capacity(db, users, make_menu):
+    item_id, = make_menu(2)
+    reza = users['reza@company.com']
+
+    assert db.create_reservation(reza, item_id, 1) == (True, RESERVATION_OK)
+    assert db.create_reservation(users['sara@company.com'], item_id, 2) == (False, CAPACITY_FULL)
+    assert db.create_reservation(users['sara@company.com'], item_id, 1) == (True, RESERVATION_OK)
+
+    item = db.get_foods_for_day(db.get_weekly_menu()['id'], 'شنبه')[0]
+    assert item.reserved_count == 2
+    assert [row.menu_item_id for row in db.get_user_reservations(reza)] == [item_id]
+
+
+def test_concurrent_reservations_never_overbook(db, users, make_menu):
+    item_id, = make_menu(5)
+    user_ids = list(users.values())
+    results = []
+
+    def reserve(index):
+        results.append(db.create_reservation(user_ids[index % len(user_ids)], item_id, 1))
+
+    threads = [threading.Thread(target=reserve, args=(index,)) for index in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count((True, RESERVATION_OK)) == 5
+    assert results.count((False, CAPACITY_FULL)) == 15
+    assert db.get_reservation_stats()['overbooked_items'] == 0
+
+
+def test_idempotency_key_replays_first_result(db, users, make_menu):
+    first, second = make_menu(1, 5)
+    reza = users['reza@company.com']
+
+    assert db.create_reservation(reza, first, 1, idempotency_key='k-1') == (True, RESERVATION_OK)
+    # تکرار همان درخواست (مثلاً ارسال دوباره فرم) همان نتیجه را می‌دهد و دوباره رزرو نمی‌کند
+    assert db.create_reservation(reza, first, 1, idempotency_key='k-1') == (True, RESERVATION_OK)
+    assert len(db.get_user_reservations(reza)) == 1
+    assert db.get_reservation_stats()['replayed'] == 1
+
+    assert db.create_reservation(reza, second, 1, idempotency_key='k-1') == (False, IDEMPOTENCY_CONFLICT)
+    # کلید هر کاربر جداست
+    assert db.create_reservation(users['sara@company.com'], second, 1, idempotency_key='k-1') == (True, RESERVATION_OK)
+
+
+def test_cancel_promotes_waitlist(db, users, make_menu):
+    item_id, = make_menu(1)
+    reza, sara = users['reza@company.com'], users['sara@company.com']
+
+    assert db.create_reservation(reza, item_id, 1) == (True, RESERVATION_OK)
+    assert db.join_waitlist(sara, item_id, 1) == (True, WAITLIST_JOINED, 1)
+    assert [entry.position for entry in db.get_user_waitlist(sara)] == [1]
+
+    reservation_id = db.get_user_reservations(reza)[0].id
+    success, _ = db.cancel_reservation(reza, reservation_id)
+    assert success
+
+    # جای آزاد شده در همان تراکنش به نفر اول صف رسید
+    assert db.get_user_reservations(reza) == []
+    assert [row.menu_item_id for row in db.get_user_reservations(sara)] == [item_id]
+    assert db.get_user_waitlist(sara) == []
+    assert db.get_weekly_menu()['items'][0]['reserved_count'] == 1
+    assert db.get_reservation_stats()['promoted'] == 1
+
+
+def test_menu_stats_match_reservations(db, users, make_menu, execute):
+    first, second = make_menu(3, 3)
+    reza, sara = users['reza@company.com'], users['sara@company.com']
+    db.create_reservation(reza, first, 2)
+    db.create_reservation(sara, second, 1)
+    db.join_waitlist(sara, first, 2)
+    db.cancel_reservation(reza, db.get_user_reservations(reza)[0].id)
+
+    assert db.rebuild_menu_stats(verify_only=True) == []
+
+    execute('UPDATE menu_stats SET confirmed_quantity = confirmed_quantity + 5')
+    drift = db.rebuild_menu_stats(verify_only=True)
+    assert drift
+    assert all(row['stored']['confirmed_quantity'] == row['expected']['confirmed_quantity'] + 5 for row in drift)
+
+    assert db.rebuild_menu_stats() == drift
+    assert db.rebuild_menu_stats(verify_only=True) == []
@@ -0,0 +1,71 @@
+import io
+
+from user_import import import_users
+
+HEADER = 'employee_id,full_name,email,password,department\n'
+
+
+def _csv(*lines):
+    return io.StringIO(HEADER + ''.join(line + '\n' for line in lines))
+
+
+def _spy_chunks(db, monkeypatch):
+    sizes = []
+    upsert = db.bulk_upsert_users
+
+    def spy(rows):
+        sizes.append(len(rows))
+        return upsert(rows)
+
+    monkeypatch.setattr(db, 'bulk_upsert_users', spy)
+    return sizes
+
+
+def test_import_in_chunks(db, monkeypatch):
+    sizes = _spy_chunks(db, monkeypatch)
+    stream = _csv(*(f'E{n},کارمند {n},e{n}@company.com,,dep{n % 2}' for n in range(5)))
+
+    result = import_users(db, stream, chunk_size=2, default_password='Init@123')
+    assert sizes == [2, 2, 1]
+    assert (result['processed'], result['inserted'], result['failed']) == (5, 5, 0)
+    assert db.authenticate_user('e3@company.com', 'Init@123')['employee_id'] == 'E3'
+
+    # ورود دوباره: فقط دپارتمان تغییر کرده به‌روز می‌شود
+    stream = _csv('E0,کارمند 0,e0@company.com,,dep9', 'E1,کارمند 1,e1@company.com,,dep1')
+    result = import_users(db, stream, chunk_size=2, default_password='Init@123')
+    assert (result['inserted'], result['updated'], result['unchanged']) == (0, 1, 1)
+
+
+def test_per_row_errors_do_not_stop_import(db, monkeypatch):
+    sizes = _spy_chunks(db, monkeypatch)
+    stream = _csv(
+        'E1,علی,a1@company.com,Pass@1234,IT',
+        ',بدون شماره,x@company.com,Pass@1234,IT',   # خط ۳: فیلد ضروری
+        'E2,بد,not-an-email,Pass@1234,IT',          # خط ۴: ایمیل
+        'E3,بی‌رمز,a3@company.com,,IT',              # خط ۵: رمز
+        'E1,تکراری,a9@company.com,Pass@1234,IT',     # خط ۶: تکراری در همان دسته
+        'E4,نمونه,reza@company.com,Pass@1234,IT',    # خط ۷: ایمیل کاربر موجود
+        'E5,درست,a5@company.com,Pass@1234,IT',
+        'E1,دسته بعد,a8@company.com,Pass@1234,IT',   # خط ۹: شماره پرسنلی با ایمیل دیگر
+    )
+
+    result = import_users(db, stream, chunk_size=3)
+    assert sizes == [3, 2]
+    assert (result['processed'], result['inserted'], result['failed']) == (8, 2, 6)
+    assert [error['row'] for error in sorted(result['errors'], key=lambda error: error['row'])] == \
+        [3, 4, 5, 6, 7, 9]
+    assert db.authenticate_user('a5@company.com', 'Pass@1234') is not None
+
+
+def test_jsonl_errors_and_error_cap(db):
+    stream = io.StringIO(
+        '{"employee_id": "J1", "full_name": "سارا", "email": "j1@company.com"}\n'
+        'not json\n'
+        '\n'
+        '["list"]\n'
+        '{"employee_id": "J2", "full_name": "مینا"}\n'
+    )
+    result = import_users(db, stream, fmt='jsonl', default_password='Init@123', max_errors=2)
+    assert (result['processed'], result['inserted'], result['failed']) == (4, 1, 3)
+    assert [error['row'] for error in result['errors']] == [2, 4]
+    assert result['errors_truncated']
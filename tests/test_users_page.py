@@ -0,0 +1,61 @@
+import pytest
+
+
+@pytest.fixture
+def staff(db):
+    """۸ کارمند اضافه (همه در یک ثانیه ساخته می‌شوند، پس created_at یکسان دارند)"""
+    rows = [(n, f'S{n}', f'کارمند {n}', f'staff{n}@company.com', 'Pass@1234', 'Kitchen' if n % 2 else 'IT')
+            for n in range(8)]
+    outcome = db.bulk_upsert_users(rows)
+    assert outcome['inserted'] == 8
+    return {user['email']: user['id'] for user in db.iter_users()}
+
+
+def _walk(db, limit, **filters):
+    pages = []
+    cursor = None
+    while True:
+        page = db.get_users_page(limit=limit, cursor=cursor, **filters)
+        pages.append([user['id'] for user in page['users']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('limit', [1, 3, 5, 12, 13])
+def test_pages_cover_every_user_once(db, staff, limit):
+    pages = _walk(db, limit)
+    ids = [user_id for page in pages for user_id in page]
+
+    assert sorted(ids) == sorted(staff.values())
+    assert len(set(ids)) == len(ids) == 12
+    # صفحه آخر هیچ‌وقت خالی نیست، حتی وقتی تعداد بر اندازه صفحه بخش‌پذیر است
+    assert all(pages) and len(pages) == -(-12 // limit)
+    # در created_at برابر، ترتیب با id شکسته می‌شود
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_filters_combine_with_cursor(db, staff):
+    kitchen = [user_id for page in _walk(db, 3, department='Kitchen') for user_id in page]
+    assert sorted(kitchen) == sorted(staff[f'staff{n}@company.com'] for n in (1, 3, 5, 7))
+
+    found = [user_id for page in _walk(db, 1, search='staff1') for user_id in page]
+    assert found == [staff['staff1@company.com']]
+
+    db.set_user_active(staff['staff2@company.com'], False)
+    inactive = db.get_users_page(is_active=False)
+    assert [user['id'] for user in inactive['users']] == [staff['staff2@company.com']]
+    assert inactive['next_cursor'] is None
+
+
+def test_limit_bounds_and_public_columns(db, staff):
+    assert len(db.get_users_page(limit=0)['users']) == 1
+    page = db.get_users_page(limit=1000)
+    assert len(page['users']) == 12 and page['next_cursor'] is None
+    assert 'password' not in page['users'][0]
+
+
+def test_invalid_cursor(db):
+    for cursor in ('%%%', 'bm90IGpzb24', 'WzFd'):
+        with pytest.raises(ValueError):
+            db.get_users_page(cursor=cursor)
@@ -0,0 +1,102 @@
+import csv
+import json
+import time
+from typing import Dict, Iterator, Optional, TextIO, Tuple
+
+# ستون‌های فایل فهرست کارکنان (password اختیاری است اگر رمز پیش‌فرض داده شود)
+REQUIRED_FIELDS = ('employee_id', 'full_name', 'email')
+
+
+def read_roster(stream: TextIO, fmt: str = 'csv') -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """خواندن جریانی فایل CSV یا JSONL؛ خروجی: (شماره ردیف، ردیف، خطای خواندن)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # شماره خط فایل (سطر اول عنوان ستون‌هاست)
+            yield reader.line_num, row, None
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"JSON نامعتبر: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "هر خط باید یک شیء JSON باشد"
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f"فرمت پشتیبانی نمی‌شود: {fmt}")
+
+
+def validate_row(row: Dict, default_password: Optional[str] = None) -> Tuple[Optional[tuple], Optional[str]]:
+    """بررسی و یکسان‌سازی یک ردیف؛ خروجی: (employee_id، full_name، email، password، department) یا خطا"""
+    values = {}
+    for field in ('employee_id', 'full_name', 'email', 'password', 'department'):
+        value = row.get(field)
+        values[field] = str(value).strip() if value is not None else ''
+
+    missing = [field for field in REQUIRED_FIELDS if not values[field]]
+    if missing:
+        return None, f"فیلدهای ضروری خالی است: {', '.join(missing)}"
+
+    email = values['email']
+    if '@' not in email or email.startswith('@') or email.endswith('@'):
+        return None, "ایمیل نامعتبر است"
+
+    password = values['password'] or default_password
+    if not password:
+        return None, "رمز عبور مشخص نشده است"
+
+    return (values['employee_id'], values['full_name'], email, password, values['department'] or None), None
+
+
+def import_users(db, stream: TextIO, fmt: str = 'csv', chunk_size: int = 500,
+                 default_password: Optional[str] = None, max_errors: int = 1000) -> Dict:
+    """ورود دسته‌ای کارکنان: هر chunk_size ردیف در یک تراکنش با executemany"""
+    started = time.perf_counter()
+    result = {
+        'processed': 0,
+        'inserted': 0,
+        'updated': 0,
+        'unchanged': 0,
+        'failed': 0,
+        'errors': [],
+        'errors_truncated': False
+    }
+
+    def add_error(row_number, message):
+        result['failed'] += 1
+        if len(result['errors']) < max_errors:
+            result['errors'].append({'row': row_number, 'message': message})
+        else:
+            result['errors_truncated'] = True
+
+    def flush(chunk):
+        outcome = db.bulk_upsert_users(chunk)
+        for key in ('inserted', 'updated', 'unchanged'):
+            result[key] += outcome[key]
+        for row_number, message in outcome['errors']:
+            add_error(row_number, message)
+
+    chunk = []
+    for row_number, row, error in read_roster(stream, fmt):
+        result['processed'] += 1
+        if error is None:
+            values, error = validate_row(row, default_password)
+        if error is not None:
+            add_error(row_number, error)
+            continue
+
+        chunk.append((row_number,) + values)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+
+    if chunk:
+        flush(chunk)
+
+    result['elapsed'] = round(time.perf_counter() - started, 3)
+    return result